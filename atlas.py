@@ -0,0 +1,81 @@
+import pygame as pg
+from typing import Dict, List, Tuple
+from characters import Ghost, PacMan
+import assets
+import common
+import loader
+
+class Atlas:
+    '''
+    Many small images packed into one surface. Images are placed on shelves
+    (rows) tallest first, and index maps each asset path to its rect.
+    '''
+    def __init__(self, asset_paths: List[str], alpha: bool, max_width: int = 128):
+        # Decoded in parallel, converted once packed
+        images: Dict[str, pg.Surface] = loader.load_images(asset_paths)
+
+        self.index: Dict[str, pg.Rect] = {}
+        shelf_x: int = 0
+        shelf_y: int = 0
+        shelf_height: int = 0
+        width: int = 0
+        for path in sorted(images, key=lambda p: (-images[p].get_height(), p)):
+            w, h = images[path].get_size()
+            if shelf_x + w > max_width and shelf_x > 0:
+                shelf_y += shelf_height
+                shelf_x = 0
+                shelf_height = 0
+            self.index[path] = pg.Rect(shelf_x, shelf_y, w, h)
+            shelf_x += w
+            shelf_height = max(shelf_height, h)
+            width = max(width, shelf_x)
+
+        packed: pg.Surface = pg.Surface((max(width, 1), max(shelf_y + shelf_height, 1)), pg.SRCALPHA if alpha else 0)
+        packed.blits([(images[path], rect) for path, rect in self.index.items()], doreturn=False)
+        self.surface: pg.Surface = packed.convert_alpha() if alpha else packed.convert()
+
+    def subsurface(self, asset_path: str) -> pg.Surface:
+        # Shares pixels with the atlas, blitting it reads straight from the packed surface
+        return self.surface.subsurface(self.index[asset_path])
+
+def asset_paths(extension: str) -> List[str]:
+    # Every image path declared in assets.py with the given extension
+    return [value for name, value in vars(assets).items()
+            if name.isupper() and isinstance(value, str) and value.endswith(extension)]
+
+def register(atlas: Atlas, cache: common.AssetCache) -> Atlas:
+    for path in atlas.index:
+        cache.add(path, atlas.subsurface(path))
+    return atlas
+
+def build_atlases(cache: common.AssetCache = common.ASSETS) -> Tuple[Atlas, Atlas]:
+    # One opaque atlas for the JPG tiles, one alpha atlas for the PNG
+    # characters, registered with the asset cache so load_asset hands out
+    # atlas-backed surfaces from then on
+    return (register(Atlas(asset_paths('.jpg'), alpha=False), cache),
+            register(Atlas(asset_paths('.png'), alpha=True), cache))
+
+def defer_atlases(cache: common.AssetCache = common.ASSETS) -> None:
+    # Same atlases as build_atlases, but each is only decoded and packed
+    # when load_asset first asks for one of its images: the tiles while the
+    # map loads, the characters when the first frame draws them
+    for extension, alpha in (('.jpg', False), ('.png', True)):
+        paths: List[str] = asset_paths(extension)
+        def load(paths: List[str] = paths, alpha: bool = alpha) -> None:
+            register(Atlas(paths, alpha), cache)
+        cache.defer(paths, load)
+
+def frame_index(characters: Atlas) -> Dict[Tuple[str, int, int], pg.Rect]:
+    # (character name, animation frame, direction index) -> rect in the character
+    # atlas. PacMan's death frames use the name 'PacMan death' and direction 0
+    frames: Dict[Tuple[str, int, int], pg.Rect] = {}
+    for frame, paths in enumerate(PacMan.BODY_FRAMES):
+        for direction, path in enumerate(paths):
+            frames[('PacMan', frame, direction)] = characters.index[path]
+    for frame, path in enumerate(PacMan.DEATH_FRAMES):
+        frames[('PacMan death', frame, 0)] = characters.index[path]
+    for name, ghost_frames in Ghost.BODY_FRAMES.items():
+        for frame, paths in enumerate(ghost_frames):
+            for direction, path in enumerate(paths):
+                frames[(name.value, frame, direction)] = characters.index[path]
+    return frames
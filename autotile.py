@@ -0,0 +1,116 @@
+from typing import Dict, List, Set, Tuple
+from collections import deque
+import numpy as np
+import assets
+
+# Every wall autotile() places, index 0 stands for no wall. Tiles holding
+# one of these (or nothing) are the ones it may rewrite, anything else
+# drawn on a wall tile by hand is left alone
+WALL_ASSETS: List[str] = ['', *assets.SINGLE_WALLS, *assets.DOUBLE_WALLS, *assets.SMALL_CORNER_WALLS,
+                          *assets.LARGE_CORNER_WALLS, *assets.DOUBLE_CORNER_WALLS]
+WALL_INDEX: Dict[str, int] = {path: index for index, path in enumerate(WALL_ASSETS)}
+
+# Neighbour mask bits, sides in the low four bits of a key and corners
+# (diagonal neighbours) in the next four. Bit 8 is set on the maze's outline
+N, E, S, W = 1, 2, 4, 8
+NE, SE, SW, NW = 1, 2, 4, 8
+
+# Groups are ordered [left, up, right, down] for walls and
+# [up left, up right, down right, down left] for corners
+_SIDE_INDEX: Dict[int, int] = {W: 0, N: 1, E: 2, S: 3}
+_CORNER_INDEX: Dict[int, int] = {NW: 0, NE: 1, SE: 2, SW: 3}
+_OPPOSITE: Dict[int, int] = {N: S, E: W, S: N, W: E}
+OUTLINE = 1 << 8
+# Two open sides meeting at a corner -> the corner the wall turns towards
+_TURNS: Dict[int, int] = {N | W: SE, N | E: SW, S | E: NW, S | W: NE}
+
+def _variant(open_sides: int, open_corners: int, outline: bool) -> str:
+    # Wall for a tile next to corridors on open_sides and open_corners.
+    # Walls joined to the space outside the maze (or the map edge) are its
+    # outline, drawn with double walls
+    if open_sides in _SIDE_INDEX:
+        # A straight wall: single walls are named after the corridor side,
+        # double walls after the side away from it
+        if outline:
+            return assets.DOUBLE_WALLS[_SIDE_INDEX[_OPPOSITE[open_sides]]]
+        return assets.SINGLE_WALLS[_SIDE_INDEX[open_sides]]
+    if open_sides in _TURNS:
+        return assets.SMALL_CORNER_WALLS[_CORNER_INDEX[_TURNS[open_sides]]]
+    if open_sides == 0:
+        if open_corners == 0:
+            return ''
+        # Only a corner touches a corridor: an inner corner, or the maze's outline turning
+        corner: int = open_corners & -open_corners
+        group: List[str] = assets.DOUBLE_CORNER_WALLS if outline else assets.LARGE_CORNER_WALLS
+        return group[_CORNER_INDEX[corner]]
+    # Thin walls and pillars with corridors on opposite or three sides
+    # have no matching art, the nearest straight wall stands in
+    if open_sides & N:
+        return assets.SINGLE_WALLS[_SIDE_INDEX[N]]
+    return assets.SINGLE_WALLS[_SIDE_INDEX[W]]
+
+# WALL_INDEX of the wall for every key = open sides | open corners << 4 | OUTLINE
+VARIANTS: np.ndarray = np.array([WALL_INDEX[_variant(key & 15, (key >> 4) & 15, bool(key & OUTLINE))] for key in range(1 << 9)], dtype=np.uint8)
+
+def connected(mask: np.ndarray, seeds: List[Tuple[int, int]]) -> np.ndarray:
+    # Tiles of a (rows, columns) bool mask 4-connected to any (row, column)
+    # seed on it. Searched over a flat list, indexing NumPy per tile is slow
+    height, width = mask.shape
+    open_tiles: List[bool] = mask.ravel().tolist()
+    reached: bytearray = bytearray(height * width)
+    queue: deque = deque()
+    for row, column in seeds:
+        tile: int = row * width + column
+        if open_tiles[tile] and not reached[tile]:
+            reached[tile] = 1
+            queue.append(tile)
+    while queue:
+        tile = queue.popleft()
+        column = tile % width
+        for next_tile in (tile - width if tile >= width else -1, tile + width if tile + width < height * width else -1,
+                          tile - 1 if column else -1, tile + 1 if column + 1 < width else -1):
+            if next_tile != -1 and open_tiles[next_tile] and not reached[next_tile]:
+                reached[next_tile] = 1
+                queue.append(next_tile)
+    return np.frombuffer(reached, dtype=bool).reshape(height, width)
+
+def _shifted(padded: np.ndarray, dx: int, dy: int) -> np.ndarray:
+    # Each tile's neighbour dx, dy away, from an array padded by one tile
+    height, width = padded.shape[0] - 2, padded.shape[1] - 2
+    return padded[1 + dy:1 + dy + height, 1 + dx:1 + dx + width]
+
+def neighbour_keys(corridors: np.ndarray) -> np.ndarray:
+    # VARIANTS key of every tile of a (rows, columns) corridor mask, zero
+    # where no corridor is near. Outside the map counts as outside the maze
+    padded: np.ndarray = np.pad(corridors, 1)
+    sides: np.ndarray = (_shifted(padded, 0, -1) * N | _shifted(padded, 1, 0) * E |
+                         _shifted(padded, 0, 1) * S | _shifted(padded, -1, 0) * W).astype(np.uint16)
+    corners: np.ndarray = (_shifted(padded, 1, -1) * NE | _shifted(padded, 1, 1) * SE |
+                           _shifted(padded, -1, 1) * SW | _shifted(padded, -1, -1) * NW).astype(np.uint16)
+    walls: np.ndarray = ~corridors & ((sides | corners) != 0)
+
+    # Empty space reachable from the edge of the map is outside the maze,
+    # space walled in (like the ghost pen) is inside it. Every wall joined
+    # to a wall touching the outside is part of the outline
+    empty: np.ndarray = ~corridors & ~walls
+    height, width = corridors.shape
+    edge: List[Tuple[int, int]] = ([(row, column) for row in (0, height - 1) for column in range(width)] +
+                                   [(row, column) for row in range(height) for column in (0, width - 1)])
+    outside: np.ndarray = np.pad(connected(empty, edge), 1, constant_values=True)
+    touching: np.ndarray = walls & (_shifted(outside, 0, -1) | _shifted(outside, 1, 0) | _shifted(outside, 0, 1) | _shifted(outside, -1, 0))
+    outline: np.ndarray = connected(walls, [tuple(tile) for tile in np.argwhere(touching)])
+    return np.where(walls, sides | corners << 4 | outline * OUTLINE, 0)
+
+def autotile(map_assets: List[Tuple[str, bool]], dims: Tuple[int, int]) -> List[Tuple[int, Tuple[str, bool]]]:
+    # Walls around the map's legal tiles, as (node number, tile) for just
+    # the tiles that change. Legal tiles are the corridors and never change
+    corridors: np.ndarray = np.array([legal for _, legal in map_assets], dtype=bool).reshape(dims[1], dims[0])
+    walls: np.ndarray = VARIANTS[neighbour_keys(corridors)].ravel()
+    current: np.ndarray = np.array([WALL_INDEX.get(path, -1) if not legal else -1 for path, legal in map_assets], dtype=np.int16)
+    changed: np.ndarray = np.flatnonzero((current != -1) & (current != walls))
+    return [(int(node), (WALL_ASSETS[walls[node]], False)) for node in changed]
+
+def corridor_tile(tile: Tuple[str, bool]) -> Tuple[str, bool]:
+    # A tile painted as corridor: legal, with a pellet unless it already has one
+    pellets: Set[str] = set(assets.PELLETS)
+    return (tile[0] if tile[0] in pellets else assets.PELLET, True)
@@ -0,0 +1,365 @@
+from typing import Dict, List, Tuple
+import numpy as np
+from characters import Character, Ghost
+from mapfile import MapData
+import common
+import game
+import mapfile
+import movement
+
+# Direction codes, matching Character.direction_to_index() with NONE last
+RIGHT, DOWN, LEFT, UP, NONE = 0, 1, 2, 3, 4
+DIRECTION_CODES: Dict[Character.Direction, int] = {
+    Character.Direction.RIGHT: RIGHT,
+    Character.Direction.DOWN: DOWN,
+    Character.Direction.LEFT: LEFT,
+    Character.Direction.UP: UP,
+    Character.Direction.NONE: NONE,
+}
+
+# Mode codes (Ghost.Mode.FRIGHTENED is never entered by the game yet)
+CHASE, SCATTER = 0, 1
+
+# Input codes accepted by BatchGame.step, -1 means no input that tick
+INPUT_CODES: Dict[game.Input, int] = {
+    game.Input.RIGHT: RIGHT,
+    game.Input.DOWN: DOWN,
+    game.Input.LEFT: LEFT,
+    game.Input.UP: UP,
+    game.Input.SCATTER: 5,
+    game.Input.CHASE: 6,
+}
+NO_INPUT = -1
+
+BLINKY, PINKY, INKY, CLYDE = 0, 1, 2, 3
+GHOST_NAMES: List[Ghost.Name] = [setup[0] for setup in game.GHOST_SETUP]
+
+# Tile offsets of Pinky's (4 tiles) and Inky's (2 tiles) look-ahead per pacman direction code
+def _look_ahead(tiles: int, width: int) -> np.ndarray:
+    return np.array([tiles, width*tiles, -tiles, -width*tiles, 0], dtype=np.int64)
+
+class BatchGame:
+    '''
+    N independent games stepped together. Every rule mirrors game.step and
+    the PacMan/Ghost methods it calls, one ghost at a time in GHOST_SETUP
+    order so that in-tick ordering (Inky reading Blinky's new tile, a catch
+    freezing the ghosts after it) is kept.
+    '''
+    def __init__(self, map_data: MapData, num_games: int):
+        template: game.GameState = game.GameState(map_data)
+        num_tiles: int = len(map_data)
+        # Map size (W, H) the tile numbers are relative to
+        self.dims: Tuple[int, int] = template.dims
+        tile_w: int = self.dims[0]
+
+        self.num_games: int = num_games
+        self.num_tiles: int = num_tiles
+        self.tick: int = 0
+
+        self.legal: np.ndarray = np.zeros(num_tiles, dtype=bool)
+        self.legal[list(template.legal_space)] = True
+
+        # Pixel position of every tile's top left corner, and the sub-pixel
+        # position of its centre that characters move between
+        tile_nums: np.ndarray = np.arange(num_tiles, dtype=np.int64)
+        self._tile_pos: np.ndarray = np.stack([(tile_nums % tile_w) * common.TILE_SIZE[0], (tile_nums // tile_w) * common.TILE_SIZE[1]], axis=1)
+        self._tile_centre: np.ndarray = (self._tile_pos + common.OFFSET) * movement.SUBPIXELS
+        self._tunnel: np.ndarray = np.zeros(num_tiles, dtype=bool)
+        self._tunnel[list(template.tunnel_tiles)] = True
+
+        # Both characters move over the same neighbour table as the scalar game
+        neighbours: np.ndarray = np.frombuffer(template.neighbours.neighbours, dtype=np.int32).astype(np.int64).reshape(num_tiles, 4)
+
+        # PacMan.move_to_next_node as a (tile, direction code) -> tile table
+        self._pac_next: np.ndarray = np.concatenate([np.where(neighbours >= 0, neighbours, tile_nums[:, None]), tile_nums[:, None]], axis=1)
+
+        # Ghost move candidates in slot order: the pixel position distances are
+        # measured from and the tile it stands for (-1 when not legal)
+        offsets: np.ndarray = np.array([(common.TILE_SIZE[0], 0), (0, common.TILE_SIZE[1]), (-common.TILE_SIZE[0], 0), (0, -common.TILE_SIZE[1])], dtype=np.int64)
+        self._cand_pos: np.ndarray = self._tile_pos[:, None, :] + offsets[None, :, :]
+        self._cand_node: np.ndarray = neighbours
+        self._cand_legal: np.ndarray = neighbours >= 0
+
+        pellet_row: np.ndarray = np.zeros(num_tiles, dtype=bool)
+        pellet_row[list(template.dots)] = True
+        power_row: np.ndarray = np.zeros(num_tiles, dtype=bool)
+        power_row[list(template.energizers)] = True
+        self.dots: np.ndarray = np.repeat(pellet_row[None, :], num_games, axis=0)
+        self.energizers: np.ndarray = np.repeat(power_row[None, :], num_games, axis=0)
+        self.dots_eaten: np.ndarray = np.zeros(num_games, dtype=np.int64)
+        self.score: np.ndarray = np.zeros(num_games, dtype=np.int64)
+
+        pacman = template.pacman
+        self.pac_tile: np.ndarray = np.full(num_games, pacman.current_tile, dtype=np.int64)
+        self.pac_dir: np.ndarray = np.full(num_games, DIRECTION_CODES[pacman.direction], dtype=np.int64)
+        self.pac_pos: np.ndarray = np.tile(np.array(pacman.subpixel_pos, dtype=np.int64), (num_games, 1))
+        self.pac_target_pos: np.ndarray = self.pac_pos.copy()
+        self.pac_speed: int = pacman.speed
+
+        ghosts: List[Ghost] = list(template.ghosts.values())
+        num_ghosts: int = len(ghosts)
+        self.ghost_tile: np.ndarray = np.tile(np.array([g.current_tile for g in ghosts], dtype=np.int64), (num_games, 1))
+        self.ghost_prev: np.ndarray = np.full((num_games, num_ghosts), -1, dtype=np.int64)
+        self.ghost_target: np.ndarray = np.tile(np.array([g.target_node for g in ghosts], dtype=np.int64), (num_games, 1))
+        self.ghost_dir: np.ndarray = np.tile(np.array([DIRECTION_CODES[g.direction] for g in ghosts], dtype=np.int64), (num_games, 1))
+        self.ghost_mode: np.ndarray = np.full((num_games, num_ghosts), CHASE, dtype=np.int64)
+        self.ghost_in_pen: np.ndarray = np.tile(np.array([g.in_monster_pen() for g in ghosts], dtype=bool), (num_games, 1))
+        self.ghost_oscillation: np.ndarray = np.zeros((num_games, num_ghosts), dtype=np.int64)
+        self.ghost_pos: np.ndarray = np.tile(np.array([g.subpixel_pos for g in ghosts], dtype=np.int64), (num_games, 1, 1))
+        self.ghost_target_pos: np.ndarray = self.ghost_pos.copy()
+        self.ghost_speed: np.ndarray = np.array([g.speed for g in ghosts], dtype=np.int64)
+        self.ghost_tunnel_speed: np.ndarray = np.array([g.tunnel_speed for g in ghosts], dtype=np.int64)
+        self._scatter_targets: np.ndarray = np.array([game.tile_at(setup[1], tile_w) for setup in game.GHOST_SETUP], dtype=np.int64)
+        self._dot_limits: np.ndarray = np.array([g.dot_limit for g in ghosts], dtype=np.int64)
+        self._pen_y_oscillation: int = 10
+
+        self.pause_before_death: np.ndarray = np.zeros(num_games, dtype=bool)
+        self.curr_pause_frame: np.ndarray = np.zeros(num_games, dtype=np.int64)
+        # Once dying, the scalar game clears its ghosts, so the batch stops simulating that game
+        self.dying: np.ndarray = np.zeros(num_games, dtype=bool)
+        # Index into GHOST_NAMES of the ghost that caught pacman, -1 if none did
+        self.caught_by: np.ndarray = np.full(num_games, -1, dtype=np.int64)
+
+        # Every game's starting row of each per-game array, for reset()
+        self._start: Dict[str, np.ndarray] = {name: getattr(self, name)[0].copy() for name in BatchGame.PER_GAME}
+
+    # Arrays with one row per game, everything reset() puts back
+    PER_GAME: List[str] = ['dots', 'energizers', 'dots_eaten', 'score', 'pac_tile', 'pac_dir', 'pac_pos', 'pac_target_pos',
+                           'ghost_tile', 'ghost_prev', 'ghost_target', 'ghost_dir', 'ghost_mode', 'ghost_in_pen', 'ghost_oscillation',
+                           'ghost_pos', 'ghost_target_pos', 'pause_before_death', 'curr_pause_frame', 'dying', 'caught_by']
+
+    def reset(self, games: np.ndarray) -> None:
+        # Starts the selected games over, as a new game.GameState on the map would
+        for name, start in self._start.items():
+            getattr(self, name)[games] = start
+
+    def is_over(self) -> np.ndarray:
+        return self.dying | ~(self.dots.any(axis=1) | self.energizers.any(axis=1))
+
+    def apply_inputs(self, inputs: np.ndarray) -> None:
+        alive: np.ndarray = ~self.dying
+        turning: np.ndarray = alive & (inputs >= RIGHT) & (inputs <= UP)
+        self.pac_dir[turning] = inputs[turning]
+
+        scatter: np.ndarray = alive & (inputs == INPUT_CODES[game.Input.SCATTER])
+        self.ghost_mode[scatter] = SCATTER
+        self.ghost_target[scatter] = self._scatter_targets
+        self.ghost_mode[alive & (inputs == INPUT_CODES[game.Input.CHASE])] = CHASE
+
+    def choose_target_tiles(self, ghost: int, games: np.ndarray) -> None:
+        # Ghost.choose_target_tile for one ghost across the selected games
+        games = games & (self.ghost_mode[:, ghost] != SCATTER) & ~self.ghost_in_pen[:, ghost]
+        pac_tile: np.ndarray = self.pac_tile[games]
+
+        if ghost == BLINKY:
+            target: np.ndarray = pac_tile
+        elif ghost == PINKY:
+            target = pac_tile + _look_ahead(4, self.dims[0])[self.pac_dir[games]]
+        elif ghost == INKY:
+            blinky_pos: np.ndarray = self._node_to_pos(self.ghost_tile[games, BLINKY])
+            offset_pos: np.ndarray = self._node_to_pos(pac_tile + _look_ahead(2, self.dims[0])[self.pac_dir[games]])
+            target = self._pos_to_node(blinky_pos + 2 * (offset_pos - blinky_pos))
+        else:
+            delta: np.ndarray = self._node_to_pos(pac_tile) - self._node_to_pos(self.ghost_tile[games, ghost])
+            # dist / TILE_SIZE >= 8 without the square root, exact for integer pixel deltas
+            far: np.ndarray = (delta ** 2).sum(axis=1) >= (8 * common.TILE_SIZE[0]) ** 2
+            target = np.where(far, pac_tile, self._scatter_targets[ghost])
+
+        self.ghost_target[games, ghost] = target
+
+    def step(self, inputs: np.ndarray | None = None) -> None:
+        if inputs is not None:
+            self.apply_inputs(inputs)
+
+        live: np.ndarray = ~self.dying
+
+        # PACMAN
+        speed: np.ndarray = np.where(live & ~self.pause_before_death, self.pac_speed, 0)
+        while speed.any():
+            arrived: np.ndarray = (speed > 0) & (self.pac_pos == self.pac_target_pos).all(axis=1)
+            self.pac_tile[arrived] = self._pac_next[self.pac_tile[arrived], self.pac_dir[arrived]]
+            self.pac_target_pos[arrived] = self._tile_centre[self.pac_tile[arrived]]
+            speed = self._advance(self.pac_pos, self.pac_target_pos, speed)
+
+        rows: np.ndarray = np.arange(self.num_games)
+        ate_dot: np.ndarray = live & self.dots[rows, self.pac_tile]
+        ate_power: np.ndarray = live & ~ate_dot & self.energizers[rows, self.pac_tile]
+        self.dots[rows[ate_dot], self.pac_tile[ate_dot]] = False
+        self.energizers[rows[ate_power], self.pac_tile[ate_power]] = False
+        self.score += ate_dot * game.PELLET_SCORE + ate_power * game.POWER_PELLET_SCORE
+        self.dots_eaten += ate_dot | ate_power
+
+        # GHOSTS
+        for ghost in range(len(GHOST_NAMES)):
+            self.choose_target_tiles(ghost, live)
+
+            moving = live & ~self.pause_before_death
+            in_pen: np.ndarray = self.ghost_in_pen[:, ghost]
+            self._oscillate(ghost, moving & in_pen)
+            self._move_ghost(ghost, moving & ~in_pen)
+
+            self.ghost_in_pen[live & (self.dots_eaten >= self._dot_limits[ghost]), ghost] = False
+
+            caught: np.ndarray = live & ~self.ghost_in_pen[:, ghost] & (self.ghost_tile[:, ghost] == self.pac_tile)
+            self.caught_by[caught & ~self.pause_before_death] = ghost
+            self.pause_before_death |= caught
+
+        self.curr_pause_frame += live & self.pause_before_death
+        self.dying |= self.curr_pause_frame >= game.PAUSE_FRAMES
+        self.tick += 1
+
+    def _move_ghost(self, ghost: int, games: np.ndarray) -> None:
+        # Ghost.smooth_move outside the pen, deciding the next tile for every
+        # game whose ghost is on a tile centre with speed left
+        pos: np.ndarray = self.ghost_pos[:, ghost]
+        target_pos: np.ndarray = self.ghost_target_pos[:, ghost]
+
+        tile_speed: np.ndarray = np.where(self._tunnel[self.ghost_tile[:, ghost]], self.ghost_tunnel_speed[ghost], self.ghost_speed[ghost])
+        speed: np.ndarray = np.where(games, tile_speed, 0)
+        while speed.any():
+            moving: np.ndarray = speed > 0
+            self._decide(ghost, np.flatnonzero(moving & (pos == target_pos).all(axis=1)))
+
+            dx: np.ndarray = target_pos[:, 0] - pos[:, 0]
+            dy: np.ndarray = target_pos[:, 1] - pos[:, 1]
+            direction: np.ndarray = np.select([dx < 0, dx > 0, dy < 0, dy > 0], [LEFT, RIGHT, UP, DOWN], self.ghost_dir[:, ghost])
+            self.ghost_dir[moving, ghost] = direction[moving]
+
+            speed = self._advance(pos, target_pos, speed)
+
+    def _decide(self, ghost: int, arrived: np.ndarray) -> None:
+        # Ghost.move_to_next_node for the games (indices) in arrived
+        tile: np.ndarray = self.ghost_tile[arrived, ghost]
+        legal: np.ndarray = self._cand_legal[tile] & (self._cand_node[tile] != self.ghost_prev[arrived, ghost][:, None])
+        # Squared distances order the candidates the same way as Ghost's square roots do
+        delta: np.ndarray = self._cand_pos[tile] - self._node_to_pos(self.ghost_target[arrived, ghost])[:, None, :]
+        dist: np.ndarray = np.where(legal, (delta ** 2).sum(axis=2), np.iinfo(np.int64).max)
+        # argmin keeps the first minimum, like the strict '<' in the scalar loop
+        choice: np.ndarray = dist.argmin(axis=1)
+        has_move: np.ndarray = legal.any(axis=1)
+
+        self.ghost_prev[arrived, ghost] = tile
+        self.ghost_tile[arrived, ghost] = np.where(has_move, self._cand_node[tile, choice], tile)
+        self.ghost_target_pos[arrived, ghost] = self._tile_centre[self.ghost_tile[arrived, ghost]]
+
+    def _oscillate(self, ghost: int, games: np.ndarray) -> None:
+        # Ghost.smooth_move inside the pen, only the bobbing direction is simulated
+        direction: np.ndarray = self.ghost_dir[:, ghost]
+        oscillation: np.ndarray = self.ghost_oscillation[:, ghost]
+
+        flip: np.ndarray = games & (np.abs(oscillation) >= self._pen_y_oscillation)
+        flip_down: np.ndarray = flip & (direction == UP)
+        flip_up: np.ndarray = flip & (direction == DOWN)
+        direction[flip_down] = DOWN
+        direction[flip_up] = UP
+        oscillation[games & (direction == UP)] -= 1
+        oscillation[games & (direction == DOWN)] += 1
+
+        self.ghost_dir[:, ghost] = direction
+        self.ghost_oscillation[:, ghost] = oscillation
+
+    @staticmethod
+    def _advance(pos: np.ndarray, target_pos: np.ndarray, speed: np.ndarray) -> np.ndarray:
+        # movement.advance for every game at once (games with speed 0 stay
+        # put), returning the speed each has left over
+        delta: np.ndarray = target_pos - pos
+        distance: np.ndarray = np.abs(delta).sum(axis=1)
+        step: np.ndarray = np.minimum(distance, speed)
+        pos += np.sign(delta) * step[:, None]
+        return np.where(distance > 0, speed - step, 0)
+
+    def _node_to_pos(self, nodes: np.ndarray) -> np.ndarray:
+        # common.node_number_to_cursor_pos, floor semantics included for off-map nodes
+        width: int = self.dims[0]
+        return np.stack([(nodes % width) * common.TILE_SIZE[0], (nodes // width) * common.TILE_SIZE[1]], axis=1)
+
+    def _pos_to_node(self, pos: np.ndarray) -> np.ndarray:
+        # common.cursor_pos_to_node_number, including its float scaling and truncation
+        width, height = self.dims
+        map_size: Tuple[int, int] = (width * common.TILE_SIZE[0], height * common.TILE_SIZE[1])
+        node_x: np.ndarray = np.trunc((pos[:, 0] / map_size[0]) * width).astype(np.int64) * common.TILE_SIZE[0]
+        node_y: np.ndarray = np.trunc((pos[:, 1] / map_size[1]) * height).astype(np.int64) * common.TILE_SIZE[1]
+        return node_x // common.TILE_SIZE[0] + (node_y // common.TILE_SIZE[1]) * width
+
+def cross_check(map_data: MapData, num_games: int = 32, num_ticks: int = 3000, seed: int = 0) -> int:
+    '''
+    Steps scalar game.GameState objects and one BatchGame side by side on
+    the same seeded random inputs and raises AssertionError on the first
+    tick where they disagree. Games that end start over in both, so every
+    tick is compared. Returns the number of (game, tick) pairs compared.
+    '''
+    rng: np.random.Generator = np.random.default_rng(seed)
+    batch: BatchGame = BatchGame(map_data, num_games)
+    states: List[game.GameState] = [game.GameState(map_data) for _ in range(num_games)]
+    input_list: List[game.Input] = list(INPUT_CODES)
+    input_codes: np.ndarray = np.array([INPUT_CODES[i] for i in input_list])
+    compared: int = 0
+
+    for tick in range(num_ticks):
+        for i in np.flatnonzero(batch.is_over()):
+            assert states[i].pacman.is_dying() or states[i].is_over(), f'game {i} tick {tick}: batch ended a game still going'
+            _check_decisions(i, states[i])
+            states[i] = game.GameState(map_data)
+        batch.reset(batch.is_over())
+
+        # A turn on a fifth of the ticks keeps pacman moving through the
+        # maze (without input he idles at the start until caught), with
+        # rarer mode switches
+        choice: np.ndarray = rng.integers(0, len(input_list), num_games)
+        send: np.ndarray = rng.random(num_games) < np.where(choice < 4, 0.2, 0.01)
+        codes: np.ndarray = np.where(send, input_codes[choice], NO_INPUT)
+
+        batch.step(codes)
+        for i, state in enumerate(states):
+            game.step(state, [input_list[choice[i]]] if send[i] else [])
+            if state.pacman.is_dying():
+                assert batch.dying[i], f'game {i} tick {tick}: batch missed the death'
+                continue
+
+            where: str = f'game {i} tick {tick}'
+            assert batch.pac_tile[i] == state.pacman.current_tile, where
+            assert tuple(batch.pac_pos[i]) == state.pacman.subpixel_pos, where
+            assert batch.score[i] == state.score, where
+            assert batch.pause_before_death[i] == state.pause_before_death, where
+            for g, ghost in enumerate(state.ghosts.values()):
+                assert batch.ghost_tile[i, g] == ghost.current_tile, f'{where} {ghost.name}'
+                assert batch.ghost_target[i, g] == ghost.target_node, f'{where} {ghost.name}'
+                assert tuple(batch.ghost_pos[i, g]) == ghost.subpixel_pos, f'{where} {ghost.name}'
+                assert batch.ghost_dir[i, g] == DIRECTION_CODES[ghost.direction], f'{where} {ghost.name}'
+                assert batch.ghost_in_pen[i, g] == ghost.in_monster_pen(), f'{where} {ghost.name}'
+            compared += 1
+
+    for i, state in enumerate(states):
+        _check_decisions(i, state)
+    return compared
+
+def _check_decisions(game_index: int, state: game.GameState) -> None:
+    # The ghosts' cached junction decisions must be what working them out again gives
+    for tile, previous_tile, target_tile, decision in state.neighbours.cached_decisions():
+        assert decision == state.neighbours.closest_neighbour(tile, previous_tile, target_tile), f'game {game_index}: cached decision at tile {tile} from {previous_tile} towards {target_tile}'
+
+def main() -> None:
+    import sys
+    import time
+
+    map_data: MapData = mapfile.load_map('maps/pacmap.txt')
+    if len(sys.argv) > 1 and sys.argv[1] == '--check':
+        print(f'batch matches scalar game on {cross_check(map_data)} game ticks')
+        return
+
+    # Throughput run: N games with random turns every few ticks
+    num_games: int = int(sys.argv[1]) if len(sys.argv) > 1 else 4096
+    num_ticks: int = 1000
+    rng: np.random.Generator = np.random.default_rng(0)
+    batch: BatchGame = BatchGame(map_data, num_games)
+
+    start: float = time.perf_counter()
+    for _ in range(num_ticks):
+        turns: np.ndarray = rng.integers(RIGHT, UP + 1, num_games)
+        batch.step(np.where(rng.random(num_games) < 0.05, turns, NO_INPUT))
+    elapsed: float = time.perf_counter() - start
+
+    print(f'{num_games} games x {num_ticks} ticks in {elapsed:.2f}s ({num_games * num_ticks / elapsed:.0f} game ticks/s)')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# Compares the old min()-over-a-set BFS with the deque BFS and the
+# precomputed DistanceTable on the legal tiles of maps/pacmap.txt.
+# Run from the repository root: python -m benchmarks.graph_bench
+from typing import Dict, List, Set, Tuple
+import random
+import time
+from graph import DistanceTable, Graph
+import mapfile
+
+def legacy_bfs(graph: Graph, start_node: int, end_node: int, ignored_nodes: Set[int] = set()) -> List[int]:
+    # Graph.BFS as it was before the deque rewrite (O(V^2) per query)
+    if start_node in ignored_nodes or end_node in ignored_nodes:
+        return []
+
+    path: List[int] = []
+    distance: Dict[int, float] = {}
+    previous: Dict[int, int | None] = {}
+    Q: Set[int] = set()
+
+    for vertex in graph.adj_list.keys():
+        if vertex in ignored_nodes:
+            continue
+        distance[vertex] = float('inf')
+        previous[vertex] = None
+        Q.add(vertex)
+
+    distance[start_node] = 0
+
+    while len(Q) > 0:
+        u = min(Q, key=distance.get)
+        if u == end_node:
+            while previous[u] is not None:
+                path.insert(0, u)
+                u = previous[u]
+            if len(path) > 0:
+                path.insert(0, start_node)
+            break
+        else:
+            Q.remove(u)
+            for v in graph.adj_list[u]:
+                if v in ignored_nodes or v not in Q:
+                    continue
+                alt: float = distance[u] + 1
+                if alt < distance[v]:
+                    distance[v] = alt
+                    previous[v] = u
+
+    return path
+
+def time_queries(label: str, pairs: List[Tuple[int, int]], query) -> float:
+    start: float = time.perf_counter()
+    for start_node, end_node in pairs:
+        query(start_node, end_node)
+    per_query: float = (time.perf_counter() - start) / len(pairs)
+    print(f'  {label:<22} {per_query * 1e6:10.2f} us/query')
+    return per_query
+
+def main() -> None:
+    map_data: mapfile.MapData = mapfile.load_map('maps/pacmap.txt')
+    legal: Set[int] = map_data.legal_tiles()
+    grid: Graph = Graph.from_grid(map_data.width, map_data.height, legal)
+
+    rng: random.Random = random.Random(0)
+    legal_list: List[int] = sorted(legal)
+    pairs: List[Tuple[int, int]] = [(rng.choice(legal_list), rng.choice(legal_list)) for _ in range(200)]
+
+    start: float = time.perf_counter()
+    table: DistanceTable = DistanceTable(grid, legal)
+    build_time: float = time.perf_counter() - start
+
+    # Every implementation must agree on path lengths
+    for start_node, end_node in pairs:
+        expected: int = len(legacy_bfs(grid, start_node, end_node))
+        assert len(grid.BFS(start_node, end_node)) == expected
+        assert len(table.path(start_node, end_node)) == expected
+
+    print(f'{map_data.width}x{map_data.height} map, {len(legal)} legal tiles, {len(pairs)} random pairs')
+    print(f'  DistanceTable build     {build_time * 1e3:10.2f} ms ({table.distance.nbytes + table.next_hop.nbytes} bytes)')
+    legacy: float = time_queries('legacy BFS', pairs, lambda a, b: legacy_bfs(grid, a, b))
+    bfs: float = time_queries('deque BFS', pairs, grid.BFS)
+    path: float = time_queries('DistanceTable.path', pairs, table.path)
+    dist: float = time_queries('DistanceTable.dist', pairs, table.dist)
+    print(f'  speedup vs legacy: BFS x{legacy / bfs:.0f}, path x{legacy / path:.0f}, dist x{legacy / dist:.0f}')
+
+if __name__ == '__main__':
+    main()
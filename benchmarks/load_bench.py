@@ -0,0 +1,61 @@
+# Wall-clock time to decode and convert every image the game loads (all of
+# assets.py plus the map's tiles), one file after another on the main thread
+# and on loader's thread pool, and from the asset bundle when one has been
+# built (python bundle.py). The files are read from the OS cache after the
+# first run, so this measures decoding rather than a cold disk.
+# Run from the repository root:
+#   python -m benchmarks.load_bench
+#   python -m benchmarks.load_bench --map maps/custom.pmap --workers 4
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from typing import List
+import argparse
+import statistics
+import time
+import pygame as pg
+from atlas import asset_paths
+import bundle
+import common
+import loader
+import mapfile
+
+def time_load(paths: List[str], workers: int, repeat: int, use_bundle: bool = False) -> float:
+    # Median seconds for one full load
+    times: List[float] = []
+    for _ in range(repeat):
+        start: float = time.perf_counter()
+        loader.load_converted(paths, workers, use_bundle)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Compare serial and thread pool asset loading')
+    parser.add_argument('--map', default='maps/pacmap.pmap', help='map whose tiles are loaded along with assets.py')
+    parser.add_argument('--workers', type=int, default=loader.WORKERS, help='pool threads (default %(default)s)')
+    parser.add_argument('--repeat', type=int, default=20, help='loads timed per mode, the median counts')
+    args: argparse.Namespace = parser.parse_args()
+
+    pg.init()
+    pg.display.set_mode(common.SCR_SIZE)
+    tiles: List[str] = [path for path, _ in mapfile.load_map(args.map).to_tiles()]
+    paths: List[str] = list(dict.fromkeys(asset_paths('.png') + asset_paths('.jpg') + tiles))
+    paths = [path for path in paths if path]
+    size: int = sum(os.path.getsize(path) for path in paths)
+    print(f'{len(paths)} images, {size / 1024:.0f} KiB, {os.cpu_count()} CPUs')
+
+    serial: float = time_load(paths, 1, args.repeat)
+    pooled: float = time_load(paths, args.workers, args.repeat)
+    print(f'  serial                 {serial * 1e3:8.2f} ms')
+    print(f'  pool ({args.workers} threads){"":<6} {pooled * 1e3:8.2f} ms  x{serial / pooled:.2f}')
+    packed: bundle.Bundle | None = bundle.shared()
+    if packed:
+        bundled: float = time_load(paths, args.workers, args.repeat, use_bundle=True)
+        fresh: int = sum(packed.get(path) is not None for path in paths)
+        print(f'  bundle ({fresh} of {len(paths)}){"":<5} {bundled * 1e3:8.2f} ms  x{serial / bundled:.2f}')
+    else:
+        print(f'  bundle                 no bundle at {bundle.BUNDLE_FILE}')
+    pg.quit()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# Startup benchmark: seconds from launching a fresh interpreter until the
+# splash and the first game frame are on screen, for a direct pacman.main()
+# and for startup.py with Play Game clicked as soon as its window is up.
+# Each launch is a new process so imports and asset loading are cold for
+# Python. Run from the repository root:
+#   python -m benchmarks.startup_time                median of 5 launches each
+#   python -m benchmarks.startup_time --budget 1.0   exit with status 1 when the
+#                                                    first frame takes longer than 1s
+# startup.py needs a display Tk can open, without one it is reported as skipped.
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from typing import Dict, List
+import argparse
+import importlib.abc
+import importlib.machinery
+import importlib.util
+import json
+import statistics
+import subprocess
+import sys
+import time
+
+# What each frame presented counts as, in order
+MILESTONES = ['splash', 'first frame']
+LAUNCHERS = ['pacman', 'startup']
+
+class _DisplayPatcher(importlib.abc.MetaPathFinder):
+    '''
+    Wraps pygame.display.flip and update as pygame gets imported, whenever
+    that is, so the launcher under test pays for its imports as usual. Each
+    presented frame records a milestone, and the process exits after the last.
+    '''
+    def __init__(self, times: Dict[str, float]):
+        self.times: Dict[str, float] = times
+
+    def find_spec(self, name: str, path, target=None) -> importlib.machinery.ModuleSpec | None:
+        if name != 'pygame.display':
+            return None
+        sys.meta_path.remove(self)
+        spec: importlib.machinery.ModuleSpec = importlib.util.find_spec(name)
+        exec_module = spec.loader.exec_module
+
+        def exec_and_patch(module) -> None:
+            exec_module(module)
+            for function in ('flip', 'update'):
+                setattr(module, function, self._timed(getattr(module, function)))
+        spec.loader.exec_module = exec_and_patch
+        return spec
+
+    def _timed(self, present):
+        def timed(*args, **kwargs):
+            result = present(*args, **kwargs)
+            presented: List[str] = [name for name in MILESTONES if name in self.times]
+            self.times[MILESTONES[len(presented)]] = time.time()
+            if len(presented) + 1 == len(MILESTONES):
+                print(json.dumps(self.times), flush=True)
+                os._exit(0)
+            return result
+        return timed
+
+def child(launcher: str) -> None:
+    # Runs one launcher until its first game frame, printing the wall clock
+    # time of each milestone as JSON
+    times: Dict[str, float] = {'interpreter': time.time()}
+    sys.meta_path.insert(0, _DisplayPatcher(times))
+    if launcher == 'pacman':
+        import pacman
+        pacman.main()
+        return
+
+    import runpy
+    import tkinter
+
+    # Click Play Game the moment the options window is running
+    mainloop = tkinter.Tk.mainloop
+    def click_play(root: tkinter.Tk, n: int = 0) -> None:
+        times['options window'] = time.time()
+        root.after_idle(root.grid_slaves(row=0)[0].invoke)
+        mainloop(root, n)
+    tkinter.Tk.mainloop = click_play
+    runpy.run_path('startup.py', run_name='__main__')
+
+def launch(launcher: str) -> Dict[str, float]:
+    # Seconds from starting the process to each milestone
+    started: float = time.time()
+    result: subprocess.CompletedProcess = subprocess.run(
+        [sys.executable, '-m', 'benchmarks.startup_time', '--child', launcher],
+        capture_output=True, text=True)
+    lines: List[str] = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    if not lines:
+        error: List[str] = result.stderr.strip().splitlines()
+        raise RuntimeError(error[-1] if error else f'exited with status {result.returncode}')
+    return {name: t - started for name, t in json.loads(lines[-1]).items()}
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Time game startup in fresh processes')
+    parser.add_argument('--runs', type=int, default=5, help='launches per launcher, the median counts')
+    parser.add_argument('--budget', type=float, default=0.0, help='seconds allowed to the first frame (0 = no limit)')
+    parser.add_argument('--launcher', choices=LAUNCHERS, action='append', help='only time these launchers')
+    parser.add_argument('--child', choices=LAUNCHERS, help=argparse.SUPPRESS)
+    args: argparse.Namespace = parser.parse_args()
+
+    if args.child:
+        child(args.child)
+        return
+
+    over_budget: List[str] = []
+    for launcher in args.launcher or LAUNCHERS:
+        try:
+            runs: List[Dict[str, float]] = [launch(launcher) for _ in range(args.runs)]
+        except RuntimeError as error:
+            print(f'{launcher:<10} skipped: {error}')
+            continue
+
+        medians: Dict[str, float] = {name: statistics.median(run[name] for run in runs) for name in runs[0]}
+        print(f'{launcher:<10} ' + '  '.join(f'{name} {seconds * 1e3:7.1f} ms' for name, seconds in medians.items()))
+        if args.budget and medians['first frame'] > args.budget:
+            over_budget.append(launcher)
+
+    if over_budget:
+        print(f'\nOver the {args.budget:.3f}s startup budget: {", ".join(over_budget)}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
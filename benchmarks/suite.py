@@ -0,0 +1,205 @@
+# Microbenchmarks for the hot paths of the game and the map builder.
+# Runs headless (SDL dummy video driver), writes the results to JSON and
+# compares them against a stored baseline. Run from the repository root:
+#   python -m benchmarks.suite                    run and compare with the baseline
+#   python -m benchmarks.suite --save-baseline    run and store the results as the new baseline
+# Exits with status 1 when a benchmark is slower than the baseline by more
+# than the threshold.
+import os
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+from typing import Callable, Dict, List, Tuple
+import argparse
+import json
+import platform
+import sys
+import timeit
+import pygame as pg
+from characters import Character, Ghost
+from graph import CSRGraph, Graph, JunctionGraph
+import common
+import game
+import map_builder
+import mapfile
+import pacman
+
+BASELINE_FILE = 'benchmarks/baseline.json'
+RESULTS_FILE = 'benchmarks/results.json'
+MAP_FILE = 'maps/pacmap.pmap'
+
+# name -> factory that does the setup and returns the callable to time
+BENCHMARKS: Dict[str, Callable[[], Callable[[], object]]] = {}
+
+def benchmark(name: str):
+    def register(factory: Callable[[], Callable[[], object]]) -> Callable[[], Callable[[], object]]:
+        BENCHMARKS[name] = factory
+        return factory
+    return register
+
+def chasing_state() -> game.GameState:
+    # Every ghost out of the pen and chasing a pacman heading left
+    state: game.GameState = game.GameState(mapfile.load_map(MAP_FILE))
+    state.pacman.direction = Character.Direction.LEFT
+    for ghost in state.ghosts.values():
+        ghost.checkDotCount(state.dot_count)
+    return state
+
+@benchmark('graph.Graph.BFS')
+def bench_bfs() -> Callable[[], object]:
+    map_data: mapfile.MapData = mapfile.load_map(MAP_FILE)
+    legal: List[int] = sorted(map_data.legal_tiles())
+    grid: Graph = Graph.from_grid(map_data.width, map_data.height, set(legal))
+    # Opposite corners of the maze, close to the longest query the game makes
+    return lambda: grid.BFS(legal[0], legal[-1])
+
+@benchmark('graph.JunctionGraph.path')
+def bench_junction_path() -> Callable[[], object]:
+    map_data: mapfile.MapData = mapfile.load_map(MAP_FILE)
+    legal: List[int] = sorted(map_data.legal_tiles())
+    junctions: JunctionGraph = JunctionGraph(CSRGraph.from_map(map_data))
+    # Same query as graph.Graph.BFS
+    return lambda: junctions.path(legal[0], legal[-1])
+
+@benchmark('Ghost.move_to_next_node')
+def bench_ghost_move() -> Callable[[], object]:
+    state: game.GameState = chasing_state()
+    blinky: Ghost = state.ghosts['Blinky']
+    blinky.choose_target_tile(blinky=blinky, pacman=state.pacman)
+    return blinky.move_to_next_node
+
+def bench_choose_target(name: Ghost.Name) -> Callable[[], Callable[[], object]]:
+    def factory() -> Callable[[], object]:
+        state: game.GameState = chasing_state()
+        ghost: Ghost = state.ghosts[name.value]
+        return lambda: ghost.choose_target_tile(blinky=state.ghosts['Blinky'], pacman=state.pacman)
+    return factory
+
+for ghost_name in Ghost.Name:
+    benchmark(f'Ghost.choose_target_tile[{ghost_name.value}]')(bench_choose_target(ghost_name))
+
+@benchmark('game.snapshot')
+def bench_snapshot() -> Callable[[], object]:
+    state: game.GameState = chasing_state()
+    return lambda: game.snapshot(state)
+
+@benchmark('game.restore')
+def bench_restore() -> Callable[[], object]:
+    # Back and forth between snapshots 100 ticks apart, a few pellets each way
+    state: game.GameState = chasing_state()
+    saved: game.Snapshot = game.snapshot(state)
+    for _ in range(100):
+        game.step(state)
+    ahead: game.Snapshot = game.snapshot(state)
+    def restore() -> None:
+        game.restore(state, saved)
+        game.restore(state, ahead)
+    return restore
+
+@benchmark('PacMan.move_to_next_node')
+def bench_pacman_move() -> Callable[[], object]:
+    return chasing_state().pacman.move_to_next_node
+
+@benchmark('common.cursor_pos_to_node_number')
+def bench_cursor_pos() -> Callable[[], object]:
+    return lambda: common.cursor_pos_to_node_number((117, 203))
+
+@benchmark('pacman.draw_grid')
+def bench_pacman_draw_grid() -> Callable[[], object]:
+    screen: pg.Surface = pg.display.get_surface()
+    map_assets: List[Tuple[pg.Surface | None, bool]] = pacman.load_map_from_file(MAP_FILE)
+    return lambda: pacman.draw_grid(screen, map_assets)
+
+@benchmark('pacman.load_map_from_file')
+def bench_load_map() -> Callable[[], object]:
+    # Tile images are already in the asset cache after the first call, this
+    # measures reading the map and looking its assets up
+    return lambda: pacman.load_map_from_file(MAP_FILE)
+
+@benchmark('pacman.pellets')
+def bench_pellets() -> Callable[[], object]:
+    map_data: mapfile.MapData = mapfile.load_map(MAP_FILE)
+    return lambda: pacman.pellets(map_data)
+
+@benchmark('pacman.power_pellets')
+def bench_power_pellets() -> Callable[[], object]:
+    map_data: mapfile.MapData = mapfile.load_map(MAP_FILE)
+    return lambda: pacman.power_pellets(map_data)
+
+@benchmark('map_builder.draw_grid')
+def bench_builder_draw_grid() -> Callable[[], object]:
+    screen: pg.Surface = pg.Surface((map_builder.SCR_SIZE[0] + 1, map_builder.SCR_SIZE[1] + 1)).convert()
+    map_assets: List[Tuple[str, bool]] = map_builder.load_map_from_file(MAP_FILE)
+    return lambda: map_builder.draw_grid(screen, map_assets)
+
+def time_call(fn: Callable[[], object], repeat: int) -> Tuple[float, int]:
+    # Best seconds per call over `repeat` runs, each long enough (>= 0.2s) to time reliably
+    timer: timeit.Timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number, number
+
+def run(names: List[str], repeat: int) -> Dict[str, Dict[str, float]]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name in names:
+        seconds, number = time_call(BENCHMARKS[name](), repeat)
+        results[name] = {'seconds': seconds, 'number': number}
+        print(f'  {name:<40} {seconds * 1e6:12.2f} us')
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    # Names of the benchmarks slower than baseline * (1 + threshold)
+    regressions: List[str] = []
+    print(f'\nCompared with the baseline (threshold +{threshold:.0%}):')
+    for name, result in results.items():
+        if name not in baseline:
+            print(f'  {name:<40} no baseline')
+            continue
+        ratio: float = result['seconds'] / baseline[name]['seconds']
+        regressed: bool = ratio > 1 + threshold
+        if regressed:
+            regressions.append(name)
+        print(f'  {name:<40} x{ratio:6.2f}{"  REGRESSION" if regressed else ""}')
+    return regressions
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Run the microbenchmark suite')
+    parser.add_argument('--output', default=RESULTS_FILE, help='where to write the results JSON')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline results JSON to compare with')
+    parser.add_argument('--threshold', type=float, default=0.25, help='allowed slowdown before a benchmark counts as a regression (0.25 = 25%%)')
+    parser.add_argument('--repeat', type=int, default=5, help='timing runs per benchmark, the best one counts')
+    parser.add_argument('--filter', default='', help='only run benchmarks whose name contains this')
+    parser.add_argument('--save-baseline', action='store_true', help='store the results as the new baseline')
+    args: argparse.Namespace = parser.parse_args()
+
+    pg.init()
+    pg.display.set_mode(common.SCR_SIZE)
+
+    names: List[str] = [name for name in BENCHMARKS if args.filter in name]
+    print(f'Running {len(names)} benchmarks')
+    report: Dict[str, object] = {
+        'python': platform.python_version(),
+        'pygame': pg.version.ver,
+        'platform': platform.platform(),
+        'results': run(names, args.repeat),
+    }
+    pg.quit()
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f'\nSaved baseline to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f'\nNo baseline at {args.baseline}, run with --save-baseline to create one')
+        return
+    with open(args.baseline) as f:
+        baseline: Dict[str, Dict[str, float]] = json.load(f)['results']
+    regressions: List[str] = compare(report['results'], baseline, args.threshold)
+    if regressions:
+        print(f'\n{len(regressions)} regression(s): {", ".join(regressions)}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
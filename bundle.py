@@ -0,0 +1,151 @@
+import pygame as pg
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+import argparse
+import functools
+import hashlib
+import mmap
+import os
+import struct
+
+# Asset bundle layout (little endian), built by `python bundle.py`:
+#   header   magic 'PBND', version, entry count            (struct HEADER)
+#   index    entry count x (uint16 byte length, utf-8 asset path, struct ENTRY)
+#   pixels   each entry's raw pixel rows, at its offset from the start of the file
+# ENTRY holds the size, modification time and sha256 of the source file the
+# pixels were decoded from, so an edited image is noticed and loaded from the
+# loose file instead. Only a file whose size matches but mtime doesn't is hashed
+MAGIC = b'PBND'
+VERSION = 2
+HEADER = struct.Struct('<4sHI')
+ENTRY = struct.Struct('<32sQqQII4s')
+BUNDLE_FILE = 'images/assets.pbundle'
+
+class Entry(NamedTuple):
+    sha256: bytes
+    file_size: int
+    mtime_ns: int
+    offset: int
+    size: Tuple[int, int]
+    format: str
+
+    def length(self) -> int:
+        return self.size[0] * self.size[1] * len(self.format)
+
+def file_hash(file_path: str) -> bytes:
+    with open(file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+class Bundle:
+    '''
+    A bundle file mapped into memory. get() hands out the pixels of an
+    asset as a memoryview into the mapping, which pg.image.frombuffer wraps
+    without decoding or copying. The mapping stays open for as long as the
+    bundle, and surfaces made from it must not outlive it.
+    '''
+    def __init__(self, file_path: str):
+        with open(file_path, 'rb') as f:
+            self._mapping: mmap.mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view: memoryview = memoryview(self._mapping)
+
+        magic, version, count = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            raise ValueError('Not an asset bundle')
+        if version != VERSION:
+            raise ValueError(f'Unsupported asset bundle version {version}')
+
+        self.index: Dict[str, Entry] = {}
+        offset: int = HEADER.size
+        for _ in range(count):
+            (length,) = struct.unpack_from('<H', self._view, offset)
+            name: str = bytes(self._view[offset + 2:offset + 2 + length]).decode('utf-8')
+            offset += 2 + length
+            sha256, file_size, mtime_ns, pixels_offset, width, height, pixel_format = ENTRY.unpack_from(self._view, offset)
+            offset += ENTRY.size
+            self.index[name] = Entry(sha256, file_size, mtime_ns, pixels_offset, (width, height), pixel_format.rstrip(b'\0').decode('ascii'))
+
+        # path -> mtime_ns of a source file touched since the build but hashed unchanged
+        self._rehashed: Dict[str, int] = {}
+
+    def get(self, asset_path: str) -> Tuple[memoryview, Tuple[int, int], str] | None:
+        # (pixels, size, format), or None if the asset isn't bundled or its file changed since
+        entry: Entry | None = self.index.get(asset_path)
+        if entry is None or not self._unchanged(asset_path, entry):
+            return None
+        return self._view[entry.offset:entry.offset + entry.length()], entry.size, entry.format
+
+    def _unchanged(self, asset_path: str, entry: Entry) -> bool:
+        # A stat is enough unless the file was touched (checked out, copied)
+        # without its size changing, only then is it read and hashed
+        try:
+            stat: os.stat_result = os.stat(asset_path)
+        except OSError:
+            return False
+        if stat.st_size != entry.file_size:
+            return False
+        if stat.st_mtime_ns == entry.mtime_ns or self._rehashed.get(asset_path) == stat.st_mtime_ns:
+            return True
+        if file_hash(asset_path) != entry.sha256:
+            return False
+        self._rehashed[asset_path] = stat.st_mtime_ns
+        return True
+
+    def stale(self) -> List[str]:
+        # Bundled assets whose source file is gone or has changed
+        return [path for path in self.index if self.get(path) is None]
+
+def build(asset_paths: Iterable[str], file_path: str = BUNDLE_FILE) -> int:
+    # Decodes every asset once and writes the bundle, returns its size in bytes
+    paths: List[str] = list(dict.fromkeys(asset_paths))
+    images: Dict[str, pg.Surface] = {path: pg.image.load(path) for path in paths}
+    formats: Dict[str, str] = {path: 'RGBA' if image.get_flags() & pg.SRCALPHA else 'RGB' for path, image in images.items()}
+
+    index: List[bytes] = []
+    pixels: List[bytes] = []
+    offset: int = HEADER.size + sum(2 + len(path.encode('utf-8')) + ENTRY.size for path in paths)
+    for path in paths:
+        data: bytes = pg.image.tobytes(images[path], formats[path])
+        encoded: bytes = path.encode('utf-8')
+        width, height = images[path].get_size()
+        stat: os.stat_result = os.stat(path)
+        index.append(struct.pack('<H', len(encoded)) + encoded +
+                     ENTRY.pack(file_hash(path), stat.st_size, stat.st_mtime_ns, offset, width, height, formats[path].encode('ascii')))
+        pixels.append(data)
+        offset += len(data)
+
+    contents: bytes = b''.join([HEADER.pack(MAGIC, VERSION, len(paths)), *index, *pixels])
+    with open(file_path, 'wb') as f:
+        f.write(contents)
+    return len(contents)
+
+@functools.lru_cache(maxsize=None)
+def shared(file_path: str = BUNDLE_FILE) -> Bundle | None:
+    # The bundle every loader reads from, opened once and kept open. None
+    # when there is no usable bundle, loading then falls back to the loose files
+    try:
+        return Bundle(file_path)
+    except (OSError, ValueError, struct.error):
+        return None
+
+def main() -> None:
+    from atlas import asset_paths
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Pack every image in assets.py into a raw pixel bundle')
+    parser.add_argument('--output', default=BUNDLE_FILE, help='bundle file to write (default %(default)s)')
+    parser.add_argument('--check', action='store_true', help="list the bundle's stale entries instead of building")
+    args: argparse.Namespace = parser.parse_args()
+
+    if args.check:
+        bundle: Bundle | None = shared(args.output)
+        if bundle is None:
+            print(f'No usable bundle at {args.output}')
+            return
+        stale: List[str] = bundle.stale()
+        print(f'{len(bundle.index)} assets, {len(stale)} stale' + ''.join(f'\n  {path}' for path in stale))
+        return
+
+    paths: List[str] = asset_paths('.png') + asset_paths('.jpg')
+    size: int = build(paths, args.output)
+    print(f'Bundled {len(paths)} assets into {args.output} ({size / 1024:.0f} KiB)')
+
+if __name__ == '__main__':
+    main()
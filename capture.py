@@ -0,0 +1,194 @@
+import pygame as pg
+from typing import Dict, List, Tuple
+import numpy as np
+import os
+import queue
+import threading
+import game
+
+class FrameEncoder:
+    '''
+    Writes captured frames, called on FrameCapture's background thread with
+    a surface nothing else touches until write() returns.
+    '''
+    def __init__(self):
+        self.frames: int = 0
+
+    def write(self, surface: pg.Surface) -> None:
+        raise NotImplementedError("Subclasses must implement write method")
+
+    def close(self) -> None:
+        pass
+
+class RawEncoder(FrameEncoder):
+    '''
+    Every frame appended to one file as rgb24 rows, top to bottom, e.g. for
+    ffmpeg -f rawvideo -pix_fmt rgb24 -s WxH -r 60 -i frames.rgb out.mp4
+    '''
+    def __init__(self, file_path: str):
+        super().__init__()
+        self._file = open(file_path, 'wb')
+
+    def write(self, surface: pg.Surface) -> None:
+        # pixels3d is indexed [x, y], the file wants rows
+        pixels: np.ndarray = pg.surfarray.pixels3d(surface)
+        self._file.write(np.ascontiguousarray(pixels.transpose(1, 0, 2)).data)
+        del pixels
+        self.frames += 1
+
+    def close(self) -> None:
+        self._file.close()
+
+class PNGSequenceEncoder(FrameEncoder):
+    '''One numbered PNG file per frame in a directory.'''
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory: str = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, surface: pg.Surface) -> None:
+        pg.image.save(surface, os.path.join(self.directory, f'frame_{self.frames:06d}.png'))
+        self.frames += 1
+
+class FrameCapture:
+    '''
+    Offscreen render target, no window needed (works under the SDL dummy
+    driver). Each frame is drawn into one of a few buffer surfaces between
+    begin() and end(), and end() queues it for the encoder's background
+    thread, so encoding overlaps the simulation and the next frames. A
+    buffer is only drawn into again once the encoder is done with it;
+    begin() waits if the encoder falls that far behind.
+    '''
+    def __init__(self, size: Tuple[int, int], encoder: FrameEncoder | None = None, buffers: int = 4):
+        self.size: Tuple[int, int] = size
+        self.encoder: FrameEncoder | None = encoder
+        self.frames: int = 0
+
+        # pixels3d needs 24 or 32 bit surfaces
+        self._free: queue.Queue[pg.Surface] = queue.Queue()
+        for _ in range(buffers if encoder else 1):
+            self._free.put(pg.Surface(size, 0, 32))
+        self._current: pg.Surface | None = None
+
+        self._pending: queue.Queue[pg.Surface | None] = queue.Queue()
+        self._error: BaseException | None = None
+        self._thread: threading.Thread | None = None
+        if encoder:
+            self._thread = threading.Thread(target=self._encode, name='frame encoder', daemon=True)
+            self._thread.start()
+
+    def begin(self) -> pg.Surface:
+        # The surface to draw the next frame on
+        if self._error:
+            raise RuntimeError('Frame encoder failed') from self._error
+        self._current = self._free.get()
+        return self._current
+
+    def pixels(self) -> np.ndarray:
+        # The frame being captured as a zero-copy [x, y, rgb] view. It locks
+        # the surface, so let go of it before the next begin()
+        return pg.surfarray.pixels3d(self._current)
+
+    def end(self) -> None:
+        if self._current is None:
+            raise RuntimeError('end() without begin()')
+        if self.encoder:
+            self._pending.put(self._current)
+        else:
+            self._free.put(self._current)
+        self._current = None
+        self.frames += 1
+
+    def close(self) -> None:
+        # Waits for every queued frame to be written
+        if self._thread:
+            self._pending.put(None)
+            self._thread.join()
+            self._thread = None
+        if self.encoder:
+            self.encoder.close()
+        if self._error:
+            raise RuntimeError('Frame encoder failed') from self._error
+
+    def _encode(self) -> None:
+        while True:
+            surface: pg.Surface | None = self._pending.get()
+            if surface is None:
+                return
+            try:
+                if not self._error:
+                    self.encoder.write(surface)
+            except BaseException as error:
+                self._error = error
+            self._free.put(surface)
+
+def render_frame(surface: pg.Surface, state: game.GameState, map_assets: List[Tuple[pg.Surface | None, bool]]) -> None:
+    # The whole map as pacman.draw_grid shows it, with the characters on top
+    from pacman import draw_grid
+
+    draw_grid(surface, map_assets)
+    state.pacman.render(surface)
+    for ghost in state.ghosts.values():
+        ghost.render(surface)
+
+def main() -> None:
+    # Renders a recorded session offscreen: python capture.py session.prec --format png --output frames/
+    import argparse
+    import time
+
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    from atlas import defer_atlases
+    from replay import Recording, load_recording, map_hash
+    import common
+    import mapfile
+    import pacman
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Render a recorded PacMan session to video frames without a window')
+    parser.add_argument('recording', help='file written by python pacman.py --record')
+    parser.add_argument('--map', default=pacman.MAP_FILE, help='map the session was played on')
+    parser.add_argument('--format', choices=['raw', 'png', 'none'], default='raw', help="'none' renders without encoding")
+    parser.add_argument('--output', default='frames', help='raw video file, or directory for the PNG frames')
+    parser.add_argument('--every', type=int, default=1, help='capture every Nth simulation tick')
+    args: argparse.Namespace = parser.parse_args()
+    if args.every < 1:
+        parser.error('--every must be at least 1')
+
+    recording: Recording = load_recording(args.recording)
+    map_data: mapfile.MapData = mapfile.load_map(args.map)
+    if map_hash(map_data) != recording.map_hash:
+        raise SystemExit('Recording was made on a different map')
+    common.set_map_dims((map_data.width, map_data.height))
+
+    pg.init()
+    # Only so surfaces can be converted, nothing is drawn to the display
+    pg.display.set_mode((1, 1))
+    defer_atlases()
+    state: game.GameState = game.GameState(map_data, tick_rate=recording.tick_rate, seed=recording.seed)
+    map_assets: List[Tuple[pg.Surface | None, bool]] = pacman.map_assets_from_data(map_data)
+
+    encoders: Dict[str, FrameEncoder | None] = {
+        'raw': RawEncoder(args.output) if args.format == 'raw' else None,
+        'png': PNGSequenceEncoder(args.output) if args.format == 'png' else None,
+        'none': None,
+    }
+    capture: FrameCapture = FrameCapture(common.MAP_SIZE, encoders[args.format])
+
+    inputs: Dict[int, List[game.Input]] = recording.inputs_by_tick()
+    start: float = time.perf_counter()
+    for tick in range(recording.ticks):
+        game.step(state, inputs.get(tick, ()))
+        if state.eaten_tile != -1:
+            map_assets[state.eaten_tile] = (None, True)
+        if tick % args.every == 0:
+            render_frame(capture.begin(), state, map_assets)
+            capture.end()
+    capture.close()
+    elapsed: float = time.perf_counter() - start
+
+    fps: float = capture.frames / elapsed
+    print(f'{capture.frames} frames ({common.MAP_SIZE[0]}x{common.MAP_SIZE[1]}) in {elapsed:.2f}s: '
+          f'{fps:.0f} fps, {fps * args.every / recording.tick_rate:.1f}x real time')
+    pg.quit()
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,13 @@
-from typing import List, Set, Tuple
+from typing import Dict, List, Set, Tuple
 from enum import Enum
 import pygame as pg
+import struct
+from entities import EntityStore
+from navigation import NeighbourTable
 import assets
 import common
+import entities
+import movement
 
 class Character:
     class Direction(Enum):
@@ -12,37 +17,90 @@ class Character:
         LEFT = 'left'
         RIGHT = 'right'
         
-    def __init__(self, current_tile: int, animation_speed: int, direction: 'Character.Direction' = Direction.NONE):
-        self.current_tile: int = current_tile
-        self.direction: Character.Direction = direction
+    # Everything per-tick lives in the entity store, the object itself is a view on one slot
+    __slots__ = ('store', 'slot', 'tick_rate', 'dims', 'color')
+
+    def __init__(self, current_tile: int, animation_speed: int, speed: int, direction: 'Character.Direction' = Direction.NONE, tick_rate: int = common.BASE_TICK_RATE, store: EntityStore | None = None, dims: Tuple[int, int] | None = None):
+        # Speeds (sub-pixels per tick, see movement.speed_for) and animation
+        # timings are scaled so the game plays the same at any tick rate
+        self.tick_rate: int = tick_rate
+        # Size (W, H) of the map current_tile is on, normally its neighbour table's
+        self.dims: Tuple[int, int] = dims if dims else common.TILE_DIMS
         self.color: Tuple[int, int, int, int]
 
-        node_pos = common.node_number_to_cursor_pos(self.current_tile)
-        self.pixel_pos: Tuple[int, int] = (node_pos[0] + common.OFFSET[0], node_pos[1] + common.OFFSET[1])
-        self.target_pixel_pos: Tuple[int, int] = self.pixel_pos[:]
+        # A character created on its own gets a store of its own
+        self.store: EntityStore = store if store is not None else EntityStore(1)
+        x, y = movement.tile_centre(current_tile, self.dims[0])
+        self.slot: int = self.store.add(
+            tile=current_tile,
+            x=x,
+            y=y,
+            direction=DIRECTION_CODES[direction],
+            speed=speed,
+            animation_period=self.ticks_for(animation_speed))
+
+    @property
+    def current_tile(self) -> int:
+        return self.store.tile[self.slot]
+
+    @current_tile.setter
+    def current_tile(self, tile: int) -> None:
+        self.store.tile[self.slot] = tile
+
+    @property
+    def direction(self) -> 'Character.Direction':
+        return DIRECTIONS[self.store.direction[self.slot]]
+
+    @direction.setter
+    def direction(self, direction: 'Character.Direction') -> None:
+        self.store.direction[self.slot] = DIRECTION_CODES[direction]
+
+    @property
+    def speed(self) -> int:
+        # Sub-pixels per tick at normal speed
+        return self.store.speed[self.slot]
+
+    @property
+    def subpixel_pos(self) -> Tuple[int, int]:
+        return self.store.x[self.slot], self.store.y[self.slot]
+
+    @property
+    def pixel_pos(self) -> Tuple[float, float]:
+        return self.store.x[self.slot] / movement.SUBPIXELS, self.store.y[self.slot] / movement.SUBPIXELS
+
+    @property
+    def target_pixel_pos(self) -> Tuple[float, float]:
+        return self.store.target_x[self.slot] / movement.SUBPIXELS, self.store.target_y[self.slot] / movement.SUBPIXELS
+
+    @property
+    def previous_pixel_pos(self) -> Tuple[float, float]:
+        # Position at the start of the current tick, rendering interpolates from it
+        return self.store.previous_x[self.slot] / movement.SUBPIXELS, self.store.previous_y[self.slot] / movement.SUBPIXELS
 
-        self.speed: float = 0.8
-
-        self._animation_speed: int = animation_speed
-        self._animation_frame: int = 0
+    # Implemented Methods #
+    def ticks_for(self, base_ticks: int) -> int:
+        # Number of ticks at this character's tick rate lasting as long as base_ticks at BASE_TICK_RATE
+        return max(1, base_ticks * self.tick_rate // common.BASE_TICK_RATE)
+
+    def render_pos(self, alpha: float = 1.0) -> Tuple[float, float]:
+        # pixel_pos interpolated between the previous and the latest tick
+        if alpha >= 1.0:
+            return self.pixel_pos
+        return (self.previous_pixel_pos[0] + (self.pixel_pos[0] - self.previous_pixel_pos[0]) * alpha,
+                self.previous_pixel_pos[1] + (self.pixel_pos[1] - self.previous_pixel_pos[1]) * alpha)
     
     # Implemented Methods #
     def direction_to_index(self) -> int:
-        match self.direction:
-            case Character.Direction.UP:
-                return 3
-            case Character.Direction.DOWN:
-                return 1
-            case Character.Direction.LEFT:
-                return 2
-            case Character.Direction.RIGHT:
-                return 0
-            case _:
-                return 0
+        # Store codes are the sprite indices, RIGHT (0) stands in for NONE
+        code: int = self.store.direction[self.slot]
+        return code if code != entities.NONE else 0
     
     # Abstract Methods #
     def render(self, screen: pg.Surface) -> None:
         raise NotImplementedError("Subclasses must implement render method")
+
+    def sprite(self, alpha: float = 1.0) -> Tuple[pg.Surface, Tuple[int, int]] | None:
+        raise NotImplementedError("Subclasses must implement sprite method")
     
     def animate(self) -> None:
         raise NotImplementedError("Subclasses must implement animate method")
@@ -56,121 +114,144 @@ class Character:
     def get_image(self) -> pg.Surface:
         raise NotImplementedError("Subclasses must implement get_image method")
 
-class PacMan(Character):
-    def __init__(self, current_tile: int, legal_tiles: Set[int]):
-        super().__init__(current_tile, animation_speed=3)
+# Character.Direction <-> the direction code kept in the entity store
+DIRECTION_CODES: Dict[Character.Direction, int] = {
+    Character.Direction.RIGHT: entities.RIGHT,
+    Character.Direction.DOWN: entities.DOWN,
+    Character.Direction.LEFT: entities.LEFT,
+    Character.Direction.UP: entities.UP,
+    Character.Direction.NONE: entities.NONE,
+}
+DIRECTIONS: List[Character.Direction] = sorted(DIRECTION_CODES, key=DIRECTION_CODES.get)
 
+class PacMan(Character):
+    # Asset paths indexed by [animation frame][direction index]
+    BODY_FRAMES: List[List[str]] = [
+        [assets.PACMAN1, assets.PACMAN1, assets.PACMAN1, assets.PACMAN1],
+        [assets.PACMAN2_RIGHT, assets.PACMAN2_DOWN, assets.PACMAN2_LEFT, assets.PACMAN2_UP],
+        [assets.PACMAN3_RIGHT, assets.PACMAN3_DOWN, assets.PACMAN3_LEFT, assets.PACMAN3_UP],
+    ]
+    DEATH_FRAMES: List[str] = [
+        assets.PACMAN_DEATH_1,
+        assets.PACMAN_DEATH_2,
+        assets.PACMAN_DEATH_3,
+        assets.PACMAN_DEATH_4,
+        assets.PACMAN_DEATH_5,
+        assets.PACMAN_DEATH_6,
+        assets.PACMAN_DEATH_7,
+        assets.PACMAN_DEATH_8,
+        assets.PACMAN_DEATH_9,
+        assets.PACMAN_DEATH_10,
+        assets.PACMAN_DEATH_11
+    ]
+
+    # dying, dead, death animation frame
+    SNAPSHOT = struct.Struct('<??i')
+
+    __slots__ = ('legal_tiles', 'neighbours', 'frightened_speed', '_dying', '_dead', '_death_animation_frame', '_body_animation', '_death_animation')
+
+    def __init__(self, current_tile: int, legal_tiles: Set[int], neighbours: NeighbourTable | None = None, tick_rate: int = common.BASE_TICK_RATE, store: EntityStore | None = None, level: int = 1):
         self.legal_tiles: Set[int] = legal_tiles
+        self.neighbours: NeighbourTable = neighbours if neighbours else NeighbourTable(legal_tiles)
+
+        super().__init__(current_tile, animation_speed=3, speed=movement.speed_for(movement.PACMAN_SPEEDS, level, tick_rate), tick_rate=tick_rate, store=store, dims=self.neighbours.dims)
+        # Speed while the ghosts are frightened, nothing frightens them yet
+        self.frightened_speed: int = movement.speed_for(movement.PACMAN_FRIGHTENED_SPEEDS, level, tick_rate)
 
         self._dying: bool = False
         self._dead: bool = False
 
-        self._body_animation_frame: int = 0
         self._death_animation_frame: int = 0
 
-        self._body_animation: List[List[pg.Surface]] = [
-            [
-                common.load_asset(assets.PACMAN1),
-                common.load_asset(assets.PACMAN1),
-                common.load_asset(assets.PACMAN1),
-                common.load_asset(assets.PACMAN1),
-            ],
-            [
-                common.load_asset(assets.PACMAN2_RIGHT),
-                common.load_asset(assets.PACMAN2_DOWN),
-                common.load_asset(assets.PACMAN2_LEFT),
-                common.load_asset(assets.PACMAN2_UP),
-            ],
-            [
-                common.load_asset(assets.PACMAN3_RIGHT),
-                common.load_asset(assets.PACMAN3_DOWN),
-                common.load_asset(assets.PACMAN3_LEFT),
-                common.load_asset(assets.PACMAN3_UP),
-            ]
-        ]
-        self._death_animation: List[pg.Surface] = [
-            common.load_asset(assets.PACMAN_DEATH_1),
-            common.load_asset(assets.PACMAN_DEATH_2),
-            common.load_asset(assets.PACMAN_DEATH_3),
-            common.load_asset(assets.PACMAN_DEATH_4),
-            common.load_asset(assets.PACMAN_DEATH_5),
-            common.load_asset(assets.PACMAN_DEATH_6),
-            common.load_asset(assets.PACMAN_DEATH_7),
-            common.load_asset(assets.PACMAN_DEATH_8),
-            common.load_asset(assets.PACMAN_DEATH_9),
-            common.load_asset(assets.PACMAN_DEATH_10),
-            common.load_asset(assets.PACMAN_DEATH_11)
-        ]
+        # Sprites are decoded on first use so the class stays usable
+        # without a display (headless simulation)
+        self._body_animation: List[List[pg.Surface]] = []
+        self._death_animation: List[pg.Surface] = []
+
+    def _load_sprites(self) -> None:
+        self._body_animation = [[common.load_asset(path) for path in frame] for frame in PacMan.BODY_FRAMES]
+        self._death_animation = [common.load_asset(path) for path in PacMan.DEATH_FRAMES]
 
     def render(self, screen: pg.Surface) -> None:
+        sprite = self.sprite()
+        if sprite:
+            common.place_image(screen=screen, image=sprite[0], position=sprite[1])
+
+    def sprite(self, alpha: float = 1.0) -> Tuple[pg.Surface, Tuple[int, int]] | None:
         if self._dead:
-            return
-        
-        position: Tuple[int, int] = (self.pixel_pos[0] - common.TILE_SIZE[0], self.pixel_pos[1] - common.TILE_SIZE[1])
-        common.place_image(screen=screen, image=self.get_image(), position=position)
+            return None
+        return self.get_image(), self.sprite_pos(alpha)
+
+    def sprite_pos(self, alpha: float = 1.0) -> Tuple[float, float]:
+        # Top left corner of the sprite, without loading it
+        pixel_pos: Tuple[float, float] = self.render_pos(alpha)
+        return (pixel_pos[0] - common.TILE_SIZE[0], pixel_pos[1] - common.TILE_SIZE[1])
 
     def get_image(self) -> pg.Surface:
+        if not self._body_animation:
+            self._load_sprites()
         if not self._dying:
-            return self._body_animation[self._body_animation_frame][self.direction_to_index()]
+            return self._body_animation[self.store.frame[self.slot]][self.direction_to_index()]
         return self._death_animation[self._death_animation_frame]
  
     def animate(self) -> None:
         if self._dead:
             return
         
-        self._animation_frame = (self._animation_frame + 1) % self._animation_speed
-        if self._animation_frame == 0:
+        store: EntityStore = self.store
+        slot: int = self.slot
+        store.animation_tick[slot] = (store.animation_tick[slot] + 1) % store.animation_period[slot]
+        if store.animation_tick[slot] == 0:
             if not self._dying:
-                self._body_animation_frame = (self._body_animation_frame + 1) % len(self._body_animation)
+                store.frame[slot] = (store.frame[slot] + 1) % len(PacMan.BODY_FRAMES)
             else:
                 self._death_animation_frame += 1
-                if self._death_animation_frame >= len(self._death_animation):
+                if self._death_animation_frame >= len(PacMan.DEATH_FRAMES):
                     self._dead = True
 
     def slowly_kill(self) -> None:
         self._dying = True
-        self._animation_speed = 8
+        self.store.animation_period[self.slot] = self.ticks_for(8)
     
     def is_dying(self) -> bool:
         return self._dying
 
+    def is_dead(self) -> bool:
+        return self._dead
+
+    def death_frame(self) -> int:
+        return self._death_animation_frame
+
+    def snapshot(self) -> bytes:
+        # State outside the entity store, see game.snapshot
+        return PacMan.SNAPSHOT.pack(self._dying, self._dead, self._death_animation_frame)
+
+    def restore(self, data: bytes) -> None:
+        self._dying, self._dead, self._death_animation_frame = PacMan.SNAPSHOT.unpack(data)
+
     def smooth_move(self, legal_space: Set[int] | None = None) -> None:
         if self._dying:
             return
-        
-        if self.pixel_pos == self.target_pixel_pos:
-            new_node: int = self.move_to_next_node()
-            target_pos = common.node_number_to_cursor_pos(new_node)
-            self.target_pixel_pos = (target_pos[0] + common.OFFSET[0], target_pos[1] + common.OFFSET[1])
-
-        dx = self.target_pixel_pos[0] - self.pixel_pos[0]
-        dy = self.target_pixel_pos[1] - self.pixel_pos[1]
-        dist = (dx ** 2 + dy ** 2) ** 0.5
 
-        if dist > self.speed:
-            self.pixel_pos = (self.pixel_pos[0] + self.speed * dx / dist, self.pixel_pos[1] + self.speed * dy / dist)
-        else:
-            self.pixel_pos = self.target_pixel_pos[:]
+        store: EntityStore = self.store
+        slot: int = self.slot
+        speed: int = store.speed[slot]
+        # Speed left over on reaching a tile centre carries on towards the next tile
+        while speed:
+            if store.x[slot] == store.target_x[slot] and store.y[slot] == store.target_y[slot]:
+                store.target_x[slot], store.target_y[slot] = movement.tile_centre(self.move_to_next_node(), self.dims[0])
+            speed = movement.advance(store, slot, speed)
 
     def move_to_next_node(self, legal_tiles: Set[int] | None = None) -> int:
-        if self.direction == Character.Direction.UP:
-            node_above: int | None = self.current_tile - (common.TILE_DIMS[0]) if self.current_tile >= common.TILE_DIMS[0] else None
-            if node_above in self.legal_tiles:
-                self.current_tile = node_above
-        elif self.direction == Character.Direction.DOWN:
-            node_below: int | None = self.current_tile + (common.TILE_DIMS[0]) if self.current_tile < (common.TILE_DIMS[0] * (common.TILE_DIMS[1] - 1)) else None
-            if node_below in self.legal_tiles:
-                self.current_tile = node_below
-        elif self.direction == Character.Direction.LEFT:
-            node_left: int | None = self.current_tile - 1 if self.current_tile % common.TILE_DIMS[0] > 0 else None
-            if node_left in self.legal_tiles:
-                self.current_tile = node_left
-        elif self.direction == Character.Direction.RIGHT:
-            node_right: int | None = self.current_tile + 1 if self.current_tile % common.TILE_DIMS[0] < (common.TILE_DIMS[0] - 1) else None
-            if node_right in self.legal_tiles:
-                self.current_tile = node_right
-
-        return self.current_tile
+        store: EntityStore = self.store
+        direction: int = store.direction[self.slot]
+        if direction != entities.NONE:
+            # Direction codes are the neighbour table's slots
+            next_node: int = self.neighbours.neighbour(store.tile[self.slot], direction)
+            if next_node != -1:
+                store.tile[self.slot] = next_node
+
+        return store.tile[self.slot]
 
 class Ghost(Character):
     class Name(Enum):
@@ -184,9 +265,50 @@ class Ghost(Character):
         SCATTER = 'scatter'
         FRIGHTENED = 'frightened'
 
-    def __init__(self, name: Name, current_tile: int, scatter_target_node: int, dot_limit: int, direction: Character.Direction = Character.Direction.NONE):
-        super().__init__(current_tile, animation_speed=6, direction=direction)
+    # Asset paths per ghost indexed by [animation frame][direction index]
+    BODY_FRAMES: Dict['Ghost.Name', List[List[str]]] = {
+        Name.BLINKY: [
+            [assets.BLINKY1_RIGHT, assets.BLINKY1_DOWN, assets.BLINKY1_LEFT, assets.BLINKY1_UP],
+            [assets.BLINKY2_RIGHT, assets.BLINKY2_DOWN, assets.BLINKY2_LEFT, assets.BLINKY2_UP],
+        ],
+        Name.PINKY: [
+            [assets.PINKY1_RIGHT, assets.PINKY1_DOWN, assets.PINKY1_LEFT, assets.PINKY1_UP],
+            [assets.PINKY2_RIGHT, assets.PINKY2_DOWN, assets.PINKY2_LEFT, assets.PINKY2_UP],
+        ],
+        Name.INKY: [
+            [assets.INKY1_RIGHT, assets.INKY1_DOWN, assets.INKY1_LEFT, assets.INKY1_UP],
+            [assets.INKY2_RIGHT, assets.INKY2_DOWN, assets.INKY2_LEFT, assets.INKY2_UP],
+        ],
+        Name.CLYDE: [
+            [assets.CLYDE1_RIGHT, assets.CLYDE1_DOWN, assets.CLYDE1_LEFT, assets.CLYDE1_UP],
+            [assets.CLYDE2_RIGHT, assets.CLYDE2_DOWN, assets.CLYDE2_LEFT, assets.CLYDE2_UP],
+        ],
+    }
+
+    # Pixel offset of each ghost's sprite in the pen from the corner of
+    # game.GHOST_START, the pen's middle, left and right seats below it
+    PEN_OFFSETS: Dict[Name, Tuple[int, int]] = {
+        Name.BLINKY: (1, 21),
+        Name.PINKY: (1, 21),
+        Name.INKY: (-15, 21),
+        Name.CLYDE: (17, 21),
+    }
+
+    # target tile, mode code, in pen, pen x and y, oscillation, pen tick, previous tile
+    SNAPSHOT = struct.Struct('<iB?iiiii')
+
+    __slots__ = ('name', 'neighbours', 'target_node', 'dot_limit', 'frightened_speed', 'tunnel_speed', 'tunnel_tiles', '_mode', '_scatter_target_node',
+                 '_in_monster_pen', '_monster_pen_pos', '_monster_pen_y_oscillation', '_oscillation_y_pos', '_pen_tick', '_previous_tile', '_target_vector', '_body_animation')
+
+    def __init__(self, name: Name, current_tile: int, scatter_target_node: int, dot_limit: int, direction: Character.Direction = Character.Direction.NONE, neighbours: NeighbourTable | None = None, tick_rate: int = common.BASE_TICK_RATE, store: EntityStore | None = None, level: int = 1):
+        super().__init__(current_tile, animation_speed=6, speed=movement.speed_for(movement.GHOST_SPEEDS, level, tick_rate), direction=direction, tick_rate=tick_rate, store=store, dims=neighbours.dims if neighbours else None)
+        self.frightened_speed: int = movement.speed_for(movement.GHOST_FRIGHTENED_SPEEDS, level, tick_rate)
+        self.tunnel_speed: int = movement.speed_for(movement.GHOST_TUNNEL_SPEEDS, level, tick_rate)
+        # Tiles the ghost slows down to tunnel_speed on
+        self.tunnel_tiles: Set[int] = set()
         self.name: Ghost.Name = name
+        # Built from the legal tiles given to the first move when not shared
+        self.neighbours: NeighbourTable | None = neighbours
         self.target_node: int = -1
         self.dot_limit: int = dot_limit
 
@@ -194,104 +316,74 @@ class Ghost(Character):
         self._scatter_target_node: int = scatter_target_node
 
         self._in_monster_pen: bool = True
-        self._monster_pen_pos: Tuple[int, int]
+        # Sprite position in the pen, relative to the tile the ghosts start on
+        start_x, start_y = common.node_number_to_cursor_pos(current_tile, self.dims[0])
+        pen_dx, pen_dy = Ghost.PEN_OFFSETS[name]
+        self._monster_pen_pos: Tuple[int, int] = (start_x + pen_dx, start_y + pen_dy)
         # y direction +/- movement while in pen
         self._monster_pen_y_oscillation: int = 10
         # Will be any value between +/- above integer,
         # is the current oscillation value being added
         # to the ghost's y position
         self._oscillation_y_pos: int = 0
+        # Ticks into the current oscillation step, which lasts ticks_for(1)
+        # ticks so the bobbing looks the same at any tick rate
+        self._pen_tick: int = 0
 
         self._previous_tile: int = -1
 
-        self._body_animation_frame: int = 0
+        # Start and end points of Inky's targeting vector (debug drawing only)
+        self._target_vector: Tuple[Tuple[int, int], Tuple[int, int]] | None = None
+
+        # Sprites are decoded on first use, see PacMan.__init__
         self._body_animation: List[List[pg.Surface]] = []
         match self.name:
             case Ghost.Name.BLINKY:
                 self.color = (255, 0, 0, 255)
-                self._monster_pen_pos = (105, 133)
                 self._in_monster_pen = False
-                self._body_animation = [
-                    [
-                        common.load_asset(assets.BLINKY1_RIGHT),
-                        common.load_asset(assets.BLINKY1_DOWN),
-                        common.load_asset(assets.BLINKY1_LEFT),
-                        common.load_asset(assets.BLINKY1_UP),
-                    ],
-                    [
-                        common.load_asset(assets.BLINKY2_RIGHT),
-                        common.load_asset(assets.BLINKY2_DOWN),
-                        common.load_asset(assets.BLINKY2_LEFT),
-                        common.load_asset(assets.BLINKY2_UP),
-                    ]
-                ]
             case Ghost.Name.PINKY:
                 self.color = (255, 192, 203, 255)
-                self._monster_pen_pos = (105, 133)
-                self._body_animation = [
-                    [
-                        common.load_asset(assets.PINKY1_RIGHT),
-                        common.load_asset(assets.PINKY1_DOWN),
-                        common.load_asset(assets.PINKY1_LEFT),
-                        common.load_asset(assets.PINKY1_UP),
-                    ],
-                    [
-                        common.load_asset(assets.PINKY2_RIGHT),
-                        common.load_asset(assets.PINKY2_DOWN),
-                        common.load_asset(assets.PINKY2_LEFT),
-                        common.load_asset(assets.PINKY2_UP),
-                    ]
-                ]
             case Ghost.Name.INKY:
                 self.color = (0, 255, 255, 255)
-                self._monster_pen_pos = (89, 133)
-                self._body_animation = [
-                    [
-                        common.load_asset(assets.INKY1_RIGHT),
-                        common.load_asset(assets.INKY1_DOWN),
-                        common.load_asset(assets.INKY1_LEFT),
-                        common.load_asset(assets.INKY1_UP),
-                    ],
-                    [
-                        common.load_asset(assets.INKY2_RIGHT),
-                        common.load_asset(assets.INKY2_DOWN),
-                        common.load_asset(assets.INKY2_LEFT),
-                        common.load_asset(assets.INKY2_UP),
-                    ]
-                ]
             case Ghost.Name.CLYDE:
                 self.color = (255, 165, 0, 255)
-                self._monster_pen_pos = (121, 133)
-                self._body_animation = [
-                    [
-                        common.load_asset(assets.CLYDE1_RIGHT),
-                        common.load_asset(assets.CLYDE1_DOWN),
-                        common.load_asset(assets.CLYDE1_LEFT),
-                        common.load_asset(assets.CLYDE1_UP),
-                    ],
-                    [
-                        common.load_asset(assets.CLYDE2_RIGHT),
-                        common.load_asset(assets.CLYDE2_DOWN),
-                        common.load_asset(assets.CLYDE2_LEFT),
-                        common.load_asset(assets.CLYDE2_UP),
-                    ]
-                ]
+
+    def _load_sprites(self) -> None:
+        self._body_animation = [[common.load_asset(path) for path in frame] for frame in Ghost.BODY_FRAMES[self.name]]
 
     def render(self, screen: pg.Surface):
-        position: Tuple[int, int] = (self.pixel_pos[0] - common.TILE_SIZE[0] + 1, self.pixel_pos[1] - common.TILE_SIZE[1] + 1)
-        common.place_image(screen=screen, image=self.get_image(), position=position if not self._in_monster_pen else self._monster_pen_pos)
+        image, position = self.sprite()
+        common.place_image(screen=screen, image=image, position=position)
 
         if common.SHOW_TARGET_NODES and self.target_node != -1:
-            target_position: Tuple[int, int] = common.node_number_to_cursor_pos(self.target_node)
+            target_position: Tuple[int, int] = common.node_number_to_cursor_pos(self.target_node, self.dims[0])
             common.draw_rect(screen=screen, color=self.color, rect=(target_position[0], target_position[1], common.TILE_SIZE[0]+1, common.TILE_SIZE[1]+1), width=1)
 
+            if self._target_vector:
+                # Drawing the vector from Blinky through the offset tile to Inky's target tile
+                pg.draw.line(screen, self.color, start_pos=self._target_vector[0], end_pos=self._target_vector[1], width=1)
+
+    def sprite(self, alpha: float = 1.0) -> Tuple[pg.Surface, Tuple[int, int]]:
+        return self.get_image(), self.sprite_pos(alpha)
+
+    def sprite_pos(self, alpha: float = 1.0) -> Tuple[float, float]:
+        # Top left corner of the sprite, without loading it
+        if self._in_monster_pen:
+            return self._monster_pen_pos
+        pixel_pos: Tuple[float, float] = self.render_pos(alpha)
+        return (pixel_pos[0] - common.TILE_SIZE[0] + 1, pixel_pos[1] - common.TILE_SIZE[1] + 1)
+
     def get_image(self) -> pg.Surface:
-        return self._body_animation[self._body_animation_frame][self.direction_to_index()]
+        if not self._body_animation:
+            self._load_sprites()
+        return self._body_animation[self.store.frame[self.slot]][self.direction_to_index()]
 
     def animate(self) -> None:
-        self._animation_frame = (self._animation_frame + 1) % self._animation_speed
-        if self._animation_frame == 0:
-            self._body_animation_frame = (self._body_animation_frame + 1) % len(self._body_animation)
+        store: EntityStore = self.store
+        slot: int = self.slot
+        store.animation_tick[slot] = (store.animation_tick[slot] + 1) % store.animation_period[slot]
+        if store.animation_tick[slot] == 0:
+            store.frame[slot] = (store.frame[slot] + 1) % len(Ghost.BODY_FRAMES[self.name])
 
     def checkDotCount(self, num_dots_eaten: int) -> None:
         if num_dots_eaten >= self.dot_limit:
@@ -299,6 +391,24 @@ class Ghost(Character):
 
     def in_monster_pen(self) -> bool:
         return self._in_monster_pen
+
+    def get_mode(self) -> 'Ghost.Mode':
+        return self._mode
+
+    def snapshot(self) -> bytes:
+        # State outside the entity store, see game.snapshot
+        return Ghost.SNAPSHOT.pack(self.target_node, MODE_CODES[self._mode], self._in_monster_pen,
+                                   self._monster_pen_pos[0], self._monster_pen_pos[1], self._oscillation_y_pos, self._pen_tick, self._previous_tile)
+
+    def restore(self, data: bytes, offset: int = 0) -> None:
+        target_node, mode, in_monster_pen, pen_x, pen_y, oscillation_y_pos, pen_tick, previous_tile = Ghost.SNAPSHOT.unpack_from(data, offset)
+        self.target_node = target_node
+        self._mode = MODES[mode]
+        self._in_monster_pen = in_monster_pen
+        self._monster_pen_pos = (pen_x, pen_y)
+        self._oscillation_y_pos = oscillation_y_pos
+        self._pen_tick = pen_tick
+        self._previous_tile = previous_tile
     
     def set_mode(self, mode: 'Ghost.Mode') -> None:
         self._mode = mode
@@ -308,56 +418,54 @@ class Ghost(Character):
     def choose_target_tile(self, blinky: 'Ghost', pacman: PacMan) -> None:
         if self._mode == Ghost.Mode.SCATTER or self._in_monster_pen:
             return
-        
+
+        pacman_tile: int = pacman.current_tile
         match self.name:
             case Ghost.Name.BLINKY:
-                self.target_node = pacman.current_tile
+                self.target_node = pacman_tile
             case Ghost.Name.PINKY:
                 match pacman.direction:
                     case Character.Direction.UP:
-                        self.target_node = pacman.current_tile - common.TILE_DIMS[0]*4
+                        self.target_node = pacman_tile - self.dims[0]*4
                     case Character.Direction.DOWN:
-                        self.target_node = pacman.current_tile + common.TILE_DIMS[0]*4
+                        self.target_node = pacman_tile + self.dims[0]*4
                     case Character.Direction.LEFT:
-                        self.target_node = pacman.current_tile - 4
+                        self.target_node = pacman_tile - 4
                     case Character.Direction.RIGHT:
-                        self.target_node = pacman.current_tile + 4
+                        self.target_node = pacman_tile + 4
                     case _:
-                        self.target_node = pacman.current_tile
+                        self.target_node = pacman_tile
             case Ghost.Name.INKY:
-                blinky_pos: Tuple[int, int] = common.node_number_to_cursor_pos(blinky.current_tile)
+                blinky_pos: Tuple[int, int] = common.node_number_to_cursor_pos(blinky.current_tile, self.dims[0])
                 offset_tile: Tuple[int, int] = (0, 0)
 
                 match pacman.direction:
                     case Character.Direction.UP:
-                        offset_tile  = common.node_number_to_cursor_pos(pacman.current_tile - common.TILE_DIMS[0]*2)
+                        offset_tile  = common.node_number_to_cursor_pos(pacman_tile - self.dims[0]*2, self.dims[0])
                     case Character.Direction.DOWN:
-                        offset_tile  = common.node_number_to_cursor_pos(pacman.current_tile + common.TILE_DIMS[0]*2)
+                        offset_tile  = common.node_number_to_cursor_pos(pacman_tile + self.dims[0]*2, self.dims[0])
                     case Character.Direction.LEFT:
-                        offset_tile  = common.node_number_to_cursor_pos(pacman.current_tile - 2)
+                        offset_tile  = common.node_number_to_cursor_pos(pacman_tile - 2, self.dims[0])
                     case Character.Direction.RIGHT:
-                        offset_tile  = common.node_number_to_cursor_pos(pacman.current_tile + 2)
+                        offset_tile  = common.node_number_to_cursor_pos(pacman_tile + 2, self.dims[0])
                     case _:
-                        offset_tile = common.node_number_to_cursor_pos(pacman.current_tile)
+                        offset_tile = common.node_number_to_cursor_pos(pacman_tile, self.dims[0])
 
                 dx: int = offset_tile[0] - blinky_pos[0]
                 dy: int = offset_tile[1] - blinky_pos[1]
                 target_x = blinky_pos[0] + 2*dx
                 target_y = blinky_pos[1] + 2*dy
-                self.target_node = common.cursor_pos_to_node_number((target_x, target_y))
+                self.target_node = common.cursor_pos_to_node_number((target_x, target_y), self.dims)
                 
                 if common.SHOW_TARGET_NODES:
-                    # Drawing the vector from Blinky through the offset tile to Inky's target tile
-                    pg.draw.line(
-                        pg.display.get_surface(),
-                        self.color,
-                        start_pos=(blinky_pos[0] + common.OFFSET[0], blinky_pos[1] + common.OFFSET[1]),
-                        end_pos=(target_x + common.OFFSET[0], target_y + common.OFFSET[1]),
-                        width=1)
+                    # Remembered for render(), targeting itself never touches the display
+                    self._target_vector = (
+                        (blinky_pos[0] + common.OFFSET[0], blinky_pos[1] + common.OFFSET[1]),
+                        (target_x + common.OFFSET[0], target_y + common.OFFSET[1]))
 
             case Ghost.Name.CLYDE:
-                pacman_pos: Tuple[int, int] = common.node_number_to_cursor_pos(pacman.current_tile)
-                ghost_pos: Tuple[int, int] = common.node_number_to_cursor_pos(self.current_tile)
+                pacman_pos: Tuple[int, int] = common.node_number_to_cursor_pos(pacman_tile, self.dims[0])
+                ghost_pos: Tuple[int, int] = common.node_number_to_cursor_pos(self.current_tile, self.dims[0])
 
                 dx: int = pacman_pos[0] - ghost_pos[0]
                 dy: int = pacman_pos[1] - ghost_pos[1]
@@ -365,84 +473,76 @@ class Ghost(Character):
                 tile_dist: float = dist / common.TILE_SIZE[0]
                 
                 if tile_dist >= 8:
-                    self.target_node = pacman.current_tile
+                    self.target_node = pacman_tile
                 else:
                     self.target_node = self._scatter_target_node
 
     def smooth_move(self, legal_space: Set[int] | None = None) -> None:
         if self._in_monster_pen:
-            # Oscillate the ghost's y position while in the pen
+            # Oscillate the ghost's y position while in the pen, one step
+            # per tick at common.BASE_TICK_RATE
+            self._pen_tick = (self._pen_tick + 1) % self.ticks_for(1)
+            if self._pen_tick:
+                return
+            direction: int = self.store.direction[self.slot]
             if abs(self._oscillation_y_pos) >= self._monster_pen_y_oscillation:
                 # Flip direction
-                if self.direction == Character.Direction.UP:
-                    self.direction = Character.Direction.DOWN
-                elif self.direction == Character.Direction.DOWN:
-                    self.direction = Character.Direction.UP
+                if direction == entities.UP:
+                    direction = entities.DOWN
+                elif direction == entities.DOWN:
+                    direction = entities.UP
+                self.store.direction[self.slot] = direction
 
-            if self.direction == Character.Direction.UP:
+            if direction == entities.UP:
                 self._oscillation_y_pos -= 1
-            elif self.direction == Character.Direction.DOWN:
+            elif direction == entities.DOWN:
                 self._oscillation_y_pos += 1
 
             if self._oscillation_y_pos % 2 == 0:
-                dy: int = -1 if self.direction == Character.Direction.UP else (1 if self.direction == Character.Direction.DOWN else 0)
+                dy: int = -1 if direction == entities.UP else (1 if direction == entities.DOWN else 0)
                 self._monster_pen_pos = (self._monster_pen_pos[0], self._monster_pen_pos[1] + dy)
         else:
-            if self.pixel_pos == self.target_pixel_pos:
-                new_node: int = self.move_to_next_node(legal_space)
-                target_pos = common.node_number_to_cursor_pos(new_node)
-                self.target_pixel_pos = (target_pos[0] + common.OFFSET[0], target_pos[1] + common.OFFSET[1])
-
-            dx = self.target_pixel_pos[0] - self.pixel_pos[0]
-            dy = self.target_pixel_pos[1] - self.pixel_pos[1]
-            dist = (dx ** 2 + dy ** 2) ** 0.5
-
-            if dx < 0:
-                self.direction = Character.Direction.LEFT
-            elif dx > 0:
-                self.direction = Character.Direction.RIGHT
-            elif dy < 0:
-                self.direction = Character.Direction.UP
-            elif dy > 0:
-                self.direction = Character.Direction.DOWN
-
-            if dist > self.speed:
-                self.pixel_pos = (self.pixel_pos[0] + self.speed * dx / dist, self.pixel_pos[1] + self.speed * dy / dist)
-            else:
-                self.pixel_pos = self.target_pixel_pos[:]
+            store: EntityStore = self.store
+            slot: int = self.slot
+            # Speed for the tile the tick starts on
+            speed: int = store.speed[slot]
+            if self._mode == Ghost.Mode.FRIGHTENED:
+                speed = self.frightened_speed
+            elif store.tile[slot] in self.tunnel_tiles:
+                speed = self.tunnel_speed
+
+            # Speed left over on reaching a tile centre carries on towards the next tile
+            while speed:
+                if store.x[slot] == store.target_x[slot] and store.y[slot] == store.target_y[slot]:
+                    store.target_x[slot], store.target_y[slot] = movement.tile_centre(self.move_to_next_node(legal_space), self.dims[0])
+
+                dx: int = store.target_x[slot] - store.x[slot]
+                dy: int = store.target_y[slot] - store.y[slot]
+                if dx < 0:
+                    store.direction[slot] = entities.LEFT
+                elif dx > 0:
+                    store.direction[slot] = entities.RIGHT
+                elif dy < 0:
+                    store.direction[slot] = entities.UP
+                elif dy > 0:
+                    store.direction[slot] = entities.DOWN
+
+                speed = movement.advance(store, slot, speed)
 
     def move_to_next_node(self, legal_tiles: Set[int] | None = None) -> int:
         if self._in_monster_pen:
             return self.current_tile
         
-        ghost_position: Tuple[int, int] = common.node_number_to_cursor_pos(self.current_tile)
-        target_position: Tuple[int, int] = common.node_number_to_cursor_pos(self.target_node)
-
-        # Get tiles above, below, left, and right of ghost
-        above_tile_pos: Tuple[int, int] = (ghost_position[0], ghost_position[1] - common.TILE_SIZE[1])
-        below_tile_pos: Tuple[int, int] = (ghost_position[0], ghost_position[1] + common.TILE_SIZE[1])
-        left_tile_pos: Tuple[int, int] = (ghost_position[0] - common.TILE_SIZE[0], ghost_position[1])
-        right_tile_pos: Tuple[int, int] = (ghost_position[0] + common.TILE_SIZE[0], ghost_position[1])
-        candidate_tiles: List[Tuple[int, int]] = [right_tile_pos, below_tile_pos, left_tile_pos, above_tile_pos]
-
-        legal_moves: List[Tuple[int, int]] = []
-        for tile in candidate_tiles:
-            node_number: int = common.cursor_pos_to_node_number(tile)
-            if legal_tiles and node_number in legal_tiles and node_number != self._previous_tile:
-                legal_moves.append(tile)
-        
-        self._previous_tile = common.cursor_pos_to_node_number(ghost_position)
-
-        # Determine the legal move that is closest to target position
-        min_dist: float = float('inf')
-        move_to_node: int = -1
-        for move in legal_moves:
-            dx: int = move[0] - target_position[0]
-            dy: int = move[1] - target_position[1]
-            dist: float = (dx ** 2 + dy ** 2) ** 0.5
-            if dist < min_dist:
-                min_dist = dist
-                move_to_node = common.cursor_pos_to_node_number(move)
-
-        self.current_tile = move_to_node if move_to_node != -1 else self.current_tile
-        return self.current_tile
+        if self.neighbours is None:
+            self.neighbours = NeighbourTable(legal_tiles if legal_tiles else set(), self.dims)
+
+        # Closest legal move to the target, never turning back onto the previous tile
+        current_tile: int = self.store.tile[self.slot]
+        move_to_node: int = self.neighbours.decide(current_tile, self._previous_tile, self.target_node)
+        self._previous_tile = current_tile
+        self.store.tile[self.slot] = move_to_node
+        return move_to_node
+
+# Ghost.Mode <-> the code Ghost.snapshot() packs
+MODES: List[Ghost.Mode] = list(Ghost.Mode)
+MODE_CODES: Dict[Ghost.Mode, int] = {mode: code for code, mode in enumerate(MODES)}
@@ -1,45 +1,137 @@
-from typing import Tuple
+from typing import Callable, Dict, Iterable, List, Tuple
 import pygame as pg
+import loader
 
-# Number of tiles on screen (W, H)
+# Number of tiles in the loaded map (W, H), maps set it through set_map_dims
 TILE_DIMS = (28, 36)
 
 # Size of each tile in pixels (W, H)
 TILE_SIZE = (8,8)
 
+# Size of the loaded map in pixels (W, H)
+MAP_SIZE = (TILE_DIMS[0] * TILE_SIZE[0], TILE_DIMS[1] * TILE_SIZE[1])
+
+# Number of tiles visible in the window (W, H), larger maps scroll
+VIEW_DIMS = (28, 36)
+
 # Size of the window in pixels (W, H)
-SCR_SIZE = (TILE_DIMS[0] * TILE_SIZE[0], TILE_DIMS[1] * TILE_SIZE[1])
+SCR_SIZE = (VIEW_DIMS[0] * TILE_SIZE[0], VIEW_DIMS[1] * TILE_SIZE[1])
 
 # Offset for game map graph (X, Y)
 OFFSET = (TILE_SIZE[0]//2, TILE_SIZE[1]//2)
 
+# Tick rate the game's speeds and timings were tuned at
+BASE_TICK_RATE = 60
+# Simulation ticks per second (60, 120 or 240), independent of the frame rate
+SIM_TICK_RATE = 60
+# Upper bound on rendered frames per second
+MAX_FPS = 144
+
 DEBUG_MODE = False
 SHOW_GRID_LINES = False
 SHOW_TILE_NUMS = False
 SHOW_TARGET_NODES = False
 SHOW_FPS = True
 
-def node_number_to_cursor_pos(node_number: int) -> Tuple[int, int]:
-    node_x: int = (node_number % TILE_DIMS[0]) * TILE_SIZE[0]
-    node_y: int = (node_number // TILE_DIMS[0]) * TILE_SIZE[1]
+def set_map_dims(dims: Tuple[int, int]) -> None:
+    # Tile numbers and positions below are relative to the current map's width
+    global TILE_DIMS, MAP_SIZE
+    TILE_DIMS = dims
+    MAP_SIZE = (dims[0] * TILE_SIZE[0], dims[1] * TILE_SIZE[1])
+
+# The simulation passes its own map's width or dims to the conversions below,
+# without them they use the ones set_map_dims set for rendering
+def node_number_to_cursor_pos(node_number: int, width: int | None = None) -> Tuple[int, int]:
+    width = width if width else TILE_DIMS[0]
+    node_x: int = (node_number % width) * TILE_SIZE[0]
+    node_y: int = (node_number // width) * TILE_SIZE[1]
     return node_x, node_y
 
-def cursor_pos_to_node_number(cursor_pos: Tuple[int, int]) -> int:
-    node_x, node_y = cursor_pos_to_selection(cursor_pos)
-    return node_x // TILE_SIZE[0] + (node_y // TILE_SIZE[1]) * TILE_DIMS[0]
+def cursor_pos_to_node_number(cursor_pos: Tuple[int, int], dims: Tuple[int, int] | None = None) -> int:
+    dims = dims if dims else TILE_DIMS
+    node_x, node_y = cursor_pos_to_selection(cursor_pos, dims)
+    return node_x // TILE_SIZE[0] + (node_y // TILE_SIZE[1]) * dims[0]
 
-def cursor_pos_to_selection(cursor_pos: Tuple[int, int]) -> Tuple[int, int]:
-    node_x = int((cursor_pos[0] / SCR_SIZE[0]) * TILE_DIMS[0]) * TILE_SIZE[0]
-    node_y = int((cursor_pos[1] / SCR_SIZE[1]) * TILE_DIMS[1]) * TILE_SIZE[1]
+def cursor_pos_to_selection(cursor_pos: Tuple[int, int], dims: Tuple[int, int] | None = None) -> Tuple[int, int]:
+    dims = dims if dims else TILE_DIMS
+    map_size: Tuple[int, int] = (dims[0] * TILE_SIZE[0], dims[1] * TILE_SIZE[1])
+    node_x = int((cursor_pos[0] / map_size[0]) * dims[0]) * TILE_SIZE[0]
+    node_y = int((cursor_pos[1] / map_size[1]) * dims[1]) * TILE_SIZE[1]
     return node_x, node_y
 
-def load_asset(asset_path: str = '') -> pg.Surface:
-    asset_image: pg.Surface = pg.image.load(asset_path).convert_alpha()
+class AssetCache:
+    '''
+    Process-wide registry of decoded images. Each path is decoded once and
+    every caller gets the same surface back, so surfaces handed out must be
+    treated as read-only. Needs a display mode to be set before the first
+    load, like Surface.convert() does.
+    '''
+    def __init__(self):
+        self._surfaces: Dict[str, pg.Surface] = {}
+        # path -> loader that add()s it along with others, run on its first get()
+        self._deferred: Dict[str, Callable[[], None]] = {}
+        self.hits: int = 0
+        self.misses: int = 0
+
+    def get(self, asset_path: str) -> pg.Surface:
+        surface: pg.Surface | None = self._surfaces.get(asset_path)
+        if surface is not None:
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        load: Callable[[], None] | None = self._deferred.get(asset_path)
+        if load is not None:
+            self._deferred = {path: other for path, other in self._deferred.items() if other is not load}
+            load()
+            surface = self._surfaces.get(asset_path)
+            if surface is not None:
+                return surface
+
+        # Opaque images (all the JPG walls and pellets) are converted without
+        # per pixel alpha, they blit faster
+        surface = loader.load_converted([asset_path])[asset_path]
+        self._surfaces[asset_path] = surface
+        return surface
 
-    width: int = int(asset_image.get_width())
-    height: int = int(asset_image.get_height())
+    def add(self, asset_path: str, surface: pg.Surface) -> None:
+        # Registers an already decoded surface (e.g. a sprite atlas subsurface) for the path
+        self._surfaces[asset_path] = surface
 
-    return pg.transform.scale(asset_image, (width, height))
+    def preload(self, asset_paths: Iterable[str]) -> None:
+        # Decodes every path not loaded (or deferred) yet on loader's thread
+        # pool, so the get() calls that follow are all hits
+        pending: List[str] = [path for path in dict.fromkeys(asset_paths)
+                              if path and path not in self._surfaces and path not in self._deferred]
+        self._surfaces.update(loader.load_converted(pending))
+
+    def defer(self, asset_paths: Iterable[str], load: Callable[[], None]) -> None:
+        # Postpones load(), which must add() every one of asset_paths, until
+        # the first get() of any of them
+        for path in asset_paths:
+            self._deferred[path] = load
+
+    def bytes_held(self) -> int:
+        # Subsurfaces share their parent's pixels, so each parent is counted once
+        pixel_buffers: Dict[int, pg.Surface] = {}
+        for surface in self._surfaces.values():
+            owner: pg.Surface = surface.get_parent() or surface
+            pixel_buffers[id(owner)] = owner
+        return sum(owner.get_pitch() * owner.get_height() for owner in pixel_buffers.values())
+
+    def clear(self) -> None:
+        self._surfaces.clear()
+        self._deferred.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __str__(self) -> str:
+        return f'{len(self._surfaces)} assets, {self.hits} hits, {self.misses} misses, {self.bytes_held()} bytes'
+
+ASSETS = AssetCache()
+
+def load_asset(asset_path: str = '') -> pg.Surface:
+    return ASSETS.get(asset_path)
 
 def place_image(screen: pg.Surface, image: pg.Surface | None, position: Tuple[int, int]) -> None:
     if image:
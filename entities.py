@@ -0,0 +1,128 @@
+from typing import Dict, List, Tuple
+from array import array
+import numpy as np
+
+# Direction codes stored per entity, the first four double as the sprite
+# direction index (same codes as batch.py)
+RIGHT = 0
+DOWN = 1
+LEFT = 2
+UP = 3
+NONE = 4
+
+class EntityStore:
+    '''
+    Struct-of-arrays storage for every character in a game: one contiguous
+    array per field, indexed by the entity's slot. Characters are thin
+    views holding only their store and slot, so per-tick movement writes
+    numbers in place instead of building tuples, and arrays() exposes the
+    same memory to NumPy for bulk updates over many entities.
+    '''
+    # field name -> array typecode. Positions are in sub-pixels and speeds in
+    # sub-pixels per tick (see movement.py)
+    FIELDS: Dict[str, str] = {
+        'x': 'i', 'y': 'i',
+        'target_x': 'i', 'target_y': 'i',
+        'previous_x': 'i', 'previous_y': 'i',
+        'speed': 'i',
+        'tile': 'i',
+        'direction': 'b',
+        # Tick counter within the current animation frame, and ticks per frame
+        'animation_tick': 'i',
+        'animation_period': 'i',
+        # Sprite animation frame
+        'frame': 'i',
+    }
+
+    def __init__(self, capacity: int = 8):
+        self.size: int = 0
+        self.capacity: int = 0
+        self.x: array
+        self.y: array
+        self.target_x: array
+        self.target_y: array
+        self.previous_x: array
+        self.previous_y: array
+        self.speed: array
+        self.tile: array
+        self.direction: array
+        self.animation_tick: array
+        self.animation_period: array
+        self.frame: array
+        for field, typecode in EntityStore.FIELDS.items():
+            setattr(self, field, array(typecode))
+        self._grow(max(capacity, 1))
+
+    def _grow(self, capacity: int) -> None:
+        # New arrays rather than extending in place: arrays with NumPy views
+        # on them can't be resized, and those views keep the old memory alive
+        for field, typecode in EntityStore.FIELDS.items():
+            grown: array = array(typecode, getattr(self, field))
+            grown.extend(array(typecode, bytes(grown.itemsize * (capacity - self.capacity))))
+            setattr(self, field, grown)
+        self.capacity = capacity
+        self._index_spans()
+
+    def _index_spans(self) -> None:
+        # A byte view of each field, in FIELDS order, and where it sits in a snapshot
+        self._spans: List[Tuple[memoryview, int, int]] = []
+        offset: int = 0
+        for field in EntityStore.FIELDS:
+            view: memoryview = memoryview(getattr(self, field)).cast('B')
+            self._spans.append((view, offset, offset + len(view)))
+            offset += len(view)
+
+    def __getstate__(self) -> Dict[str, object]:
+        # Memoryviews can't be pickled or deep-copied, copies rebuild them
+        state: Dict[str, object] = self.__dict__.copy()
+        del state['_spans']
+        return state
+
+    def __setstate__(self, state: Dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self._index_spans()
+
+    def add(self, tile: int, x: int, y: int, direction: int, speed: int, animation_period: int) -> int:
+        # Slot of the new entity
+        if self.size == self.capacity:
+            self._grow(self.capacity * 2)
+        slot: int = self.size
+        self.size += 1
+
+        self.x[slot] = self.target_x[slot] = self.previous_x[slot] = x
+        self.y[slot] = self.target_y[slot] = self.previous_y[slot] = y
+        self.speed[slot] = speed
+        self.tile[slot] = tile
+        self.direction[slot] = direction
+        self.animation_tick[slot] = 0
+        self.animation_period[slot] = animation_period
+        self.frame[slot] = 0
+        return slot
+
+    def save_previous(self) -> None:
+        # Start of a tick: remember every position for render interpolation
+        n: int = self.size
+        self.previous_x[:n] = self.x[:n]
+        self.previous_y[:n] = self.y[:n]
+
+    def snapshot(self) -> bytes:
+        # Every field of every slot as one bytes object, for restore()
+        return b''.join([span[0] for span in self._spans])
+
+    def restore(self, data: bytes, size: int) -> None:
+        # Copies a snapshot() back in place, so NumPy views from arrays()
+        # stay valid. The store can't have grown since the snapshot
+        if len(data) != self._spans[-1][2]:
+            raise ValueError('Snapshot is from an entity store of a different capacity')
+        for view, start, end in self._spans:
+            view[:] = data[start:end]
+        self.size = size
+
+    def arrays(self) -> Dict[str, np.ndarray]:
+        # NumPy views over the live entities, writes go straight to the store.
+        # Take them again after add(), growing the store moves its memory
+        return {field: np.frombuffer(getattr(self, field), dtype=getattr(self, field).typecode)[:self.size]
+                for field in EntityStore.FIELDS}
+
+    def __len__(self) -> int:
+        return self.size
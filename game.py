@@ -0,0 +1,290 @@
+from typing import Dict, Iterable, List, NamedTuple, Set, Tuple
+from enum import Enum
+import random
+from characters import Ghost, PacMan, Character
+from entities import EntityStore
+from mapfile import MapData
+from navigation import NeighbourTable
+from profiler import FrameProfiler
+import common
+import mapfile
+
+# Start positions and scatter targets are (column, row) cells rather than tile
+# numbers, so they stay in the same place on maps of any width
+PACMAN_START = (14, 26)
+GHOST_START = (13, 14)
+
+PELLET_SCORE = 10
+POWER_PELLET_SCORE = 50
+
+# Tiles from the edge of the map ghosts slow down in on rows the maze
+# leaves through (the side tunnels)
+TUNNEL_LENGTH = 6
+
+# Number of ticks (at common.BASE_TICK_RATE) the game freezes between a ghost catching
+# pacman and pacman's death animation starting
+PAUSE_FRAMES = 80
+
+class Input(Enum):
+    UP = 'up'
+    DOWN = 'down'
+    LEFT = 'left'
+    RIGHT = 'right'
+    SCATTER = 'scatter'
+    CHASE = 'chase'
+
+# (name, scatter target cell, dot limit, starting direction) in update order,
+# Blinky must come first since Inky targets relative to him
+GHOST_SETUP: List[Tuple[Ghost.Name, Tuple[int, int], int, Character.Direction]] = [
+    (Ghost.Name.BLINKY, (25, 0), 0, Character.Direction.NONE),
+    (Ghost.Name.PINKY, (2, 0), 0, Character.Direction.DOWN),
+    (Ghost.Name.INKY, (27, 34), 30, Character.Direction.UP),
+    (Ghost.Name.CLYDE, (0, 34), 60, Character.Direction.UP),
+]
+
+def tile_at(cell: Tuple[int, int], width: int) -> int:
+    # Tile number of a (column, row) cell in a width wide map
+    return cell[1] * width + cell[0]
+
+def check_cells(map_data: MapData) -> None:
+    # Characters must start on legal tiles and the scatter targets (corners
+    # off the maze) be on the map, rather than quietly starting in a wall
+    starts: List[Tuple[str, Tuple[int, int]]] = [('pacman start', PACMAN_START), ('ghost start', GHOST_START)]
+    targets: List[Tuple[str, Tuple[int, int]]] = [(f'{name.value} scatter target', cell) for name, cell, _, _ in GHOST_SETUP]
+    for what, cell in starts + targets:
+        if not (0 <= cell[0] < map_data.width and 0 <= cell[1] < map_data.height):
+            raise ValueError(f'The {what} cell {cell} is outside the {map_data.width}x{map_data.height} map')
+    for what, cell in starts:
+        if not map_data.is_legal(tile_at(cell, map_data.width)):
+            raise ValueError(f'The {what} cell {cell} is not a legal tile of the map')
+
+def new_ghosts(neighbours: NeighbourTable, tick_rate: int = common.BASE_TICK_RATE, store: EntityStore | None = None, level: int = 1) -> Dict[str, Ghost]:
+    ghosts: Dict[str, Ghost] = {}
+    for name, scatter_target, dot_limit, direction in GHOST_SETUP:
+        ghosts[name.value] = Ghost(name=name, current_tile=tile_at(GHOST_START, neighbours.width), scatter_target_node=tile_at(scatter_target, neighbours.width), dot_limit=dot_limit, direction=direction, neighbours=neighbours, tick_rate=tick_rate, store=store, level=level)
+    return ghosts
+
+def tunnel_tiles(legal_space: Set[int], dims: Tuple[int, int] | None = None) -> Set[int]:
+    # Legal tiles within TUNNEL_LENGTH of the map edge, on rows with a legal tile at either edge
+    width, height = dims if dims else common.TILE_DIMS
+    tunnels: Set[int] = set()
+    for row in range(height):
+        first: int = row * width
+        if first in legal_space or first + width - 1 in legal_space:
+            tunnels.update(tile for column in range(TUNNEL_LENGTH) for tile in (first + column, first + width - 1 - column) if tile in legal_space)
+    return tunnels
+
+class GameState:
+    def __init__(self, map_data: MapData, tick_rate: int = common.BASE_TICK_RATE, seed: int = 0, level: int = 1):
+        check_cells(map_data)
+        # Tile numbers everywhere are relative to this map's width, rendering
+        # the map takes common.set_map_dims(dims) as well
+        self.dims: Tuple[int, int] = (map_data.width, map_data.height)
+
+        # Set of legal tiles (accessible by pacman or the ghosts)
+        self.legal_space: Set[int] = map_data.legal_tiles()
+        self.dots: Set[int] = map_data.tiles_of_type(mapfile.PELLET)
+        self.energizers: Set[int] = map_data.tiles_of_type(mapfile.POWER_PELLET)
+        self.dot_count: int = len(self.dots) + len(self.energizers)
+        # The same pellets as one bit per tile, kept in step with the sets for snapshots
+        self.pellet_bits: int = sum(1 << tile for tile in self.dots | self.energizers)
+        self.energizer_bits: int = sum(1 << tile for tile in self.energizers)
+
+        # Shared by every character, along with its cache of ghost decisions
+        self.neighbours: NeighbourTable = NeighbourTable(self.legal_space, self.dims)
+
+        self.tick_rate: int = tick_rate
+        self.level: int = level
+        # Any randomness in the rules must come from here so replays stay deterministic
+        self.seed: int = seed
+        self.rng: random.Random = random.Random(seed)
+
+        # Positions, directions and animation counters of every character, pacman in slot 0
+        self.entities: EntityStore = EntityStore(1 + len(GHOST_SETUP))
+        self.pacman: PacMan = PacMan(current_tile=tile_at(PACMAN_START, map_data.width), legal_tiles=self.legal_space, neighbours=self.neighbours, tick_rate=tick_rate, store=self.entities, level=level)
+        self.ghosts: Dict[str, Ghost] = new_ghosts(self.neighbours, tick_rate, self.entities, level)
+        # Every ghost, still there after ghosts is cleared when pacman dies
+        self.ghost_list: List[Ghost] = list(self.ghosts.values())
+        self.tunnel_tiles: Set[int] = tunnel_tiles(self.legal_space, self.dims)
+        for ghost in self.ghosts.values():
+            ghost.tunnel_tiles = self.tunnel_tiles
+        self.score: int = 0
+
+        self.pause_before_death: bool = False
+        self.curr_pause_frame: int = 0
+        self.pause_frames: int = self.pacman.ticks_for(PAUSE_FRAMES)
+
+        self.tick: int = 0
+        # Tile of the pellet eaten during the last step, -1 if none was
+        self.eaten_tile: int = -1
+        self.caught_by: Ghost.Name | None = None
+
+        # Set while the frame profiler is on, step() only times its phases then
+        self.profiler: FrameProfiler | None = None
+
+    def dots_eaten(self) -> int:
+        return self.dot_count - (len(self.dots) + len(self.energizers))
+
+    def is_over(self) -> bool:
+        return self.pacman.is_dead() or (len(self.dots) + len(self.energizers)) == 0
+
+class Snapshot(NamedTuple):
+    '''
+    Everything step() changes, taken by snapshot() and put back by restore()
+    on the same GameState, for lookahead search. Characters keep their
+    sprites and shared tables, only numbers are saved: the entity store and
+    the rest of the characters' state as bytes and the pellets as a bitmap,
+    a few hundred bytes in all.
+    '''
+    tick: int
+    score: int
+    pause_before_death: bool
+    curr_pause_frame: int
+    eaten_tile: int
+    caught_by: Ghost.Name | None
+    pellet_bits: int
+    entities: bytes
+    entity_count: int
+    pacman: bytes
+    # Ghost.snapshot() of every ghost in ghost_list, back to back
+    ghosts: bytes
+    live_ghosts: Tuple[str, ...]
+
+def snapshot(state: GameState) -> Snapshot:
+    # The rng isn't saved, nothing in the rules draws from it yet
+    return Snapshot(state.tick, state.score, state.pause_before_death, state.curr_pause_frame,
+                    state.eaten_tile, state.caught_by, state.pellet_bits,
+                    state.entities.snapshot(), state.entities.size, state.pacman.snapshot(),
+                    b''.join([ghost.snapshot() for ghost in state.ghost_list]), tuple(state.ghosts))
+
+def restore(state: GameState, saved: Snapshot) -> None:
+    (state.tick, state.score, state.pause_before_death, state.curr_pause_frame,
+     state.eaten_tile, state.caught_by) = saved[:6]
+    state.entities.restore(saved.entities, saved.entity_count)
+    state.pacman.restore(saved.pacman)
+    for i, ghost in enumerate(state.ghost_list):
+        ghost.restore(saved.ghosts, i * Ghost.SNAPSHOT.size)
+    if len(state.ghosts) != len(saved.live_ghosts):
+        state.ghosts.clear()
+        state.ghosts.update((ghost.name.value, ghost) for ghost in state.ghost_list if ghost.name.value in saved.live_ghosts)
+
+    # Only the pellets eaten (or put back) since the snapshot touch the sets
+    changed: int = state.pellet_bits ^ saved.pellet_bits
+    while changed:
+        bit: int = changed & -changed
+        tile: int = bit.bit_length() - 1
+        pellets: Set[int] = state.energizers if state.energizer_bits & bit else state.dots
+        if saved.pellet_bits & bit:
+            pellets.add(tile)
+        else:
+            pellets.discard(tile)
+        changed ^= bit
+    state.pellet_bits = saved.pellet_bits
+
+def apply_input(state: GameState, game_input: Input) -> None:
+    if state.pacman.is_dying():
+        return
+
+    match game_input:
+        case Input.UP:
+            state.pacman.direction = Character.Direction.UP
+        case Input.DOWN:
+            state.pacman.direction = Character.Direction.DOWN
+        case Input.LEFT:
+            state.pacman.direction = Character.Direction.LEFT
+        case Input.RIGHT:
+            state.pacman.direction = Character.Direction.RIGHT
+        case Input.SCATTER:
+            for ghost in state.ghosts.values():
+                ghost.set_mode(Ghost.Mode.SCATTER)
+        case Input.CHASE:
+            for ghost in state.ghosts.values():
+                ghost.set_mode(Ghost.Mode.CHASE)
+
+def step(state: GameState, inputs: Iterable[Input] = ()) -> None:
+    for game_input in inputs:
+        apply_input(state, game_input)
+
+    pacman: PacMan = state.pacman
+    profiler: FrameProfiler | None = state.profiler
+
+    state.entities.save_previous()
+
+    # PACMAN
+    if not state.pause_before_death:
+        if profiler:
+            profiler.begin('PacMan move')
+        pacman.smooth_move()
+        if profiler:
+            profiler.end('PacMan move')
+            profiler.begin('PacMan animate')
+        pacman.animate()
+        if profiler:
+            profiler.end('PacMan animate')
+
+    # Pacman's tile doesn't change for the rest of the tick
+    pacman_tile: int = pacman.current_tile
+    state.eaten_tile = -1
+    if pacman_tile in state.dots:
+        state.dots.remove(pacman_tile)
+        state.pellet_bits ^= 1 << pacman_tile
+        state.eaten_tile = pacman_tile
+        state.score += PELLET_SCORE
+    elif pacman_tile in state.energizers:
+        state.energizers.remove(pacman_tile)
+        state.pellet_bits ^= 1 << pacman_tile
+        state.eaten_tile = pacman_tile
+        state.score += POWER_PELLET_SCORE
+
+    # GHOSTS
+    for name, ghost in state.ghosts.items():
+        if profiler:
+            profiler.begin(f'{name} target')
+        ghost.choose_target_tile(blinky=state.ghosts['Blinky'], pacman=pacman)
+        if profiler:
+            profiler.end(f'{name} target')
+            profiler.begin(f'{name} move')
+
+        if not state.pause_before_death:
+            ghost.smooth_move(state.legal_space)
+        ghost.animate()
+        if profiler:
+            profiler.end(f'{name} move')
+
+        ghost.checkDotCount(state.dots_eaten())
+
+        if not ghost.in_monster_pen() and ghost.current_tile == pacman_tile:
+            if not state.pause_before_death:
+                state.caught_by = ghost.name
+            state.pause_before_death = True
+
+    if state.pause_before_death:
+        state.curr_pause_frame += 1
+        if state.curr_pause_frame >= state.pause_frames:
+            state.ghosts.clear()
+            pacman.slowly_kill()
+            pacman.animate()
+
+    state.tick += 1
+
+def main() -> None:
+    import sys
+    import time
+
+    # Soak test: play full games headless (no input, so pacman idles until caught)
+    num_games: int = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    map_data: MapData = mapfile.load_map('maps/pacmap.txt')
+
+    total_ticks: int = 0
+    start: float = time.perf_counter()
+    for _ in range(num_games):
+        state: GameState = GameState(map_data)
+        while not state.is_over():
+            step(state)
+        total_ticks += state.tick
+    elapsed: float = time.perf_counter() - start
+
+    print(f'{num_games} games, {total_ticks} ticks in {elapsed:.2f}s ({total_ticks / elapsed:.0f} ticks/s)')
+
+if __name__ == '__main__':
+    main()
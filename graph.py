@@ -1,4 +1,8 @@
-from typing import Dict, Set, List
+from typing import Deque, Dict, Set, List, Tuple
+from array import array
+from collections import deque
+import heapq
+import numpy as np
 
 class Graph:
     def __init__(self):
@@ -44,47 +48,297 @@ class Graph:
         return self.adj_list[node]
 
 
-    def BFS(self, start_node: int, end_node: int, ignored_nodes: Set[int] = set()) -> List[int]:
+    def BFS(self, start_node: int, end_node: int, ignored_nodes: Set[int] | None = None) -> List[int]:
+        return self.BFS_multi(start_node, {end_node}, ignored_nodes)
+
+    def BFS_multi(self, start_node: int, end_nodes: Set[int], ignored_nodes: Set[int] | None = None) -> List[int]:
+        # Shortest path from start_node to whichever end node is closest,
+        # empty if none is reachable (or start_node is itself an end node)
+        if ignored_nodes is None:
+            ignored_nodes = set()
+
         # If start or end nodes are in the ignored list, no path is possible
-        if start_node in ignored_nodes or end_node in ignored_nodes:
+        end_nodes = end_nodes - ignored_nodes
+        if start_node in ignored_nodes or start_node not in self.adj_list or not end_nodes:
             return []
-        
-        path: List[int] = []
-        distance: Dict[int, float] = {}
-        previous: Dict[int, int | None] = {}
-        Q: Set[int] = set()
-
-        for vertex in self.adj_list.keys():
-            if vertex in ignored_nodes:
-                continue  # Skip ignored nodes entirely
-            distance[vertex] = float('inf')
-            previous[vertex] = None
-            Q.add(vertex)
-
-        distance[start_node] = 0
-
-        while len(Q) > 0:
-            u = min(Q, key=distance.get)
-
-            # If we have reached the end node, we can stop
-            if u == end_node:
-                while previous[u] is not None:
-                    path.insert(0, u)
-                    u = previous[u]
-                if len(path) > 0: # If there is indeed a path
-                    path.insert(0, start_node) # Add the start node to the path
+        if start_node in end_nodes:
+            return []
+
+        previous: Dict[int, int] = {start_node: start_node}
+        queue: Deque[int] = deque([start_node])
+
+        while queue:
+            u = queue.popleft()
+            for v in self.adj_list[u]:
+                if v in previous or v in ignored_nodes:
+                    continue
+                previous[v] = u
+
+                # If we have reached an end node, walk the path back to the start
+                if v in end_nodes:
+                    path: List[int] = [v]
+                    while v != start_node:
+                        v = previous[v]
+                        path.append(v)
+                    path.reverse()
+                    return path
+
+                queue.append(v)
+
+        return []
+
+    @staticmethod
+    def from_grid(width: int, height: int, legal_nodes: Set[int]) -> 'Graph':
+        # One node per tile of a width x height map (numbered row by row),
+        # with edges between horizontally or vertically adjacent legal tiles
+        grid = Graph()
+        for _ in range(width * height):
+            grid.add_node()
+
+        for node in legal_nodes:
+            if node % width < width - 1 and node + 1 in legal_nodes:
+                grid.add_edge_between(node, node + 1)
+            if node + width < width * height and node + width in legal_nodes:
+                grid.add_edge_between(node, node + width)
+        return grid
+
+class DistanceTable:
+    '''
+    All-pairs shortest distances and next hops over a Graph, built with one
+    BFS per node. Both matrices are uint16 and indexed by the compact index
+    of a node, so each matrix for the legal tiles of the 28x36 map is about 180 KB.
+    '''
+    UNREACHABLE: int = 0xFFFF
+
+    def __init__(self, graph: Graph, nodes: Set[int] | None = None):
+        # Only the given nodes (default: every node with an edge) get a row and column
+        if nodes is None:
+            nodes = {node for node in graph.adj_list if graph.is_node_in_graph(node)}
+        self.nodes: List[int] = sorted(nodes)
+        self.index: Dict[int, int] = {node: i for i, node in enumerate(self.nodes)}
+
+        size: int = len(self.nodes)
+        self.distance: np.ndarray = np.full((size, size), DistanceTable.UNREACHABLE, dtype=np.uint16)
+        # next_hop[a, b] is the index of the node after a on a shortest path from a to b
+        self.next_hop: np.ndarray = np.full((size, size), DistanceTable.UNREACHABLE, dtype=np.uint16)
+
+        for source in range(size):
+            distance: List[int] = [DistanceTable.UNREACHABLE] * size
+            first_hop: List[int] = [DistanceTable.UNREACHABLE] * size
+            distance[source] = 0
+            first_hop[source] = source
+            queue: Deque[int] = deque([source])
+
+            while queue:
+                u = queue.popleft()
+                for neighbor in graph.neighbors_of(self.nodes[u]):
+                    v: int | None = self.index.get(neighbor)
+                    if v is None or distance[v] != DistanceTable.UNREACHABLE:
+                        continue
+                    distance[v] = distance[u] + 1
+                    first_hop[v] = v if u == source else first_hop[u]
+                    queue.append(v)
+
+            self.distance[source] = distance
+            self.next_hop[source] = first_hop
+
+    def dist(self, start_node: int, end_node: int) -> int:
+        # Number of edges between the nodes, UNREACHABLE if there's no path
+        return int(self.distance[self.index[start_node], self.index[end_node]])
+
+    def path(self, start_node: int, end_node: int) -> List[int]:
+        # Same result shape as Graph.BFS: start to end inclusive, empty if unreachable or equal
+        start: int = self.index[start_node]
+        end: int = self.index[end_node]
+        if start == end or self.distance[start, end] == DistanceTable.UNREACHABLE:
+            return []
+
+        path: List[int] = [start_node]
+        while start != end:
+            start = int(self.next_hop[start, end])
+            path.append(self.nodes[start])
+        return path
+
+class CSRGraph:
+    '''
+    Compressed sparse row adjacency over the tiles of a map: the legal
+    neighbours of tile t are neighbours[offsets[t]:offsets[t + 1]], in
+    right, down, left, up order. Two flat int arrays instead of a dict of
+    sets, 4 bytes per tile plus 4 per edge end.
+    '''
+    def __init__(self, offsets: array, neighbours: array):
+        self.offsets: array = offsets
+        self.neighbours: array = neighbours
+
+    @staticmethod
+    def from_tiles(legal_tiles: Set[int], width: int, height: int) -> 'CSRGraph':
+        # Edges between horizontally or vertically adjacent legal tiles of a
+        # width x height map, numbered row by row
+        num_tiles: int = width * height
+        legal: np.ndarray = np.zeros(num_tiles, dtype=bool)
+        legal[list(legal_tiles)] = True
+        tiles: np.ndarray = np.arange(num_tiles)
+        x: np.ndarray = tiles % width
+        candidates: np.ndarray = np.stack([tiles + 1, tiles + width, tiles - 1, tiles - width], axis=1)
+        on_map: np.ndarray = np.stack([x < width - 1, tiles < num_tiles - width, x > 0, tiles >= width], axis=1)
+        linked: np.ndarray = on_map & legal[:, None] & legal[np.clip(candidates, 0, num_tiles - 1)]
+
+        offsets: array = array('i')
+        offsets.frombytes(np.concatenate([[0], np.cumsum(linked.sum(axis=1))]).astype(np.int32).tobytes())
+        neighbours: array = array('i')
+        neighbours.frombytes(candidates[linked].astype(np.int32).tobytes())
+        return CSRGraph(offsets, neighbours)
+
+    @staticmethod
+    def from_map(map_data) -> 'CSRGraph':
+        # map_data is a mapfile.MapData
+        return CSRGraph.from_tiles(map_data.legal_tiles(), map_data.width, map_data.height)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def neighbors_of(self, node: int) -> array:
+        return self.neighbours[self.offsets[node]:self.offsets[node + 1]]
+
+    def degree(self, node: int) -> int:
+        return self.offsets[node + 1] - self.offsets[node]
+
+class JunctionGraph:
+    '''
+    A CSRGraph with its corridors collapsed. Junctions are the tiles with
+    other than two neighbours (crossings and dead ends; a bend is part of
+    a corridor). Each corridor between two junctions is a pair of directed
+    edges, one per direction, weighted by its length in steps, with its
+    tiles listed in walking order in edge_tiles[edge_offsets[e]:edge_offsets[e + 1]].
+    Every corridor tile is indexed to the first edge through it and its
+    distance from that edge's start (tile_edge, tile_offset), so queries
+    starting or ending mid-corridor only search from the two junctions at
+    its ends.
+    '''
+    def __init__(self, graph: CSRGraph):
+        self.graph: CSRGraph = graph
+        num_tiles: int = len(graph)
+        self.is_junction: bytearray = bytearray(graph.degree(tile) not in (0, 2) for tile in range(num_tiles))
+
+        self.edge_from: array = array('i')
+        self.edge_to: array = array('i')
+        self.edge_length: array = array('i')
+        self.edge_offsets: array = array('i', [0])
+        self.edge_tiles: array = array('i')
+        self.tile_edge: array = array('i', [-1]) * num_tiles
+        self.tile_offset: array = array('i', [0]) * num_tiles
+        # Edges leaving each junction, by junction tile
+        self.out_edges: Dict[int, List[int]] = {}
+
+        walked: Set[int] = set()
+        for junction in (tile for tile in range(num_tiles) if self.is_junction[tile]):
+            self._walk_from(junction)
+            walked.add(junction)
+        # Corridors that loop back on themselves have no junction, one of
+        # their tiles becomes one
+        for tile in range(num_tiles):
+            if graph.degree(tile) == 2 and self.tile_edge[tile] == -1 and tile not in walked:
+                self.is_junction[tile] = 1
+                self._walk_from(tile)
+                walked.add(tile)
+
+    def _walk_from(self, junction: int) -> None:
+        self.out_edges[junction] = []
+        for first in self.graph.neighbors_of(junction):
+            edge: int = len(self.edge_from)
+            previous, tile = junction, first
+            steps: int = 1
+            while not self.is_junction[tile]:
+                self.edge_tiles.append(tile)
+                if self.tile_edge[tile] == -1:
+                    self.tile_edge[tile] = edge
+                    self.tile_offset[tile] = steps
+                a, b = self.graph.neighbors_of(tile)
+                previous, tile = tile, (b if a == previous else a)
+                steps += 1
+            self.edge_from.append(junction)
+            self.edge_to.append(tile)
+            self.edge_length.append(steps)
+            self.edge_offsets.append(len(self.edge_tiles))
+            self.out_edges[junction].append(edge)
+
+    def __len__(self) -> int:
+        # Number of junctions
+        return len(self.out_edges)
+
+    def _legs(self, tile: int) -> List[Tuple[int, int, List[int]]]:
+        # (junction, steps, tiles walked after tile up to and including the
+        # junction) for each junction reachable from tile without passing another
+        if self.is_junction[tile]:
+            return [(tile, 0, [])]
+        edge: int = self.tile_edge[tile]
+        offset: int = self.tile_offset[tile]
+        tiles: List[int] = self.edge_tiles[self.edge_offsets[edge]:self.edge_offsets[edge + 1]].tolist()
+        return [(self.edge_to[edge], self.edge_length[edge] - offset, tiles[offset:] + [self.edge_to[edge]]),
+                (self.edge_from[edge], offset, tiles[:offset - 1][::-1] + [self.edge_from[edge]])]
+
+    def path(self, start_tile: int, end_tile: int) -> List[int]:
+        # A shortest path in the same shape as Graph.BFS: start to end
+        # inclusive, empty if unreachable or equal. Dijkstra over the junctions only
+        if start_tile == end_tile or not self.graph.degree(start_tile) or not self.graph.degree(end_tile):
+            return []
+
+        best: int = -1
+        best_path: List[int] = []
+        # Both on the same corridor: straight along it
+        edge: int = self.tile_edge[start_tile]
+        if edge != -1 and edge == self.tile_edge[end_tile]:
+            start: int = self.tile_offset[start_tile]
+            end: int = self.tile_offset[end_tile]
+            tiles: List[int] = self.edge_tiles[self.edge_offsets[edge]:self.edge_offsets[edge + 1]].tolist()
+            best = abs(end - start)
+            best_path = [start_tile] + (tiles[start:end] if start < end else tiles[end - 1:start - 1][::-1])
+
+        # Steps and tiles from each junction at an end of end_tile's corridor to end_tile
+        arrivals: Dict[int, Tuple[int, List[int]]] = {}
+        for junction, steps, tiles in self._legs(end_tile):
+            if junction not in arrivals or steps < arrivals[junction][0]:
+                arrivals[junction] = (steps, tiles[:-1][::-1] + [end_tile] if steps else [])
+
+        # Junction -> (steps from start_tile, edge it was reached by, -1 for
+        # the legs out of start_tile's corridor)
+        reached: Dict[int, Tuple[int, int]] = {}
+        start_legs: Dict[int, List[int]] = {}
+        heap: List[Tuple[int, int]] = []
+        for junction, steps, tiles in self._legs(start_tile):
+            if junction not in reached or steps < reached[junction][0]:
+                reached[junction] = (steps, -1)
+                start_legs[junction] = tiles
+                heapq.heappush(heap, (steps, junction))
+
+        goal: int = -1
+        while heap:
+            steps, junction = heapq.heappop(heap)
+            if steps > reached[junction][0]:
+                continue
+            if best != -1 and steps >= best:
                 break
-            else:
-                Q.remove(u)
-
-                for v in self.adj_list[u]:
-                    if v in ignored_nodes:
-                        continue  # Skip neighbors that are ignored
-                    if v not in Q:
-                        continue  # Skip if already processed
-                    alt: float = distance[u] + 1
-                    if alt < distance[v]:
-                        distance[v] = alt
-                        previous[v] = u
-        
-        return path
\ No newline at end of file
+            if junction in arrivals and (best == -1 or steps + arrivals[junction][0] < best):
+                best = steps + arrivals[junction][0]
+                goal = junction
+            for edge in self.out_edges[junction]:
+                to: int = self.edge_to[edge]
+                cost: int = steps + self.edge_length[edge]
+                if to not in reached or cost < reached[to][0]:
+                    reached[to] = (cost, edge)
+                    heapq.heappush(heap, (cost, to))
+
+        if goal == -1:
+            return best_path
+
+        # Back through the edges taken, then out along the legs at either end
+        edges: List[int] = []
+        junction = goal
+        while reached[junction][1] != -1:
+            edges.append(reached[junction][1])
+            junction = self.edge_from[edges[-1]]
+        path: List[int] = [start_tile] + start_legs[junction]
+        for edge in reversed(edges):
+            path += self.edge_tiles[self.edge_offsets[edge]:self.edge_offsets[edge + 1]].tolist()
+            path.append(self.edge_to[edge])
+        return path + arrivals[goal][1]
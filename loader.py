@@ -0,0 +1,56 @@
+import pygame as pg
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import os
+import bundle
+
+# Decoding threads. pygame releases the GIL while SDL_image decodes a file,
+# so decodes run on separate cores. With one core the pool only adds
+# overhead and loading stays serial
+WORKERS = min(8, os.cpu_count() or 1)
+
+class RawImage(NamedTuple):
+    '''Decoded pixels of one image file, ready for pg.image.frombuffer.'''
+    pixels: bytes | memoryview
+    size: Tuple[int, int]
+    format: str
+
+def decode(asset_path: str) -> RawImage:
+    # Safe on any thread: nothing here touches the display
+    image: pg.Surface = pg.image.load(asset_path)
+    pixel_format: str = 'RGBA' if image.get_flags() & pg.SRCALPHA else 'RGB'
+    return RawImage(pg.image.tobytes(image, pixel_format), image.get_size(), pixel_format)
+
+def decode_all(asset_paths: Iterable[str], workers: int = WORKERS, use_bundle: bool = True) -> Dict[str, RawImage]:
+    # Each distinct path once: straight from the asset bundle when it holds
+    # an up to date copy, otherwise decoded, on a thread pool unless workers is 1
+    paths: List[str] = [path for path in dict.fromkeys(asset_paths) if path]
+    images: Dict[str, RawImage] = {}
+    packed: bundle.Bundle | None = bundle.shared() if use_bundle else None
+    if packed:
+        for path in paths:
+            pixels = packed.get(path)
+            if pixels:
+                images[path] = RawImage(*pixels)
+
+    loose: List[str] = [path for path in paths if path not in images]
+    if workers <= 1 or len(loose) <= 1:
+        images.update((path, decode(path)) for path in loose)
+    else:
+        with ThreadPoolExecutor(max_workers=min(workers, len(loose))) as pool:
+            images.update(zip(loose, pool.map(decode, loose)))
+    return {path: images[path] for path in paths}
+
+def to_surface(raw: RawImage) -> pg.Surface:
+    # Wraps the decoded (or mapped) pixels without copying, the surface keeps them alive
+    return pg.image.frombuffer(raw.pixels, raw.size, raw.format)
+
+def load_images(asset_paths: Iterable[str], workers: int = WORKERS, use_bundle: bool = True) -> Dict[str, pg.Surface]:
+    # Unconverted surfaces, for callers that scale or pack them before converting
+    return {path: to_surface(raw) for path, raw in decode_all(asset_paths, workers, use_bundle).items()}
+
+def load_converted(asset_paths: Iterable[str], workers: int = WORKERS, use_bundle: bool = True) -> Dict[str, pg.Surface]:
+    # Decoded on the pool, converted for the display here on the calling
+    # (main) thread. Needs a display mode, like Surface.convert() does
+    return {path: image.convert_alpha() if image.get_flags() & pg.SRCALPHA else image.convert()
+            for path, image in load_images(asset_paths, workers, use_bundle).items()}
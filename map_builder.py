@@ -1,35 +1,177 @@
 import pygame as pg
+import numpy as np
 import assets
+import autotile
+import loader
+import mapfile
 from tk import tk_save_dialog
 
-from typing import Tuple, List, IO
+from typing import Dict, Tuple, List, IO
 
 
-# Number of nodes in graph (W, H)
+# Number of nodes visible in the window (W, H), and the default size of a new map
 GRPH_SIZE = (28, 36)
 # Size of each node in pixels
 NODE_SIZE = (26, 26)
 # Size of the window in pixels
 SCR_SIZE = (GRPH_SIZE[0] * NODE_SIZE[0], GRPH_SIZE[1] * NODE_SIZE[1])
 
-def draw_grid(screen: pg.Surface, map_assets: List[Tuple[str, bool]]) -> None:
+# Tiles the view moves per arrow key press
+SCROLL_KEYS: Dict[int, Tuple[int, int]] = {
+    pg.K_LEFT: (-1, 0),
+    pg.K_RIGHT: (1, 0),
+    pg.K_UP: (0, -1),
+    pg.K_DOWN: (0, 1),
+}
+
+# How a click paints: tile by tile while the mouse is held, a rectangle
+# dragged out between press and release, or a flood fill of the clicked tile's region
+TOOL_KEYS: Dict[int, str] = {
+    pg.K_b: 'brush',
+    pg.K_r: 'rectangle',
+    pg.K_f: 'fill',
+}
+
+# asset_index values for painting graph nodes and corridors instead of an asset
+GRAPH_NODE = -1
+CORRIDOR = -2
+
+# Scaled tile images and pre-rendered overlays, keyed by asset path or overlay name
+_surface_cache: Dict[str, pg.Surface] = {}
+
+def grid_lines() -> pg.Surface:
+    # Transparent, screen sized surface holding just the grid lines
+    if 'grid_lines' not in _surface_cache:
+        lines: pg.Surface = pg.Surface((SCR_SIZE[0]+1, SCR_SIZE[1]+1), pg.SRCALPHA)
+        for i in range(GRPH_SIZE[0]+1):
+            for j in range(GRPH_SIZE[1]+1):
+                pg.draw.line(lines, pg.Color('gray33'), (i*NODE_SIZE[0], j*NODE_SIZE[1]), (i*NODE_SIZE[0]+NODE_SIZE[0], j*NODE_SIZE[1]), 1)
+                pg.draw.line(lines, pg.Color('gray33'), (i*NODE_SIZE[0], j*NODE_SIZE[1]), (i*NODE_SIZE[0], j*NODE_SIZE[1]+NODE_SIZE[1]), 1)
+        _surface_cache['grid_lines'] = lines
+    return _surface_cache['grid_lines']
+
+def graph_node_overlay() -> pg.Surface:
+    # The translucent green square marking a graph node
+    if 'graph_node' not in _surface_cache:
+        overlay: pg.Surface = pg.Surface(NODE_SIZE, pg.SRCALPHA)
+        pg.draw.rect(overlay, (0, 255, 0, 100), overlay.get_rect())
+        _surface_cache['graph_node'] = overlay
+    return _surface_cache['graph_node']
+
+def tile_rect(node_number: int) -> pg.Rect:
+    return pg.Rect(node_number_to_cursor_pos(node_number), NODE_SIZE)
+
+def draw_grid(screen: pg.Surface, map_assets: List[Tuple[str, bool]], dims: Tuple[int, int] = GRPH_SIZE, origin: Tuple[int, int] = (0, 0)) -> None:
+    # Draws the window's worth of a dims sized map whose top left tile is origin
     screen.fill(pg.Color('black'))
 
-    for i in range(len(map_assets)):
-        position: Tuple[int, int] = node_number_to_cursor_pos(i)
+    for row in range(min(GRPH_SIZE[1], dims[1] - origin[1])):
+        for column in range(min(GRPH_SIZE[0], dims[0] - origin[0])):
+            tile: Tuple[str, bool] = map_assets[(origin[1] + row) * dims[0] + origin[0] + column]
+            position: Tuple[int, int] = (column * NODE_SIZE[0], row * NODE_SIZE[1])
 
-        # Draw image asset
-        if map_assets[i][0]:
-            place_image(screen, load_asset(asset_path=map_assets[i][0]), position)
+            # Draw image asset
+            if tile[0]:
+                place_image(screen, load_asset(asset_path=tile[0]), position)
 
-        # Draw graph node
-        if map_assets[i][1]:
-            draw_rect_alpha(screen, (0, 255, 0, 100), (position[0], position[1], NODE_SIZE[0], NODE_SIZE[1]))
+            # Draw graph node
+            if tile[1]:
+                place_image(screen, graph_node_overlay(), position)
     
-    for i in range(GRPH_SIZE[0]+1):
-        for j in range(GRPH_SIZE[1]+1):
-            pg.draw.line(screen, pg.Color('gray33'), (i*NODE_SIZE[0], j*NODE_SIZE[1]), (i*NODE_SIZE[0]+NODE_SIZE[0], j*NODE_SIZE[1]), 1)
-            pg.draw.line(screen, pg.Color('gray33'), (i*NODE_SIZE[0], j*NODE_SIZE[1]), (i*NODE_SIZE[0], j*NODE_SIZE[1]+NODE_SIZE[1]), 1)
+    screen.blit(grid_lines(), (0, 0))
+
+def draw_tile(screen: pg.Surface, tile: Tuple[str, bool], rect: pg.Rect) -> pg.Rect:
+    # Repaints one tile exactly as draw_grid would, grid lines included
+    screen.fill(pg.Color('black'), rect)
+    if tile[0]:
+        place_image(screen, load_asset(asset_path=tile[0]), rect.topleft)
+    if tile[1]:
+        place_image(screen, graph_node_overlay(), rect.topleft)
+    screen.blit(grid_lines(), rect, rect)
+    return rect
+
+class Canvas:
+    '''
+    Retained-mode copy of the window's view of the map as draw_grid renders
+    it. The map can be larger than the window: origin is the map tile shown
+    at the top left, and scroll() moves it. The view is only rebuilt on a
+    scroll, set_tile repaints just the tile it changes, so the window copies
+    the changed rects from here.
+    '''
+    def __init__(self, map_assets: List[Tuple[str, bool]], dims: Tuple[int, int] = GRPH_SIZE):
+        self.map_assets: List[Tuple[str, bool]] = map_assets
+        self.dims: Tuple[int, int] = dims
+        self.origin: Tuple[int, int] = (0, 0)
+        self.surface: pg.Surface = pg.Surface((SCR_SIZE[0]+1, SCR_SIZE[1]+1)).convert()
+        draw_grid(self.surface, map_assets, dims, self.origin)
+
+    def scroll(self, dx: int, dy: int) -> bool:
+        # Moves the view by whole tiles, kept inside the map. True if it moved
+        x: int = max(0, min(self.origin[0] + dx, self.dims[0] - GRPH_SIZE[0]))
+        y: int = max(0, min(self.origin[1] + dy, self.dims[1] - GRPH_SIZE[1]))
+        if (x, y) == self.origin:
+            return False
+        self.origin = (x, y)
+        draw_grid(self.surface, self.map_assets, self.dims, self.origin)
+        return True
+
+    def node_at(self, cursor_pos: Tuple[int, int]) -> int | None:
+        # Map node under a window position, None past the edge of the map
+        node_x, node_y = cursor_pos_to_selection(cursor_pos)
+        column: int = self.origin[0] + node_x // NODE_SIZE[0]
+        row: int = self.origin[1] + node_y // NODE_SIZE[1]
+        if not (0 <= column < self.dims[0] and 0 <= row < self.dims[1]):
+            return None
+        return row * self.dims[0] + column
+
+    def set_tile(self, node_number: int, tile: Tuple[str, bool]) -> pg.Rect | None:
+        # Returns the repainted rect, or None if the tile was already this or is out of view
+        if not 0 <= node_number < len(self.map_assets) or self.map_assets[node_number] == tile:
+            return None
+        self.map_assets[node_number] = tile
+
+        column: int = node_number % self.dims[0] - self.origin[0]
+        row: int = node_number // self.dims[0] - self.origin[1]
+        if not (0 <= column < GRPH_SIZE[0] and 0 <= row < GRPH_SIZE[1]):
+            return None
+        return draw_tile(self.surface, tile, tile_rect(row * GRPH_SIZE[0] + column))
+
+def painted_tile(tile: Tuple[str, bool], asset_group: List[str], asset_index: int) -> Tuple[str, bool]:
+    # tile after painting it with the selected asset, graph node or corridor
+    if asset_index == CORRIDOR:
+        return autotile.corridor_tile(tile)
+    if asset_index == GRAPH_NODE:
+        return (tile[0], True)
+    return (asset_group[asset_index], tile[1])
+
+def rectangle_nodes(start: int, end: int, dims: Tuple[int, int]) -> List[int]:
+    # Node numbers of the rectangle with opposite corners start and end
+    (top, bottom), (left, right) = sorted((start // dims[0], end // dims[0])), sorted((start % dims[0], end % dims[0]))
+    return [row * dims[0] + column for row in range(top, bottom + 1) for column in range(left, right + 1)]
+
+def flood_nodes(map_assets: List[Tuple[str, bool]], dims: Tuple[int, int], node_number: int) -> List[int]:
+    # Node numbers of the tiles like node_number's joined to it by their sides
+    target: Tuple[str, bool] = map_assets[node_number]
+    same: np.ndarray = np.array([tile == target for tile in map_assets], dtype=bool).reshape(dims[1], dims[0])
+    return np.flatnonzero(autotile.connected(same, [(node_number // dims[0], node_number % dims[0])])).tolist()
+
+def paint_nodes(canvas: Canvas, nodes: List[int], tile_for) -> List[pg.Rect]:
+    # Sets every node to tile_for(its tile), returns the repainted rects
+    rects: List[pg.Rect] = []
+    for node_number in nodes:
+        rect: pg.Rect | None = canvas.set_tile(node_number, tile_for(canvas.map_assets[node_number]))
+        if rect:
+            rects.append(rect)
+    return rects
+
+def retile_walls(canvas: Canvas) -> List[pg.Rect]:
+    # Rebuilds the walls around the corridors (legal tiles), see autotile
+    rects: List[pg.Rect] = []
+    for node_number, tile in autotile.autotile(canvas.map_assets, canvas.dims):
+        rect: pg.Rect | None = canvas.set_tile(node_number, tile)
+        if rect:
+            rects.append(rect)
+    return rects
 
 def cursor_pos_to_selection(cursor_pos: Tuple[int, int]) -> Tuple[int, int]:
     node_x = int((cursor_pos[0] / SCR_SIZE[0]) * GRPH_SIZE[0]) * NODE_SIZE[0]
@@ -47,42 +189,39 @@ def node_number_to_cursor_pos(node_number: int) -> Tuple[int, int]:
 
 def load_asset(*, group: List[str] = [], index: int = -1, asset_path: str = '') -> pg.Surface:
         if group and index > -1:
-            asset_image = pg.image.load(group[index])
-        elif asset_path:
-            asset_image = pg.image.load(asset_path)
-        else:
+            asset_path = group[index]
+        elif not asset_path:
             raise ValueError("No valid asset path or group provided.")
 
-        scaled_image = pg.transform.scale(asset_image, (NODE_SIZE[0], NODE_SIZE[1]))
-        return scaled_image
+        # Decoded and scaled once per asset, then shared
+        if asset_path not in _surface_cache:
+            _surface_cache[asset_path] = pg.transform.scale(pg.image.load(asset_path), (NODE_SIZE[0], NODE_SIZE[1]))
+        return _surface_cache[asset_path]
+
+def preload_assets(asset_paths: List[str]) -> None:
+    # Decodes the uncached paths on loader's thread pool, scaled the same as load_asset
+    for asset_path, image in loader.load_images(path for path in asset_paths if path not in _surface_cache).items():
+        _surface_cache[asset_path] = pg.transform.scale(image, (NODE_SIZE[0], NODE_SIZE[1]))
 
 def place_image(screen: pg.Surface, image: pg.Surface, position: Tuple[int, int]) -> None:
     screen.blit(image, (position[0], position[1]))
 
-def draw_rect_alpha(screen: pg.Surface, color: Tuple[int, int, int, int], rect: Tuple[int, int, int, int]) -> None:
-    shape_surf = pg.Surface(pg.Rect(rect).size, pg.SRCALPHA)
-    pg.draw.rect(shape_surf, color, shape_surf.get_rect())
-    screen.blit(shape_surf, rect)
-
-def save_map_to_file(map_assets: List[Tuple[str, bool]], file_path: str) -> None:
-    with open(file_path, 'w') as f:
-        for asset in map_assets:
-            f.write(f'{asset[0]},{asset[1]}\n')
+def save_map_to_file(map_assets: List[Tuple[str, bool]], file_path: str, dims: Tuple[int, int] = GRPH_SIZE) -> None:
+    # Binary map for a .pmap path, text (one 'path,is_graph_node' line per tile) otherwise.
+    # Only the binary format stores the map size, text maps must be GRPH_SIZE
+    mapfile.save_map(mapfile.MapData.from_tiles(map_assets, dims), file_path)
 
 def load_map_from_file(file_path: str) -> List[Tuple[str, bool]]:
-    with open(file_path, 'r') as f:
-        lines: List[str] = f.readlines()
-        map_assets: List[Tuple[str, bool]] = []
-        for line in lines:
-            asset_path, is_graph_node = line.strip().split(',')
-            map_assets.append((asset_path, is_graph_node == 'True'))
-        return map_assets
-
-def main(map_file_path: str | None = None) -> None:
+    return mapfile.load_map(file_path).to_tiles()
+
+def main(map_file_path: str | None = None, dims: Tuple[int, int] = GRPH_SIZE) -> None:
+    # dims is the size of a new map, a loaded map brings its own
     pg.init()
     screen: pg.Surface = pg.display.set_mode((SCR_SIZE[0]+1, SCR_SIZE[1]+1))
     pg.mouse.set_visible(False)
-    pg.display.set_caption('PacMan Map Builder (Ctr+S to Save to File)')
+    pg.display.set_caption('PacMan Map Builder (Ctr+S to Save to File, arrows to scroll, B/R/F brush/rectangle/fill, 8 corridors, A autotile)')
+    # Held arrow keys keep scrolling
+    pg.key.set_repeat(200, 50)
     clock: pg.time.Clock = pg.time.Clock()
 
     asset_group: List[str] = assets.PELLETS
@@ -90,29 +229,41 @@ def main(map_file_path: str | None = None) -> None:
     asset_image: pg.Surface = load_asset(group=asset_group, index=asset_index)
 
     if not map_file_path:
-        map_assets: List[Tuple[str, bool]] = [('', False) for _ in range(GRPH_SIZE[0]*GRPH_SIZE[1])]
+        map_assets: List[Tuple[str, bool]] = [('', False) for _ in range(dims[0]*dims[1])]
     else:
-        map_assets: List[Tuple[str, bool]] = load_map_from_file(map_file_path)
-    draw_grid(screen, map_assets)
+        map_data: mapfile.MapData = mapfile.load_map(map_file_path)
+        map_assets: List[Tuple[str, bool]] = map_data.to_tiles()
+        dims = (map_data.width, map_data.height)
+    preload_assets([asset_path for asset_path, _ in map_assets])
+    canvas: Canvas = Canvas(map_assets, dims)
+    screen.blit(canvas.surface, (0, 0))
+    pg.display.flip()
 
-    running: bool = True
-    while running:
-        draw_grid(screen, map_assets)
+    # Screen area covered by the hover preview and selection box last frame
+    cursor_rect: pg.Rect | None = None
 
-        cursor_pos: Tuple[int, int] = pg.mouse.get_pos()
-        node_x, node_y = cursor_pos_to_selection(cursor_pos)
+    tool: str = 'brush'
+    # Corner node and mouse button of a rectangle being dragged out
+    drag_start: int | None = None
+    drag_button: int = 1
 
-        # Draw hovering asset image
-        if asset_index > -1:
-            place_image(screen, asset_image, (node_x, node_y))
-        # Draw hovering graph node
-        elif asset_index == -1: 
-            draw_rect_alpha(screen, (0, 255, 0, 100), (node_x, node_y, NODE_SIZE[0], NODE_SIZE[1]))
-        
-        # Draw current selection area
-        pg.draw.rect(screen, pg.Color('gray40'), (node_x, node_y, NODE_SIZE[0]+1, NODE_SIZE[1]+1), 2)
+    def fill(nodes: List[int], button: int) -> List[pg.Rect]:
+        # Paints (left button) or clears (right button) nodes. Corridor
+        # changes rebuild the walls around them
+        if button == 1:
+            rects: List[pg.Rect] = paint_nodes(canvas, nodes, lambda tile: painted_tile(tile, asset_group, asset_index))
+        else:
+            rects = paint_nodes(canvas, nodes, lambda tile: ('', False))
+        if rects and asset_index == CORRIDOR:
+            rects += retile_walls(canvas)
+        return rects
+
+    running: bool = True
+    while running:
+        dirty: List[pg.Rect] = []
 
-        for event in pg.event.get():
+        # Sleep until something happens, nothing on screen changes otherwise
+        for event in [pg.event.wait(), *pg.event.get()]:
             if event.type == pg.QUIT:
                 running = False
 
@@ -122,10 +273,29 @@ def main(map_file_path: str | None = None) -> None:
                     save: IO[str] | None = tk_save_dialog()
                     if save:
                         file_path = save.name
-                        save_map_to_file(map_assets, file_path)
+                        try:
+                            save_map_to_file(map_assets, file_path, dims)
+                        except ValueError as error:
+                            print(error)
+                # Arrow keys scroll maps larger than the window
+                scroll: Tuple[int, int] | None = SCROLL_KEYS.get(event.key)
+                if scroll and canvas.scroll(*scroll):
+                    screen.blit(canvas.surface, (0, 0))
+                    dirty.append(screen.get_rect())
+                    cursor_rect = None
+                # Painting tools
+                if event.key in TOOL_KEYS:
+                    tool = TOOL_KEYS[event.key]
+                    drag_start = None
+                # Rebuild every wall from the corridors
+                if event.key == pg.K_a:
+                    dirty.extend(retile_walls(canvas))
                 # Graph asset (allows placement of graph nodes)
                 if event.key == pg.K_1:
-                    asset_index = -1
+                    asset_index = GRAPH_NODE
+                # Corridors: legal tiles with pellets, walled in automatically
+                if event.key == pg.K_8:
+                    asset_index = CORRIDOR
                 # Image assets
                 if event.key == pg.K_2:
                     asset_index = 0
@@ -160,23 +330,79 @@ def main(map_file_path: str | None = None) -> None:
                     asset_index = (asset_index - 1) % len(asset_group)
                 asset_image = load_asset(group=asset_group, index=asset_index)
 
+            # Rectangles paint from press to release, fills on the click.
+            # Left button paints, right button clears
+            if event.type == pg.MOUSEBUTTONDOWN and event.button in (1, 3) and tool != 'brush':
+                node_num: int | None = canvas.node_at(event.pos)
+                if node_num is not None and tool == 'rectangle':
+                    drag_start, drag_button = node_num, event.button
+                elif node_num is not None:
+                    dirty.extend(fill(flood_nodes(map_assets, dims, node_num), event.button))
+            if event.type == pg.MOUSEBUTTONUP and drag_start is not None and event.button == drag_button:
+                node_num: int | None = canvas.node_at(event.pos)
+                if node_num is not None:
+                    dirty.extend(fill(rectangle_nodes(drag_start, node_num, dims), drag_button))
+                drag_start = None
+            if tool != 'brush':
+                continue
+
             # Drag and drop insert (left mouse hold)
             if pg.mouse.get_pressed()[0]:
                 cursor_pos: Tuple[int, int] = pg.mouse.get_pos()
-                node_x, node_y = cursor_pos_to_selection(cursor_pos)
-                node_num: int = cursor_pos_to_node_number(cursor_pos)
-                if asset_index > -1:
-                    map_assets[node_num] = (asset_group[asset_index], map_assets[node_num][1])
-                elif asset_index == -1: # Placing graph nodes
-                    map_assets[node_num] = (map_assets[node_num][0], True)
+                node_num: int | None = canvas.node_at(cursor_pos)
+                if node_num is None:
+                    continue
+                dirty.extend(fill([node_num], 1))
 
             # Drag and drop clear (right mouse hold)
             if pg.mouse.get_pressed()[2]:
                 cursor_pos: Tuple[int, int] = pg.mouse.get_pos()
-                node_num: int = cursor_pos_to_node_number(cursor_pos)
-                map_assets[node_num] = ('', False)
+                node_num: int | None = canvas.node_at(cursor_pos)
+                if node_num is not None:
+                    dirty.extend(fill([node_num], 3))
+
+        # Erase last frame's cursor and bring over repainted tiles from the canvas
+        if cursor_rect:
+            dirty.append(cursor_rect)
+        for rect in dirty:
+            screen.blit(canvas.surface, rect, rect)
 
-        pg.display.flip()
+        cursor_pos: Tuple[int, int] = pg.mouse.get_pos()
+        node_x, node_y = cursor_pos_to_selection(cursor_pos)
+
+        # Draw hovering asset image
+        if asset_index > -1:
+            place_image(screen, asset_image, (node_x, node_y))
+        # Draw hovering graph node
+        elif asset_index == GRAPH_NODE:
+            place_image(screen, graph_node_overlay(), (node_x, node_y))
+        # Draw hovering corridor
+        elif asset_index == CORRIDOR:
+            place_image(screen, load_asset(asset_path=assets.PELLET), (node_x, node_y))
+            place_image(screen, graph_node_overlay(), (node_x, node_y))
+        
+        # Draw current selection area
+        cursor_rect = pg.draw.rect(screen, pg.Color('gray40'), (node_x, node_y, NODE_SIZE[0]+1, NODE_SIZE[1]+1), 2)
+        # and the rectangle being dragged out, from its first corner to the cursor
+        if drag_start is not None:
+            column: int = drag_start % dims[0] - canvas.origin[0]
+            row: int = drag_start // dims[0] - canvas.origin[1]
+            start: pg.Rect = pg.Rect(column * NODE_SIZE[0], row * NODE_SIZE[1], NODE_SIZE[0]+1, NODE_SIZE[1]+1)
+            selection: pg.Rect = start.union(pg.Rect(node_x, node_y, NODE_SIZE[0]+1, NODE_SIZE[1]+1))
+            cursor_rect = cursor_rect.union(pg.draw.rect(screen, pg.Color('yellow') if drag_button == 1 else pg.Color('red'), selection, 2))
+        dirty.append(cursor_rect)
+
+        pg.display.update(dirty)
         clock.tick(60)
 
     pg.quit()
+
+if __name__ == '__main__':
+    import argparse
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='PacMan map builder')
+    parser.add_argument('map', nargs='?', help='map file to edit (.pmap or text)')
+    parser.add_argument('--size', default=f'{GRPH_SIZE[0]}x{GRPH_SIZE[1]}', help='tiles in a new map as WxH (default %(default)s)')
+    args: argparse.Namespace = parser.parse_args()
+    width, height = (int(n) for n in args.size.lower().split('x'))
+    main(args.map, (width, height))
@@ -0,0 +1,162 @@
+from typing import List, Set, Tuple
+from array import array
+import mmap
+import struct
+import sys
+import assets
+
+# Binary map layout (little endian):
+#   header     magic 'PMAP', version, width, height, palette size  (struct HEADER)
+#   palette    palette size x (uint16 byte length, utf-8 asset path)
+#   tile types width*height x uint8, one of the tile type codes below
+#   assets     width*height x uint16, 0 for no asset else palette index + 1
+#   legal      ceil(width*height / 8) bytes, bit (tile % 8) of byte (tile // 8)
+MAGIC = b'PMAP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHHH')
+EXTENSION = '.pmap'
+# The text format has no header, its maps are always this size (W, H)
+TEXT_MAP_DIMS = (28, 36)
+
+# Tile type codes
+EMPTY = 0
+WALL = 1
+PELLET = 2
+POWER_PELLET = 3
+
+def tile_type_of(asset_path: str) -> int:
+    # The text format has no tile types, they follow from the asset placed on the tile
+    if asset_path == assets.PELLET:
+        return PELLET
+    if asset_path == assets.POWER_PELLET:
+        return POWER_PELLET
+    return WALL if asset_path else EMPTY
+
+class MapData:
+    def __init__(self, width: int, height: int, palette: List[str], tile_types: bytes, asset_indices: array, legal: bytes):
+        self.width: int = width
+        self.height: int = height
+        self.palette: List[str] = palette
+        self.tile_types: bytes = tile_types
+        self.asset_indices: array = asset_indices
+        self.legal: bytes = legal
+
+    def __len__(self) -> int:
+        return self.width * self.height
+
+    def asset_path(self, tile: int) -> str:
+        index: int = self.asset_indices[tile]
+        return self.palette[index - 1] if index else ''
+
+    def is_legal(self, tile: int) -> bool:
+        return bool(self.legal[tile >> 3] & (1 << (tile & 7)))
+
+    def legal_tiles(self) -> Set[int]:
+        return {tile for tile in range(len(self)) if self.is_legal(tile)}
+
+    def tiles_of_type(self, tile_type: int) -> Set[int]:
+        return {tile for tile, code in enumerate(self.tile_types) if code == tile_type}
+
+    def to_tiles(self) -> List[Tuple[str, bool]]:
+        # The (asset path, is graph node) list used by the text format and the map builder
+        return [(self.asset_path(tile), self.is_legal(tile)) for tile in range(len(self))]
+
+    @staticmethod
+    def from_tiles(map_tiles: List[Tuple[str, bool]], dims: Tuple[int, int] | None = None) -> 'MapData':
+        width, height = dims if dims else TEXT_MAP_DIMS
+        if len(map_tiles) != width * height:
+            raise ValueError(f'Expected {width * height} tiles for a {width}x{height} map, got {len(map_tiles)}')
+
+        palette: List[str] = list(dict.fromkeys(path for path, _ in map_tiles if path))
+        palette_index = {path: i + 1 for i, path in enumerate(palette)}
+        legal: bytearray = bytearray((len(map_tiles) + 7) // 8)
+        for tile, (_, is_graph_node) in enumerate(map_tiles):
+            if is_graph_node:
+                legal[tile >> 3] |= 1 << (tile & 7)
+
+        return MapData(
+            width, height, palette,
+            bytes(tile_type_of(path) for path, _ in map_tiles),
+            array('H', [palette_index.get(path, 0) for path, _ in map_tiles]),
+            bytes(legal))
+
+    def to_bytes(self) -> bytes:
+        if len(self.palette) >= 0xFFFF:
+            raise ValueError(f'Too many distinct assets for one map ({len(self.palette)})')
+
+        chunks: List[bytes] = [HEADER.pack(MAGIC, VERSION, self.width, self.height, len(self.palette))]
+        for path in self.palette:
+            encoded: bytes = path.encode('utf-8')
+            chunks.append(struct.pack('<H', len(encoded)) + encoded)
+        indices: array = array('H', self.asset_indices)
+        if sys.byteorder != 'little':
+            indices.byteswap()
+        chunks += [bytes(self.tile_types), indices.tobytes(), bytes(self.legal)]
+        return b''.join(chunks)
+
+    @staticmethod
+    def from_buffer(buffer: bytes | memoryview) -> 'MapData':
+        magic, version, width, height, palette_size = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a binary PacMan map')
+        if version != VERSION:
+            raise ValueError(f'Unsupported binary map version {version}')
+
+        offset: int = HEADER.size
+        palette: List[str] = []
+        for _ in range(palette_size):
+            (length,) = struct.unpack_from('<H', buffer, offset)
+            palette.append(bytes(buffer[offset + 2:offset + 2 + length]).decode('utf-8'))
+            offset += 2 + length
+
+        num_tiles: int = width * height
+        tile_types: bytes = bytes(buffer[offset:offset + num_tiles])
+        offset += num_tiles
+        asset_indices: array = array('H')
+        asset_indices.frombytes(buffer[offset:offset + 2 * num_tiles])
+        if sys.byteorder != 'little':
+            asset_indices.byteswap()
+        offset += 2 * num_tiles
+        legal: bytes = bytes(buffer[offset:offset + (num_tiles + 7) // 8])
+        return MapData(width, height, palette, tile_types, asset_indices, legal)
+
+def read_text_map(file_path: str) -> List[Tuple[str, bool]]:
+    with open(file_path, 'r') as f:
+        map_tiles: List[Tuple[str, bool]] = []
+        for line in f:
+            asset_path, is_graph_node = line.strip().split(',')
+            map_tiles.append((asset_path, is_graph_node == 'True'))
+        return map_tiles
+
+def load_map(file_path: str, use_mmap: bool = False) -> MapData:
+    # Reads either format, binary maps in a single read (or mmap)
+    with open(file_path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            return MapData.from_tiles(read_text_map(file_path))
+        f.seek(0)
+        if use_mmap:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                return MapData.from_buffer(view)
+        return MapData.from_buffer(f.read())
+
+def save_map(map_data: MapData, file_path: str) -> None:
+    # Binary if the path ends in .pmap, the original text format otherwise
+    if file_path.endswith(EXTENSION):
+        with open(file_path, 'wb') as f:
+            f.write(map_data.to_bytes())
+    else:
+        if (map_data.width, map_data.height) != TEXT_MAP_DIMS:
+            raise ValueError(f'Text maps are always {TEXT_MAP_DIMS[0]}x{TEXT_MAP_DIMS[1]}, save a {map_data.width}x{map_data.height} map as {EXTENSION}')
+        with open(file_path, 'w') as f:
+            for asset_path, is_graph_node in map_data.to_tiles():
+                f.write(f'{asset_path},{is_graph_node}\n')
+
+def main() -> None:
+    # Converter: python mapfile.py maps/pacmap.txt maps/pacmap.pmap
+    if len(sys.argv) != 3:
+        print('usage: python mapfile.py <source map> <destination map>')
+        sys.exit(1)
+    save_map(load_map(sys.argv[1]), sys.argv[2])
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+from typing import List, Tuple
+from entities import EntityStore
+import common
+
+# Positions and speeds are whole numbers of sub-pixels. 400 per pixel makes
+# every percentage in the speed tables an exact speed at 60, 120 and 240 Hz
+SUBPIXELS = 400
+
+# Percent of full speed (one pixel per tick at common.BASE_TICK_RATE) by level,
+# as (first level, percent) rows, taken from the arcade game
+PACMAN_SPEEDS: List[Tuple[int, int]] = [(1, 80), (2, 90), (5, 100), (21, 90)]
+PACMAN_FRIGHTENED_SPEEDS: List[Tuple[int, int]] = [(1, 90), (2, 95), (5, 100)]
+GHOST_SPEEDS: List[Tuple[int, int]] = [(1, 75), (2, 85), (5, 95)]
+GHOST_FRIGHTENED_SPEEDS: List[Tuple[int, int]] = [(1, 50), (2, 55), (5, 60)]
+GHOST_TUNNEL_SPEEDS: List[Tuple[int, int]] = [(1, 40), (2, 45), (5, 50)]
+
+def percent_for(table: List[Tuple[int, int]], level: int) -> int:
+    percent: int = table[0][1]
+    for first_level, row_percent in table:
+        if level >= first_level:
+            percent = row_percent
+    return percent
+
+def speed_for(table: List[Tuple[int, int]], level: int, tick_rate: int) -> int:
+    # Sub-pixels per tick, rounded down at tick rates 400 sub-pixels don't divide evenly
+    return percent_for(table, level) * SUBPIXELS * common.BASE_TICK_RATE // (100 * tick_rate)
+
+def to_subpixels(pixels: int) -> int:
+    return pixels * SUBPIXELS
+
+def tile_centre(tile: int, width: int | None = None) -> Tuple[int, int]:
+    # Sub-pixel position characters stand on in the middle of a tile of a width wide map
+    x, y = common.node_number_to_cursor_pos(tile, width)
+    return to_subpixels(x + common.OFFSET[0]), to_subpixels(y + common.OFFSET[1])
+
+def advance(store: EntityStore, slot: int, speed: int) -> int:
+    '''
+    Moves an entity up to `speed` sub-pixels towards its target, which is
+    always straight along one axis (targets are neighbouring tile centres).
+    It lands exactly on the target, and returns the part of `speed` that
+    was left over on arriving, 0 if it didn't arrive or was already there.
+    '''
+    dx: int = store.target_x[slot] - store.x[slot]
+    dy: int = store.target_y[slot] - store.y[slot]
+    distance: int = abs(dx) + abs(dy)
+    if distance == 0:
+        return 0
+
+    if distance > speed:
+        store.x[slot] += speed if dx > 0 else (-speed if dx < 0 else 0)
+        store.y[slot] += speed if dy > 0 else (-speed if dy < 0 else 0)
+        return 0
+
+    store.x[slot] = store.target_x[slot]
+    store.y[slot] = store.target_y[slot]
+    return speed - distance
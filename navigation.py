@@ -0,0 +1,113 @@
+from typing import Dict, Iterator, Set, Tuple
+from array import array
+from graph import CSRGraph, JunctionGraph
+import common
+
+# Slot order of each tile's neighbours, same as Character.direction_to_index()
+RIGHT, DOWN, LEFT, UP = 0, 1, 2, 3
+
+# Most ghost decisions NeighbourTable remembers, the cache starts over once
+# it holds more (a few MB). Targets off the maze make the key space far
+# larger than any game visits, but a long running table must not grow forever
+MAX_DECISIONS = 1 << 16
+
+class NeighbourTable:
+    '''
+    Legal neighbours of every tile of a map, built once at map load and
+    shared by pacman and the ghosts. neighbours[tile*4 + slot] is the tile
+    to the right/below/left/above (slot order above), or -1 if that tile is
+    off the map or not legal.
+
+    graph holds the same adjacency in CSR form. A tile with exactly two
+    legal neighbours is a corridor tile, where a ghost that came from one
+    neighbour can only go on to the other: decide() answers those without
+    measuring distances or caching, so only junction decisions are worked
+    out and remembered.
+    '''
+    def __init__(self, legal_tiles: Set[int], dims: Tuple[int, int] | None = None):
+        width, height = dims if dims else common.TILE_DIMS
+        # Map size (W, H) the tile numbers are relative to
+        self.dims: Tuple[int, int] = (width, height)
+        self.width: int = width
+        self.num_tiles: int = width * height
+        self.neighbours: array = array('i', [-1]) * (self.num_tiles * 4)
+
+        for tile in legal_tiles:
+            x: int = tile % width
+            candidates: Tuple[int, int, int, int] = (
+                tile + 1 if x < width - 1 else -1,
+                tile + width if tile < width * (height - 1) else -1,
+                tile - 1 if x > 0 else -1,
+                tile - width if tile >= width else -1,
+            )
+            for slot, neighbour in enumerate(candidates):
+                if neighbour in legal_tiles:
+                    self.neighbours[tile*4 + slot] = neighbour
+
+        self.graph: CSRGraph = CSRGraph.from_tiles(legal_tiles, width, height)
+        self._junctions: JunctionGraph | None = None
+
+        # Ghost move decisions at junctions keyed on (target, tile, previous tile)
+        # packed into one int, at most MAX_DECISIONS of them
+        self._decisions: Dict[int, int] = {}
+
+    def neighbour(self, tile: int, slot: int) -> int:
+        return self.neighbours[tile*4 + slot]
+
+    def junctions(self) -> JunctionGraph:
+        # Corridor-compressed graph for path queries, built on first use
+        if self._junctions is None:
+            self._junctions = JunctionGraph(self.graph)
+        return self._junctions
+
+    def decide(self, tile: int, previous_tile: int, target_tile: int) -> int:
+        # The legal neighbour (never previous_tile) closest to target_tile,
+        # ties going to the earlier slot; tile itself if there's nowhere to go
+        offsets: array = self.graph.offsets
+        first: int = offsets[tile]
+        if offsets[tile + 1] - first == 2:
+            # Corridor: straight on, wherever the target is
+            a: int = self.graph.neighbours[first]
+            b: int = self.graph.neighbours[first + 1]
+            if previous_tile == a:
+                return b
+            if previous_tile == b:
+                return a
+
+        key: int = (target_tile * self.num_tiles + tile) * (self.num_tiles + 1) + previous_tile + 1
+        decision: int | None = self._decisions.get(key)
+        if decision is None:
+            decision = self.closest_neighbour(tile, previous_tile, target_tile)
+            if len(self._decisions) >= MAX_DECISIONS:
+                self._decisions.clear()
+            self._decisions[key] = decision
+        return decision
+
+    def cached_decisions(self) -> Iterator[Tuple[int, int, int, int]]:
+        # (tile, previous tile, target tile, decision) for every decision held
+        for key, decision in self._decisions.items():
+            rest, previous = divmod(key, self.num_tiles + 1)
+            target_tile, tile = divmod(rest, self.num_tiles)
+            yield tile, previous - 1, target_tile, decision
+
+    def closest_neighbour(self, tile: int, previous_tile: int, target_tile: int) -> int:
+        # decide() without the corridor short cut or the cache. Distances are
+        # measured between tile corners in pixels, like the ghosts always
+        # have, squared since only the order matters
+        tile_x, tile_y = common.node_number_to_cursor_pos(tile, self.width)
+        target_x, target_y = common.node_number_to_cursor_pos(target_tile, self.width)
+        steps: Tuple[Tuple[int, int], ...] = ((common.TILE_SIZE[0], 0), (0, common.TILE_SIZE[1]), (-common.TILE_SIZE[0], 0), (0, -common.TILE_SIZE[1]))
+
+        min_dist: int = -1
+        move_to_node: int = tile
+        for slot in range(4):
+            neighbour: int = self.neighbours[tile*4 + slot]
+            if neighbour == -1 or neighbour == previous_tile:
+                continue
+            dx: int = tile_x + steps[slot][0] - target_x
+            dy: int = tile_y + steps[slot][1] - target_y
+            dist: int = dx*dx + dy*dy
+            if min_dist == -1 or dist < min_dist:
+                min_dist = dist
+                move_to_node = neighbour
+        return move_to_node
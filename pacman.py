@@ -1,7 +1,14 @@
 import pygame as pg
 from typing import Tuple, List, Set, Dict
-from characters import Ghost, PacMan, Character
+from atlas import defer_atlases
+from mapfile import MapData
+from profiler import FrameProfiler
+from renderer import Renderer
+from timing import FixedTimestep
 import common
+import game
+import mapfile
+import random
 
 def legal_tiles(map_assets: List[Tuple[pg.Surface | None, bool]]) -> Set[int]:
     legal_tiles: Set[int] = set()
@@ -13,33 +20,11 @@ def legal_tiles(map_assets: List[Tuple[pg.Surface | None, bool]]) -> Set[int]:
             legal_tiles.add(node_num)
     return legal_tiles
 
-def pellets(map_assets: List[Tuple[pg.Surface | None, bool]]) -> Set[int]:
-    pellet_tiles: Set[int] = set()
+def pellets(map_data: MapData) -> Set[int]:
+    return map_data.tiles_of_type(mapfile.PELLET)
 
-    for node_num in range(len(map_assets)):
-        # This is a bad way of doing it but I don't want to
-        # recode the map saving functionality
-        if map_assets[node_num][0] \
-            and map_assets[node_num][0].get_at((4, 4)) == pg.Color((255, 185, 175)) \
-            and map_assets[node_num][0].get_at((2, 2)) == pg.Color((0, 0, 0)):
-            # This will give us a direct way to determine
-            # if a tile belongs to the set of legal tiles
-            pellet_tiles.add(node_num)
-    return pellet_tiles
-
-def power_pellets(map_assets: List[Tuple[pg.Surface | None, bool]]) -> Set[int]:
-    pellet_tiles: Set[int] = set()
-
-    for node_num in range(len(map_assets)):
-        # This is a bad way of doing it but I don't want to
-        # recode the map saving functionality
-        if map_assets[node_num][0] \
-            and map_assets[node_num][0].get_at((4, 4)) == pg.Color((255, 185, 175)) \
-            and map_assets[node_num][0].get_at((2, 2)) == pg.Color((255, 185, 175)):
-            # This will give us a direct way to determine
-            # if a tile belongs to the set of legal tiles
-            pellet_tiles.add(node_num)
-    return pellet_tiles
+def power_pellets(map_data: MapData) -> Set[int]:
+    return map_data.tiles_of_type(mapfile.POWER_PELLET)
 
 def draw_tile_nums(screen) -> None:
     for tile_num in range(common.TILE_DIMS[0] * common.TILE_DIMS[1]):
@@ -73,117 +58,220 @@ def draw_grid(screen: pg.Surface, map_assets: List[Tuple[pg.Surface | None, bool
                 pg.draw.line(screen, pg.Color('gray33'), (i*common.TILE_SIZE[0], j*common.TILE_SIZE[1]), (i*common.TILE_SIZE[0]+common.TILE_SIZE[0], j*common.TILE_SIZE[1]), 1)
                 pg.draw.line(screen, pg.Color('gray33'), (i*common.TILE_SIZE[0], j*common.TILE_SIZE[1]), (i*common.TILE_SIZE[0], j*common.TILE_SIZE[1]+common.TILE_SIZE[1]), 1)
 
+def draw_splash(screen: pg.Surface) -> None:
+    # Shown as soon as the window opens, while the map and sprites load
+    screen.fill(pg.Color('black'))
+    text: pg.Surface = pg.font.Font(None, 24).render('Loading...', True, pg.Color('yellow'))
+    screen.blit(text, text.get_rect(center=screen.get_rect().center))
+    pg.display.flip()
+
+def map_assets_from_data(map_data: MapData) -> List[Tuple[pg.Surface | None, bool]]:
+    map_assets: List[Tuple[pg.Surface | None, bool]] = []
+    map_tiles: List[Tuple[str, bool]] = map_data.to_tiles()
+    common.ASSETS.preload(asset_path for asset_path, _ in map_tiles)
+    for asset_path, is_graph_node in map_tiles:
+        asset: pg.Surface | None = common.load_asset(asset_path) if asset_path else None
+        map_assets.append((asset, is_graph_node))
+    return map_assets
+
 def load_map_from_file(file_path: str) -> List[Tuple[pg.Surface | None, bool]]:
-    with open(file_path, 'r') as f:
-        lines: List[str] = f.readlines()
-        map_assets: List[Tuple[pg.Surface | None, bool]] = []
-        for line in lines:
-            asset_path, is_graph_node = line.strip().split(',')
-            asset: pg.Surface | None = common.load_asset(asset_path) if asset_path else None
-            map_assets.append((asset, is_graph_node == 'True'))
-        return map_assets
-
-def main() -> None:
+    return map_assets_from_data(mapfile.load_map(file_path))
+
+MAP_FILE = 'maps/pacmap.pmap'
+
+# Keyboard controls fed into the simulation each frame
+KEY_INPUTS: Dict[int, game.Input] = {
+    pg.K_UP: game.Input.UP,
+    pg.K_DOWN: game.Input.DOWN,
+    pg.K_LEFT: game.Input.LEFT,
+    pg.K_RIGHT: game.Input.RIGHT,
+    pg.K_s: game.Input.SCATTER,
+    pg.K_c: game.Input.CHASE,
+}
+
+# Profiler controls: toggle timing and its overlay, write the recorded frames
+# to CSV, and cProfile the next PROFILE_CAPTURE_FRAMES frames
+PROFILER_KEY = pg.K_F1
+PROFILER_CSV_KEY = pg.K_F2
+PROFILER_CAPTURE_KEY = pg.K_F3
+PROFILE_CAPTURE_FRAMES = 300
+
+def main(record_path: str | None = None, spectate_port: int | None = None) -> None:
     pg.init()
     if common.SHOW_GRID_LINES:
         common.SCR_SIZE = (common.SCR_SIZE[0] + 1, common.SCR_SIZE[1] + 1)
     screen: pg.Surface = pg.display.set_mode((common.SCR_SIZE[0], common.SCR_SIZE[1]), pg.SCALED)
     pg.display.set_caption('PacMan')
     clock: pg.time.Clock = pg.time.Clock()
+    draw_splash(screen)
+
+    # Sprites and tiles are packed into atlases, each one only when it's first needed
+    defer_atlases()
 
     # Data concerning the images drawn to the map
     # Each element is a tuple (surface, is_graph_node AKA is legal tile)
-    map_assets: List[Tuple[pg.Surface | None, bool]] = load_map_from_file('maps/pacmap.txt')
+    map_data: MapData = mapfile.load_map(MAP_FILE)
+    # The drawing helpers place tiles by the loaded map's width
+    common.set_map_dims((map_data.width, map_data.height))
+    map_assets: List[Tuple[pg.Surface | None, bool]] = map_assets_from_data(map_data)
     print(len(map_assets))
+    if common.DEBUG_MODE:
+        print(f'Asset cache: {common.ASSETS}')
 
-    # Set of legal tiles (accessible by pacman or the ghosts)
-    legal_space: Set[int] = legal_tiles(map_assets)
-    dots: Set[int] = pellets(map_assets)
-    energizers: Set[int] = power_pellets(map_assets)
-    dot_count: int = len(dots) + len(energizers)
+    # All game rules live in the headless simulation, this loop only
+    # feeds it input and draws the result
+    state: game.GameState = game.GameState(map_data, tick_rate=common.SIM_TICK_RATE, seed=random.randrange(2**32))
+    # Logs the input each tick consumed, saved on exit for replay.py
+    recorder: 'Recorder | None' = None
+    if record_path:
+        from replay import Recorder
+        recorder = Recorder(state, map_data)
+    # Streams every tick to spectate.py clients on localhost
+    spectators: 'SpectatorServer | None' = None
+    if spectate_port is not None:
+        from replay import map_hash
+        from spectate import SpectatorServer
+        spectators = SpectatorServer(map_hash(map_data), spectate_port)
+        spectators.start()
+        print(f'Spectators can watch on port {spectators.port}')
 
-    pacman: PacMan = PacMan(current_tile=742, legal_tiles=legal_space)
-    score: int = 0
+    # The layered renderer can't show the debug overlays, those fall back to
+    # redrawing the whole grid every frame (without scrolling, so only the
+    # top left of maps larger than the window is visible)
+    debug_overlays: bool = common.SHOW_GRID_LINES or common.SHOW_TILE_NUMS or common.SHOW_TARGET_NODES
+    renderer: Renderer = Renderer(screen, map_assets, state.dots | state.energizers, (map_data.width, map_data.height))
 
-    ghosts: Dict[str, Ghost] = {
-        'Blinky': Ghost(name=Ghost.Name.BLINKY, current_tile=405, scatter_target_node=25, dot_limit=0),
-        'Pinky': Ghost(name=Ghost.Name.PINKY, current_tile=405, scatter_target_node=2, dot_limit=0, direction=Character.Direction.DOWN),
-        'Inky': Ghost(name=Ghost.Name.INKY, current_tile=405, scatter_target_node=979, dot_limit=30, direction=Character.Direction.UP),
-        'Clyde': Ghost(name=Ghost.Name.CLYDE, current_tile=405, scatter_target_node=952, dot_limit=60, direction=Character.Direction.UP)
-    }
+    # Input waits here until the next simulation tick consumes it
+    inputs: List[game.Input] = []
+    timestep: FixedTimestep = FixedTimestep(common.SIM_TICK_RATE)
 
-    pause_before_death: bool = False
-    pause_frames: int = 80
-    curr_pause_frame: int = 0
+    # Only referenced from state.profiler while switched on, so an idle
+    # profiler costs one falsy check per phase
+    profiler: FrameProfiler = FrameProfiler()
 
     running: bool = True
     while running:
-        draw_grid(screen, map_assets)
-        if common.SHOW_TILE_NUMS:
-            draw_tile_nums(screen)
-
-        # PACMAN
-        if not pause_before_death:
-            pacman.smooth_move()
-            pacman.animate()
-        pacman.render(screen)
-
-        if pacman.current_tile in dots:
-            map_assets[pacman.current_tile] = (None, True)
-            dots.remove(pacman.current_tile)
-            score += 10
-        elif pacman.current_tile in energizers:
-            map_assets[pacman.current_tile] = (None, True)
-            energizers.remove(pacman.current_tile)
-            score += 50
-
-        # GHOSTS
-        for ghost in ghosts.values():
-            ghost.choose_target_tile(blinky=ghosts['Blinky'], pacman=pacman)
-
-            if not pause_before_death:
-                ghost.smooth_move(legal_space)
-            ghost.animate()
-            ghost.render(screen)
-
-            ghost.checkDotCount(dot_count - (len(dots) + len(energizers)))
-
-            if not ghost.in_monster_pen() and ghost.current_tile == pacman.current_tile:
-                pause_before_death = True
-        
-        if pause_before_death:
-            curr_pause_frame += 1
-            if curr_pause_frame >= pause_frames:
-                ghosts.clear()
-                pacman.slowly_kill()
-                pacman.animate()
+        prof: FrameProfiler | None = state.profiler
 
         # EVENTS
+        if prof:
+            prof.begin('events')
         for event in pg.event.get():
             if event.type == pg.QUIT:
                 running = False
 
+            if event.type == pg.WINDOWEXPOSED:
+                renderer.invalidate()
+
             if event.type == pg.KEYDOWN:
-                if not pacman.is_dying():
-                    if event.key == pg.K_UP:
-                        pacman.direction = Character.Direction.UP
-                    elif event.key == pg.K_DOWN:
-                        pacman.direction = Character.Direction.DOWN
-                    elif event.key == pg.K_LEFT:
-                        pacman.direction = Character.Direction.LEFT
-                    elif event.key == pg.K_RIGHT:
-                        pacman.direction = Character.Direction.RIGHT
-                    elif event.key == pg.K_s:
-                        for ghost in ghosts.values():
-                            ghost.set_mode(Ghost.Mode.SCATTER)
-                    elif event.key == pg.K_c:
-                        for ghost in ghosts.values():
-                            ghost.set_mode(Ghost.Mode.CHASE)
+                if event.key in KEY_INPUTS:
+                    inputs.append(KEY_INPUTS[event.key])
+                elif event.key == PROFILER_KEY:
+                    profiler.show_overlay = not profiler.show_overlay
+                    state.profiler = profiler if profiler.show_overlay or profiler.capturing else None
+                    renderer.invalidate()
+                elif event.key == PROFILER_CSV_KEY:
+                    if profiler.records:
+                        print(f'Wrote {len(profiler.records)} frames to {profiler.export_csv()}')
+                    else:
+                        print('No frames recorded yet, turn the profiler on with F1 or F3 first')
+                elif event.key == PROFILER_CAPTURE_KEY:
+                    state.profiler = profiler
+                    profiler.capture_cprofile(PROFILE_CAPTURE_FRAMES)
+        if prof:
+            prof.end('events')
+
+        ticks: int = timestep.advance()
+        for _ in range(ticks):
+            if recorder:
+                recorder.step(inputs)
+            else:
+                game.step(state, inputs)
+            inputs = []
+            if state.eaten_tile != -1:
+                map_assets[state.eaten_tile] = (None, True)
+            if spectators:
+                spectators.publish(state)
+
+        if not timestep.should_render(ticks):
+            # A finished capture switches the profiler back off unless the overlay is up
+            if prof and prof.end_frame() and not profiler.show_overlay:
+                state.profiler = None
+            continue
+
+        if debug_overlays:
+            if prof:
+                prof.begin('draw_grid')
+            draw_grid(screen, map_assets)
+            if prof:
+                prof.end('draw_grid')
+            if common.SHOW_TILE_NUMS:
+                if prof:
+                    prof.begin('tile numbers')
+                draw_tile_nums(screen)
+                if prof:
+                    prof.end('tile numbers')
+
+            if prof:
+                prof.begin('PacMan render')
+            state.pacman.render(screen)
+            if prof:
+                prof.end('PacMan render')
+            for name, ghost in state.ghosts.items():
+                if prof:
+                    prof.begin(f'{name} render')
+                ghost.render(screen)
+                if prof:
+                    prof.end(f'{name} render')
+        else:
+            if prof:
+                prof.begin('pellets')
+            renderer.sync_pellets(state.dots, state.energizers)
+            if prof:
+                prof.end('pellets')
+                prof.begin('sprites')
+            # One blits() call for every character, timed as a whole
+            alpha: float = timestep.alpha()
+            renderer.camera.follow(state.pacman.render_pos(alpha))
+            renderer.draw([state.pacman, *state.ghosts.values()], alpha)
+            if prof:
+                prof.end('sprites')
+
+        if profiler.show_overlay:
+            profiler.draw_overlay(screen)
+            # The overlay isn't tracked by the renderer's dirty rects
+            renderer.invalidate()
+
+        if prof:
+            prof.begin('display.flip')
+        if debug_overlays:
+            pg.display.flip()
+        else:
+            renderer.present()
+        if prof:
+            prof.end('display.flip')
 
         if common.SHOW_FPS:
             pg.display.set_caption(f'PacMan (FPS: {clock.get_fps():.0f})')
 
-        pg.display.flip()
-        clock.tick(60)
+        if prof:
+            if prof.end_frame() and not profiler.show_overlay:
+                state.profiler = None
+        clock.tick(common.MAX_FPS)
 
     pg.quit()
+
+    if spectators:
+        spectators.close()
+    if recorder:
+        recorder.save(record_path)
+        print(f'Recorded {state.tick} ticks to {record_path}')
+
+if __name__ == '__main__':
+    import argparse
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Play PacMan')
+    parser.add_argument('--record', metavar='PATH', help='record the session for replay.py (e.g. session.prec)')
+    parser.add_argument('--spectate', metavar='PORT', type=int, help='stream the game to spectate.py clients on this port (0 picks a free one)')
+    args: argparse.Namespace = parser.parse_args()
+    main(args.record, args.spectate)
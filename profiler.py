@@ -0,0 +1,104 @@
+import pygame as pg
+from typing import Deque, Dict, List, Tuple
+from collections import deque
+import cProfile
+import csv
+import time
+
+class FrameProfiler:
+    '''
+    Times named phases of each frame with begin()/end() pairs. Keeps a rolling
+    window of per-frame totals for the overlay and every frame's record for
+    CSV export. Callers hold it as an optional reference (None when
+    profiling is off), so a disabled profiler costs one branch per phase.
+    '''
+    def __init__(self, window: int = 300, max_records: int = 100_000):
+        self.window: int = window
+        self.max_records: int = max_records
+        self.show_overlay: bool = False
+
+        self.history: Dict[str, Deque[float]] = {}
+        self.records: List[Dict[str, float]] = []
+        self._frame: Dict[str, float] = {}
+        self._started: Dict[str, float] = {}
+
+        self._cprofile: cProfile.Profile | None = None
+        self._cprofile_path: str = ''
+        self._cprofile_frames: int = 0
+
+        self._font: pg.font.Font | None = None
+
+    def begin(self, phase: str) -> None:
+        self._started[phase] = time.perf_counter()
+
+    def end(self, phase: str) -> None:
+        # Phases may run several times a frame (one per simulation tick), their times add up
+        elapsed: float = time.perf_counter() - self._started[phase]
+        self._frame[phase] = self._frame.get(phase, 0.0) + elapsed
+
+    @property
+    def capturing(self) -> bool:
+        # A cProfile capture is running
+        return self._cprofile is not None
+
+    def end_frame(self) -> bool:
+        # True when this frame finished a cProfile capture
+        for phase, elapsed in self._frame.items():
+            if phase not in self.history:
+                self.history[phase] = deque(maxlen=self.window)
+            self.history[phase].append(elapsed)
+        if len(self.records) < self.max_records:
+            self.records.append(self._frame)
+        self._frame = {}
+
+        if self._cprofile:
+            self._cprofile_frames -= 1
+            if self._cprofile_frames <= 0:
+                self._cprofile.disable()
+                self._cprofile.dump_stats(self._cprofile_path)
+                print(f'Wrote cProfile capture to {self._cprofile_path}')
+                self._cprofile = None
+                return True
+        return False
+
+    def percentiles(self, phase: str) -> Tuple[float, float, float]:
+        # Rolling p50/p95/p99 of a phase in seconds
+        samples: List[float] = sorted(self.history[phase])
+        last: int = len(samples) - 1
+        return samples[last * 50 // 100], samples[last * 95 // 100], samples[last * 99 // 100]
+
+    def capture_cprofile(self, frames: int, path: str = '') -> None:
+        # Runs cProfile over the next `frames` frames and writes a .pstats file
+        if self._cprofile:
+            return
+        self._cprofile_path = path or time.strftime('profile_%Y%m%d_%H%M%S.pstats')
+        self._cprofile_frames = frames
+        self._cprofile = cProfile.Profile()
+        self._cprofile.enable()
+
+    def export_csv(self, path: str = '') -> str:
+        # One row per recorded frame, one column per phase in milliseconds
+        path = path or time.strftime('frames_%Y%m%d_%H%M%S.csv')
+        phases: List[str] = list(dict.fromkeys(phase for record in self.records for phase in record))
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame', *phases])
+            for frame, record in enumerate(self.records):
+                writer.writerow([frame, *(f'{record.get(phase, 0.0) * 1e3:.4f}' for phase in phases)])
+        return path
+
+    def draw_overlay(self, screen: pg.Surface) -> None:
+        if not self._font:
+            self._font = pg.font.Font(None, 12)
+
+        lines: List[str] = ['phase  p50/p95/p99 ms']
+        for phase in self.history:
+            p50, p95, p99 = self.percentiles(phase)
+            lines.append(f'{phase} {p50 * 1e3:.2f}/{p95 * 1e3:.2f}/{p99 * 1e3:.2f}')
+
+        height: int = self._font.get_linesize()
+        background: pg.Surface = pg.Surface((screen.get_width(), height * len(lines) + 2), pg.SRCALPHA)
+        background.fill((0, 0, 0, 180))
+        screen.blit(background, (0, 0))
+        for i, line in enumerate(lines):
+            screen.blit(self._font.render(line, True, pg.Color('white')), (2, 1 + i * height))
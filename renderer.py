@@ -0,0 +1,158 @@
+import pygame as pg
+from typing import Dict, Iterable, List, Set, Tuple
+from characters import Character
+import common
+
+# Width and height of a pre-baked map chunk in tiles
+CHUNK_TILES = 16
+
+class Camera:
+    '''
+    The window's view of the map: the map pixel shown at the top left
+    corner, kept inside the map (maps smaller than the window don't scroll).
+    '''
+    def __init__(self, view_size: Tuple[int, int], map_size: Tuple[int, int]):
+        self.view_size: Tuple[int, int] = view_size
+        self.map_size: Tuple[int, int] = map_size
+        self.x: int = 0
+        self.y: int = 0
+
+    def follow(self, pos: Tuple[float, float]) -> None:
+        # Centres the view on pos as far as the map edges allow
+        self.x = max(0, min(int(pos[0]) - self.view_size[0] // 2, self.map_size[0] - self.view_size[0]))
+        self.y = max(0, min(int(pos[1]) - self.view_size[1] // 2, self.map_size[1] - self.view_size[1]))
+
+    @property
+    def rect(self) -> pg.Rect:
+        return pg.Rect(self.x, self.y, self.view_size[0], self.view_size[1])
+
+class Renderer:
+    '''
+    Layered alternative to pacman.draw_grid for the normal game view.
+
+    The maze and its pellets are baked into CHUNK_TILES square surfaces the
+    first time they come into view, and an eaten pellet is erased from its
+    chunk. A frame only blits the chunks the camera sees, so its cost does
+    not grow with the map. While the camera stands still only the rectangles
+    the characters covered last frame and cover now are restored, redrawn
+    and sent to the display.
+    '''
+    def __init__(self, screen: pg.Surface, map_assets: List[Tuple[pg.Surface | None, bool]], pellet_tiles: Set[int], dims: Tuple[int, int] | None = None):
+        self.screen: pg.Surface = screen
+        self.dims: Tuple[int, int] = dims if dims else common.TILE_DIMS
+        self.camera: Camera = Camera(screen.get_size(), (self.dims[0] * common.TILE_SIZE[0], self.dims[1] * common.TILE_SIZE[1]))
+
+        self._map_assets: List[Tuple[pg.Surface | None, bool]] = map_assets
+        self._pellet_tiles: Set[int] = set(pellet_tiles)
+        self._eaten: Set[int] = set()
+        self._chunk_size: Tuple[int, int] = (CHUNK_TILES * common.TILE_SIZE[0], CHUNK_TILES * common.TILE_SIZE[1])
+        self._chunks: Dict[Tuple[int, int], pg.Surface] = {}
+
+        # Map areas changed since the last update (erased pellets), and the
+        # screen rects of the characters drawn in the previous and this frame
+        self._dirty: List[pg.Rect] = []
+        self._sprite_rects: List[pg.Rect] = []
+        self._drawn: List[pg.Rect] = []
+        self._presented: List[pg.Rect] = []
+        self._camera_pos: Tuple[int, int] | None = None
+        self._full_redraw: bool = True
+
+    def _chunk(self, chunk: Tuple[int, int]) -> pg.Surface:
+        # Baked on first use from the map assets, minus the pellets eaten so far
+        surface: pg.Surface | None = self._chunks.get(chunk)
+        if surface is None:
+            surface = pg.Surface(self._chunk_size).convert()
+            surface.fill(pg.Color('black'))
+            width, height = self.dims
+            blits: List[Tuple[pg.Surface, Tuple[int, int]]] = []
+            for row in range(chunk[1] * CHUNK_TILES, min((chunk[1] + 1) * CHUNK_TILES, height)):
+                for column in range(chunk[0] * CHUNK_TILES, min((chunk[0] + 1) * CHUNK_TILES, width)):
+                    asset: pg.Surface | None = self._map_assets[row * width + column][0]
+                    if asset and row * width + column not in self._eaten:
+                        blits.append((asset, ((column % CHUNK_TILES) * common.TILE_SIZE[0], (row % CHUNK_TILES) * common.TILE_SIZE[1])))
+            surface.blits(blits, doreturn=False)
+            self._chunks[chunk] = surface
+        return surface
+
+    def _blit_map(self, area: pg.Rect) -> None:
+        # Copies the map pixels in area (map coordinates) to where the camera shows them
+        area = area.clip(pg.Rect((0, 0), self.camera.map_size))
+        if not area.width or not area.height:
+            return
+        chunk_w, chunk_h = self._chunk_size
+        blits: List[Tuple[pg.Surface, Tuple[int, int], pg.Rect]] = []
+        for chunk_y in range(area.top // chunk_h, (area.bottom - 1) // chunk_h + 1):
+            for chunk_x in range(area.left // chunk_w, (area.right - 1) // chunk_w + 1):
+                chunk_rect: pg.Rect = pg.Rect(chunk_x * chunk_w, chunk_y * chunk_h, chunk_w, chunk_h)
+                part: pg.Rect = area.clip(chunk_rect)
+                blits.append((self._chunk((chunk_x, chunk_y)), (part.x - self.camera.x, part.y - self.camera.y), part.move(-chunk_rect.x, -chunk_rect.y)))
+        self.screen.blits(blits, doreturn=False)
+
+    def _restore(self, rect: pg.Rect) -> None:
+        # Background under a screen rect, black where it runs past the map
+        self.screen.fill(pg.Color('black'), rect)
+        self._blit_map(rect.move(self.camera.x, self.camera.y))
+
+    def sync_pellets(self, dots: Set[int], energizers: Set[int]) -> None:
+        # Cheap count check first, the set difference only runs when something was eaten
+        if len(dots) + len(energizers) == len(self._pellet_tiles):
+            return
+
+        chunk_w, chunk_h = self._chunk_size
+        for node_num in self._pellet_tiles - dots - energizers:
+            x, y = common.node_number_to_cursor_pos(node_num, self.dims[0])
+            rect: pg.Rect = pg.Rect(x, y, common.TILE_SIZE[0], common.TILE_SIZE[1])
+            chunk: pg.Surface | None = self._chunks.get((x // chunk_w, y // chunk_h))
+            if chunk:
+                chunk.fill(pg.Color('black'), rect.move(-(x // chunk_w) * chunk_w, -(y // chunk_h) * chunk_h))
+            self._eaten.add(node_num)
+            self._dirty.append(rect)
+        self._pellet_tiles &= dots | energizers
+
+    def draw(self, characters: Iterable[Character], alpha: float = 1.0) -> None:
+        # Scrolling moves everything on screen
+        if (self.camera.x, self.camera.y) != self._camera_pos:
+            self._camera_pos = (self.camera.x, self.camera.y)
+            self._full_redraw = True
+
+        # Pellet erasures only touched the chunks so far
+        dirty: List[pg.Rect] = [rect.move(-self.camera.x, -self.camera.y) for rect in self._dirty]
+        if self._full_redraw:
+            self._restore(self.screen.get_rect())
+        else:
+            # Erase the characters drawn last frame
+            for rect in self._sprite_rects + dirty:
+                self._restore(rect)
+
+        sprites: List[Tuple[pg.Surface, Tuple[float, float], pg.Rect | None]] = []
+        for character in characters:
+            sprite = character.sprite(alpha)
+            if sprite:
+                source, area = self._source(sprite[0])
+                sprites.append((source, (sprite[1][0] - self.camera.x, sprite[1][1] - self.camera.y), area))
+        self._drawn = self.screen.blits(sprites)
+        self._presented = self._sprite_rects + dirty + self._drawn
+
+    def present(self) -> None:
+        # Sends what draw() changed to the display
+        if self._full_redraw:
+            pg.display.flip()
+            self._full_redraw = False
+        else:
+            pg.display.update(self._presented)
+
+        self._sprite_rects = self._drawn
+        self._dirty = []
+
+    @staticmethod
+    def _source(image: pg.Surface) -> Tuple[pg.Surface, pg.Rect | None]:
+        # Atlas-backed sprites are blitted as a sub-rect of the atlas itself
+        # so one blits() call reads every character from the same surface
+        parent: pg.Surface | None = image.get_parent()
+        if parent is None:
+            return image, None
+        return parent, pg.Rect(image.get_offset(), image.get_size())
+
+    def invalidate(self) -> None:
+        # Next draw repaints and presents the whole screen
+        self._full_redraw = True
@@ -0,0 +1,154 @@
+from typing import Dict, Iterable, List, NamedTuple, Tuple
+import argparse
+import hashlib
+import struct
+import zlib
+from characters import Character
+from mapfile import MapData
+import game
+import mapfile
+
+# Recording layout (little endian):
+#   header  magic 'PREC', version, seed, tick rate, map hash (sha256 of the
+#           binary map), ticks played, final checksum, event count  (struct HEADER)
+#   events  event count x (uint32 tick, uint8 input code)
+# Only ticks that received input have events, an idle game is just the header.
+MAGIC = b'PREC'
+VERSION = 1
+HEADER = struct.Struct('<4sHQH32sIII')
+EVENT = struct.Struct('<IB')
+EXTENSION = '.prec'
+
+# game.Input <-> code stored in the recording
+INPUT_CODES: Dict[game.Input, int] = {game_input: code for code, game_input in enumerate(game.Input)}
+INPUTS: List[game.Input] = list(game.Input)
+
+DIRECTION_CODES: Dict[Character.Direction, int] = {direction: code for code, direction in enumerate(Character.Direction)}
+
+def map_hash(map_data: MapData) -> bytes:
+    # Same for a map whichever format it was loaded from
+    return hashlib.sha256(map_data.to_bytes()).digest()
+
+def state_checksum(state: game.GameState, previous: int = 0) -> int:
+    # CRC32 of everything that can diverge between two runs, chained onto the
+    # previous tick's checksum so the last one covers the whole game
+    pacman = state.pacman
+    crc: int = zlib.crc32(struct.pack(
+        '<IiiiBii', state.tick, state.score, len(state.dots) + len(state.energizers),
+        pacman.current_tile, DIRECTION_CODES[pacman.direction], *pacman.subpixel_pos), previous)
+    for ghost in state.ghosts.values():
+        crc = zlib.crc32(struct.pack(
+            '<iBii', ghost.current_tile, DIRECTION_CODES[ghost.direction], *ghost.subpixel_pos), crc)
+    return crc
+
+class Recording(NamedTuple):
+    seed: int
+    tick_rate: int
+    map_hash: bytes
+    ticks: int
+    checksum: int
+    # (tick, input code), in tick order
+    events: List[Tuple[int, int]]
+
+    def inputs_by_tick(self) -> Dict[int, List[game.Input]]:
+        inputs: Dict[int, List[game.Input]] = {}
+        for tick, code in self.events:
+            inputs.setdefault(tick, []).append(INPUTS[code])
+        return inputs
+
+    def to_bytes(self) -> bytes:
+        header: bytes = HEADER.pack(MAGIC, VERSION, self.seed, self.tick_rate, self.map_hash, self.ticks, self.checksum, len(self.events))
+        return header + b''.join(EVENT.pack(tick, code) for tick, code in self.events)
+
+    @staticmethod
+    def from_bytes(buffer: bytes) -> 'Recording':
+        magic, version, seed, tick_rate, hashed, ticks, checksum, num_events = HEADER.unpack_from(buffer, 0)
+        if magic != MAGIC:
+            raise ValueError('Not a PacMan recording')
+        if version != VERSION:
+            raise ValueError(f'Unsupported recording version {version}')
+        events: List[Tuple[int, int]] = list(EVENT.iter_unpack(buffer[HEADER.size:HEADER.size + num_events * EVENT.size]))
+        return Recording(seed, tick_rate, hashed, ticks, checksum, events)
+
+class Recorder:
+    '''
+    Steps a game while logging the input each tick consumed and chaining the
+    per-tick checksum, so the session can be replayed exactly.
+    '''
+    def __init__(self, state: game.GameState, map_data: MapData):
+        self.state: game.GameState = state
+        self.map_hash: bytes = map_hash(map_data)
+        self.events: List[Tuple[int, int]] = []
+        self.checksum: int = 0
+
+    def step(self, inputs: Iterable[game.Input] = ()) -> None:
+        inputs = list(inputs)
+        for game_input in inputs:
+            self.events.append((self.state.tick, INPUT_CODES[game_input]))
+        game.step(self.state, inputs)
+        self.checksum = state_checksum(self.state, self.checksum)
+
+    def recording(self) -> Recording:
+        return Recording(self.state.seed, self.state.tick_rate, self.map_hash, self.state.tick, self.checksum, self.events)
+
+    def save(self, file_path: str) -> None:
+        with open(file_path, 'wb') as f:
+            f.write(self.recording().to_bytes())
+
+def load_recording(file_path: str) -> Recording:
+    with open(file_path, 'rb') as f:
+        return Recording.from_bytes(f.read())
+
+class ReplayResult(NamedTuple):
+    score: int
+    # Tick pacman was caught on, -1 if he never was
+    death_tick: int
+    ticks: int
+    checksum: int
+    checksums: List[int]
+
+def replay(recording: Recording, map_data: MapData) -> ReplayResult:
+    # Replays headless as fast as possible, one checksum per tick
+    if map_hash(map_data) != recording.map_hash:
+        raise ValueError('Recording was made on a different map')
+
+    state: game.GameState = game.GameState(map_data, tick_rate=recording.tick_rate, seed=recording.seed)
+    inputs: Dict[int, List[game.Input]] = recording.inputs_by_tick()
+    checksums: List[int] = []
+    checksum: int = 0
+    death_tick: int = -1
+    for tick in range(recording.ticks):
+        game.step(state, inputs.get(tick, ()))
+        checksum = state_checksum(state, checksum)
+        checksums.append(checksum)
+        if death_tick == -1 and state.caught_by is not None:
+            death_tick = state.tick
+    return ReplayResult(state.score, death_tick, state.tick, checksum, checksums)
+
+def main() -> None:
+    import time
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Replay a recorded PacMan session headless')
+    parser.add_argument('recording', help=f'{EXTENSION} file written by python pacman.py --record')
+    parser.add_argument('--map', default='maps/pacmap.pmap', help='map the session was played on')
+    parser.add_argument('--checksums', help='write the per-tick checksums here, one hex value per line')
+    args: argparse.Namespace = parser.parse_args()
+
+    recording: Recording = load_recording(args.recording)
+    start: float = time.perf_counter()
+    result: ReplayResult = replay(recording, mapfile.load_map(args.map))
+    elapsed: float = time.perf_counter() - start
+
+    print(f'{result.ticks} ticks, {len(recording.events)} inputs replayed in {elapsed:.3f}s ({result.ticks / elapsed:.0f} ticks/s)')
+    print(f'score {result.score}, caught at tick {result.death_tick}, checksum {result.checksum:08x}')
+    if args.checksums:
+        with open(args.checksums, 'w') as f:
+            f.writelines(f'{checksum:08x}\n' for checksum in result.checksums)
+
+    if result.checksum != recording.checksum:
+        print(f'MISMATCH: the recorded game ended with checksum {recording.checksum:08x}')
+        raise SystemExit(1)
+    print('matches the recorded game')
+
+if __name__ == '__main__':
+    main()
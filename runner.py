@@ -0,0 +1,156 @@
+from typing import Counter as CounterType, Dict, List, NamedTuple, Set, Tuple
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import argparse
+import os
+import random
+import time
+from characters import Ghost
+from mapfile import MapData
+import game
+import mapfile
+
+class Episode(NamedTuple):
+    seed: int
+    ticks: int
+    score: int
+    pellets_eaten: int
+    # Ghost.Name value of the ghost that caught pacman, '' if pacman survived
+    caught_by: str
+
+class ChunkResult(NamedTuple):
+    pid: int
+    elapsed: float
+    ticks: int
+    episodes: List[Episode]
+
+# Per worker process copy of the map, loaded once by _init_worker
+_map_data: MapData | None = None
+
+DIRECTIONS: List[game.Input] = [game.Input.UP, game.Input.DOWN, game.Input.LEFT, game.Input.RIGHT]
+
+def _init_worker(map_path: str) -> None:
+    global _map_data
+    _map_data = mapfile.load_map(map_path)
+
+def play_episode(map_data: MapData, seed: int, max_ticks: int) -> Episode:
+    # Random-walk pacman: turns at random, and always when he runs into a wall
+    rng: random.Random = random.Random(seed)
+    state: game.GameState = game.GameState(map_data)
+    last_tile: int = state.pacman.current_tile
+    idle_ticks: int = 0
+
+    while not state.pause_before_death and not state.is_over() and state.tick < max_ticks:
+        inputs: List[game.Input] = []
+        if idle_ticks > 12 or rng.random() < 0.02:
+            inputs.append(rng.choice(DIRECTIONS))
+            idle_ticks = 0
+        game.step(state, inputs)
+
+        if state.pacman.current_tile == last_tile:
+            idle_ticks += 1
+        else:
+            last_tile = state.pacman.current_tile
+            idle_ticks = 0
+
+    return Episode(seed, state.tick, state.score, state.dots_eaten(), state.caught_by.value if state.caught_by else '')
+
+def run_chunk(first_seed: int, count: int, max_ticks: int) -> ChunkResult:
+    start: float = time.perf_counter()
+    episodes: List[Episode] = [play_episode(_map_data, seed, max_ticks) for seed in range(first_seed, first_seed + count)]
+    return ChunkResult(os.getpid(), time.perf_counter() - start, sum(e.ticks for e in episodes), episodes)
+
+class Stats:
+    def __init__(self):
+        # Histograms rather than raw samples so memory stays bounded by
+        # the number of distinct values, not the number of episodes
+        self.survival: CounterType[int] = Counter()
+        self.score: CounterType[int] = Counter()
+        self.pellets: CounterType[int] = Counter()
+        self.caught_by: CounterType[str] = Counter()
+        self.episodes: int = 0
+        self.worker_ticks: CounterType[int] = Counter()
+        self.worker_time: Dict[int, float] = {}
+
+    def add(self, chunk: ChunkResult) -> None:
+        self.worker_ticks[chunk.pid] += chunk.ticks
+        self.worker_time[chunk.pid] = self.worker_time.get(chunk.pid, 0.0) + chunk.elapsed
+        for episode in chunk.episodes:
+            self.episodes += 1
+            self.survival[episode.ticks] += 1
+            self.score[episode.score] += 1
+            self.pellets[episode.pellets_eaten] += 1
+            self.caught_by[episode.caught_by] += 1
+
+def percentiles(histogram: CounterType[int], points: Tuple[float, ...] = (0.05, 0.5, 0.95)) -> List[int]:
+    total: int = sum(histogram.values())
+    results: List[int] = []
+    for point in points:
+        seen: int = 0
+        for value in sorted(histogram):
+            seen += histogram[value]
+            if seen >= point * total:
+                results.append(value)
+                break
+    return results
+
+def mean(histogram: CounterType[int]) -> float:
+    total: int = sum(histogram.values())
+    return sum(value * count for value, count in histogram.items()) / total if total else 0.0
+
+def report(stats: Stats, wall_time: float) -> None:
+    print(f'{stats.episodes} episodes in {wall_time:.1f}s')
+    print('\nPer worker throughput:')
+    for pid in sorted(stats.worker_ticks):
+        print(f'  pid {pid}: {stats.worker_ticks[pid]} ticks, {stats.worker_ticks[pid] / stats.worker_time[pid]:.0f} ticks/s')
+    print(f'  total: {sum(stats.worker_ticks.values()) / wall_time:.0f} ticks/s')
+    if stats.episodes == 0:
+        # Nothing to take percentiles or rates of
+        return
+
+    print('\nDistributions (mean / p5 / p50 / p95):')
+    for label, histogram in (('survival ticks', stats.survival), ('score', stats.score), ('pellets eaten', stats.pellets)):
+        p5, p50, p95 = percentiles(histogram)
+        print(f'  {label:<15} {mean(histogram):9.1f} / {p5} / {p50} / {p95}')
+
+    print('\nCatch rate by ghost:')
+    for name in Ghost.Name:
+        print(f'  {name.value:<7} {stats.caught_by[name.value] / stats.episodes:6.1%}')
+    print(f'  {"(none)":<7} {stats.caught_by[""] / stats.episodes:6.1%}')
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Play many seeded headless games across all cores')
+    parser.add_argument('--episodes', type=int, default=10000)
+    parser.add_argument('--chunk-size', type=int, default=100, help='episodes per task sent to a worker')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first episode, the rest count up from it')
+    parser.add_argument('--max-ticks', type=int, default=20000)
+    parser.add_argument('--map', default='maps/pacmap.txt')
+    args = parser.parse_args()
+    if args.episodes < 1:
+        parser.error('--episodes must be at least 1')
+
+    stats: Stats = Stats()
+    start: float = time.perf_counter()
+    next_seed: int = args.seed
+    end_seed: int = args.seed + args.episodes
+    # Only a couple of chunks per worker are in flight at once, results are
+    # folded into the histograms as they arrive and then dropped
+    max_pending: int = 2 * args.workers
+    pending: Set[Future] = set()
+
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(args.map,)) as pool:
+        while next_seed < end_seed or pending:
+            while next_seed < end_seed and len(pending) < max_pending:
+                count: int = min(args.chunk_size, end_seed - next_seed)
+                pending.add(pool.submit(run_chunk, next_seed, count, args.max_ticks))
+                next_seed += count
+
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                stats.add(future.result())
+
+    report(stats, time.perf_counter() - start)
+
+if __name__ == '__main__':
+    main()
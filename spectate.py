@@ -0,0 +1,438 @@
+import pygame as pg
+from typing import List, Set, Tuple
+import asyncio
+import socket
+import struct
+import threading
+from characters import Character, Ghost, PacMan, MODE_CODES
+import common
+import entities
+import game
+
+# Spectator stream (little endian), one message per simulation tick, each
+# prefixed with its uint32 byte length:
+#   keyframe  KEYFRAME, tick, map hash, score, map width and height, entity count
+#             (struct KEYFRAME_HEADER), entity count x ENTITY (with a kind byte first),
+#             uint32 byte length of the remaining pellet bitmap, the bitmap
+#   delta     DELTA, tick, flags, changed entity count (struct DELTA_HEADER),
+#             score (int32) if SCORE, eaten tile (int32) if EATEN, then per changed
+#             entity its slot, field flags and only those fields, see encode_delta
+# A client gets a keyframe when it connects and whenever it fell behind,
+# deltas against the previous tick otherwise.
+KEYFRAME = 0
+DELTA = 1
+LENGTH = struct.Struct('<I')
+KEYFRAME_HEADER = struct.Struct('<BI32siHHB')
+DELTA_HEADER = struct.Struct('<BIBB')
+# kind, tile, sprite x and y, direction code, animation frame, mode
+ENTITY = struct.Struct('<BiiiBBB')
+
+# Delta flags
+SCORE = 1
+EATEN = 2
+# Entity field flags. POS is a move of at most 127 pixels as two int8,
+# POS_FAR the new position as two int32
+TILE = 1
+POS = 2
+POS_FAR = 4
+DIRECTION = 8
+FRAME = 16
+MODE = 32
+
+# Entity kinds: pacman, then the ghosts in Ghost.Name order
+KIND_PACMAN = 0
+GHOST_NAMES: List[Ghost.Name] = list(Ghost.Name)
+
+# PacMan's mode byte, ghosts send their MODE_CODES with HIDDEN set once
+# they're gone (after catching pacman)
+ALIVE = 0
+DYING = 1
+DEAD = 2
+HIDDEN = 0x80
+
+# Messages a client may have queued before it counts as fallen behind,
+# half a second of ticks at the default tick rate
+QUEUE_SIZE = 30
+
+PORT = 7654
+
+# (tile, sprite x, sprite y, direction, frame, mode)
+Record = Tuple[int, int, int, int, int, int]
+
+def entity_record(character: Character, live: bool = True) -> Record:
+    x, y = character.sprite_pos()
+    store: entities.EntityStore = character.store
+    frame: int = store.frame[character.slot]
+    if isinstance(character, PacMan):
+        mode: int = DEAD if character.is_dead() else DYING if character.is_dying() else ALIVE
+        if character.is_dying():
+            frame = character.death_frame()
+    else:
+        mode = MODE_CODES[character.get_mode()] | (0 if live else HIDDEN)
+    return (store.tile[character.slot], int(x), int(y), store.direction[character.slot] & 0xff, frame, mode)
+
+def state_records(state: game.GameState) -> List[Record]:
+    # Pacman, then every ghost in ghost_list, so slots never change
+    live: Set[int] = {id(ghost) for ghost in state.ghosts.values()}
+    return [entity_record(state.pacman)] + [entity_record(ghost, id(ghost) in live) for ghost in state.ghost_list]
+
+def encode_keyframe(state: game.GameState, map_hash: bytes, records: List[Record]) -> bytes:
+    kinds: List[int] = [KIND_PACMAN] + [1 + GHOST_NAMES.index(ghost.name) for ghost in state.ghost_list]
+    pellets: bytes = state.pellet_bits.to_bytes((state.pellet_bits.bit_length() + 7) // 8, 'little')
+    message: bytes = b''.join([
+        KEYFRAME_HEADER.pack(KEYFRAME, state.tick, map_hash, state.score, state.dims[0], state.dims[1], len(records)),
+        *[ENTITY.pack(kind, *record) for kind, record in zip(kinds, records)],
+        LENGTH.pack(len(pellets)), pellets])
+    return LENGTH.pack(len(message)) + message
+
+def encode_delta(tick: int, score: int | None, eaten_tile: int, records: List[Record], previous: List[Record]) -> bytes:
+    flags: int = (SCORE if score is not None else 0) | (EATEN if eaten_tile != -1 else 0)
+    body: List[bytes] = []
+    if score is not None:
+        body.append(struct.pack('<i', score))
+    if eaten_tile != -1:
+        body.append(struct.pack('<i', eaten_tile))
+
+    changed: int = 0
+    for slot, (record, old) in enumerate(zip(records, previous)):
+        if record == old:
+            continue
+        changed += 1
+        fields: int = 0
+        values: List[bytes] = []
+        if record[0] != old[0]:
+            fields |= TILE
+            values.append(struct.pack('<i', record[0]))
+        dx, dy = record[1] - old[1], record[2] - old[2]
+        if dx or dy:
+            if -128 <= dx < 128 and -128 <= dy < 128:
+                fields |= POS
+                values.append(struct.pack('<bb', dx, dy))
+            else:
+                fields |= POS_FAR
+                values.append(struct.pack('<ii', record[1], record[2]))
+        for flag, index in ((DIRECTION, 3), (FRAME, 4), (MODE, 5)):
+            if record[index] != old[index]:
+                fields |= flag
+                values.append(bytes((record[index],)))
+        body.append(bytes((slot, fields)))
+        body.extend(values)
+
+    message: bytes = DELTA_HEADER.pack(DELTA, tick, flags, changed) + b''.join(body)
+    return LENGTH.pack(len(message)) + message
+
+class _Client:
+    __slots__ = ('queue', 'synced')
+
+    def __init__(self, queue_size: int):
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(queue_size)
+        # False until the client has been sent a keyframe to apply deltas to
+        self.synced: bool = False
+
+class SpectatorServer:
+    '''
+    Streams a running game to any number of spectators on localhost. The
+    asyncio server runs on a thread of its own; publish() is called by the
+    game loop after each tick, encodes the tick once and hands the bytes
+    over without waiting. Every client has a bounded queue, and a client
+    whose queue is full has it emptied and is resynced with a keyframe
+    instead, so a slow spectator only ever drops its own frames.
+    '''
+    def __init__(self, map_hash: bytes, port: int = PORT, host: str = '127.0.0.1', queue_size: int = QUEUE_SIZE):
+        self.map_hash: bytes = map_hash
+        self.host: str = host
+        self.port: int = port
+        self.queue_size: int = queue_size
+
+        # Only touched on the server thread
+        self._clients: Set[_Client] = set()
+        # Read by the game thread: whether anyone is watching, and whether
+        # the next publish() must include a keyframe
+        self._watching: bool = False
+        self._keyframe_wanted: bool = False
+        self._previous: List[Record] = []
+        self._previous_score: int = 0
+
+        self._loop: asyncio.AbstractEventLoop = asyncio.new_event_loop()
+        self._server: asyncio.Server | None = None
+        self._started: threading.Event = threading.Event()
+        self._thread: threading.Thread = threading.Thread(target=self._run, name='spectator server', daemon=True)
+
+    def start(self) -> None:
+        # Returns once the server is listening, port is then the bound port
+        self._thread.start()
+        self._started.wait()
+        if self._server is None:
+            raise OSError(f'Spectator server could not listen on {self.host}:{self.port}')
+
+    def close(self) -> None:
+        if self._thread.is_alive():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def publish(self, state: game.GameState) -> None:
+        # Game thread, once per tick. Nothing is encoded while nobody watches
+        if not self._watching:
+            return
+        records: List[Record] = state_records(state)
+        keyframe: bytes | None = None
+        if self._keyframe_wanted:
+            self._keyframe_wanted = False
+            keyframe = encode_keyframe(state, self.map_hash, records)
+        delta: bytes | None = None
+        if self._previous:
+            score: int | None = state.score if state.score != self._previous_score else None
+            delta = encode_delta(state.tick, score, state.eaten_tile, records, self._previous)
+        self._previous = records
+        self._previous_score = state.score
+        self._loop.call_soon_threadsafe(self._broadcast, keyframe, delta)
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._serve, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError:
+            self._started.set()
+            return
+        self._started.set()
+        self._loop.run_forever()
+        self._server.close()
+        for task in asyncio.all_tasks(self._loop):
+            task.cancel()
+        self._loop.run_until_complete(asyncio.gather(*asyncio.all_tasks(self._loop), return_exceptions=True))
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    def _broadcast(self, keyframe: bytes | None, delta: bytes | None) -> None:
+        for client in self._clients:
+            if not client.synced:
+                if keyframe is None:
+                    continue
+                client.synced = True
+                message: bytes = keyframe
+            elif delta is None:
+                continue
+            else:
+                message = delta
+            try:
+                client.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Fallen behind: drop what's queued and start over from a keyframe
+                while not client.queue.empty():
+                    client.queue.get_nowait()
+                client.synced = False
+                self._keyframe_wanted = True
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client: _Client = _Client(self.queue_size)
+        self._clients.add(client)
+        self._watching = True
+        self._keyframe_wanted = True
+        try:
+            while True:
+                writer.write(await client.queue.get())
+                await writer.drain()
+        except (ConnectionError, OSError, asyncio.CancelledError):
+            # Disconnected, or the server is closing
+            pass
+        finally:
+            self._clients.discard(client)
+            self._watching = bool(self._clients)
+            writer.close()
+
+class SpectatorView:
+    '''
+    The game as a spectator sees it, rebuilt from the stream. Holds what
+    drawing needs: each character's sprite position and animation, the
+    pellets left and the score.
+    '''
+    def __init__(self):
+        self.tick: int = -1
+        self.map_hash: bytes = b''
+        self.dims: Tuple[int, int] = (0, 0)
+        self.score: int = 0
+        self.kinds: List[int] = []
+        self.records: List[Record] = []
+        self.pellets: Set[int] = set()
+        # False until the first keyframe, deltas before it are skipped
+        self.synced: bool = False
+
+    def apply(self, message: bytes | memoryview) -> None:
+        if message[0] == KEYFRAME:
+            self._apply_keyframe(message)
+        elif self.synced:
+            self._apply_delta(message)
+
+    def _apply_keyframe(self, message: bytes | memoryview) -> None:
+        _, self.tick, self.map_hash, self.score, width, height, count = KEYFRAME_HEADER.unpack_from(message, 0)
+        self.dims = (width, height)
+        offset: int = KEYFRAME_HEADER.size
+        self.kinds, self.records = [], []
+        for kind, *record in ENTITY.iter_unpack(message[offset:offset + count * ENTITY.size]):
+            self.kinds.append(kind)
+            self.records.append(tuple(record))
+        offset += count * ENTITY.size
+        (length,) = LENGTH.unpack_from(message, offset)
+        bits: int = int.from_bytes(message[offset + LENGTH.size:offset + LENGTH.size + length], 'little')
+        self.pellets = set()
+        while bits:
+            bit: int = bits & -bits
+            self.pellets.add(bit.bit_length() - 1)
+            bits ^= bit
+        self.synced = True
+
+    def _apply_delta(self, message: bytes | memoryview) -> None:
+        _, self.tick, flags, changed = DELTA_HEADER.unpack_from(message, 0)
+        offset: int = DELTA_HEADER.size
+        if flags & SCORE:
+            (self.score,) = struct.unpack_from('<i', message, offset)
+            offset += 4
+        if flags & EATEN:
+            (tile,) = struct.unpack_from('<i', message, offset)
+            self.pellets.discard(tile)
+            offset += 4
+
+        for _ in range(changed):
+            slot, fields = message[offset], message[offset + 1]
+            offset += 2
+            tile, x, y, direction, frame, mode = self.records[slot]
+            if fields & TILE:
+                (tile,) = struct.unpack_from('<i', message, offset)
+                offset += 4
+            if fields & POS:
+                dx, dy = struct.unpack_from('<bb', message, offset)
+                x, y = x + dx, y + dy
+                offset += 2
+            if fields & POS_FAR:
+                x, y = struct.unpack_from('<ii', message, offset)
+                offset += 8
+            if fields & DIRECTION:
+                direction = message[offset]
+                offset += 1
+            if fields & FRAME:
+                frame = message[offset]
+                offset += 1
+            if fields & MODE:
+                mode = message[offset]
+                offset += 1
+            self.records[slot] = (tile, x, y, direction, frame, mode)
+
+class SpectatedCharacter:
+    '''One streamed character, drawn by Renderer.draw like the game's own.'''
+    def __init__(self, view: SpectatorView, slot: int):
+        self.view: SpectatorView = view
+        self.slot: int = slot
+
+    def sprite(self, alpha: float = 1.0) -> Tuple[pg.Surface, Tuple[int, int]] | None:
+        # Spectators show the latest tick, alpha is ignored
+        tile, x, y, direction, frame, mode = self.view.records[self.slot]
+        index: int = direction if direction < entities.NONE else 0
+        kind: int = self.view.kinds[self.slot]
+        if kind == KIND_PACMAN:
+            if mode == DEAD:
+                return None
+            if mode == DYING:
+                return common.load_asset(PacMan.DEATH_FRAMES[frame]), (x, y)
+            return common.load_asset(PacMan.BODY_FRAMES[frame][index]), (x, y)
+        if mode & HIDDEN:
+            return None
+        return common.load_asset(Ghost.BODY_FRAMES[GHOST_NAMES[kind - 1]][frame][index]), (x, y)
+
+class SpectatorConnection:
+    '''Non-blocking reader of a spectator stream, polled once per frame.'''
+    def __init__(self, port: int = PORT, host: str = '127.0.0.1'):
+        self._socket: socket.socket = socket.create_connection((host, port))
+        self._socket.setblocking(False)
+        self._buffer: bytearray = bytearray()
+        self.closed: bool = False
+
+    def poll(self, view: SpectatorView) -> int:
+        # Applies every complete message received so far, returns how many
+        while not self.closed:
+            try:
+                data: bytes = self._socket.recv(65536)
+            except BlockingIOError:
+                break
+            if not data:
+                self.closed = True
+            self._buffer += data
+
+        applied: int = 0
+        offset: int = 0
+        buffer: memoryview = memoryview(self._buffer)
+        while len(buffer) - offset >= LENGTH.size:
+            (length,) = LENGTH.unpack_from(buffer, offset)
+            if len(buffer) - offset - LENGTH.size < length:
+                break
+            view.apply(buffer[offset + LENGTH.size:offset + LENGTH.size + length])
+            offset += LENGTH.size + length
+            applied += 1
+        buffer.release()
+        del self._buffer[:offset]
+        return applied
+
+    def close(self) -> None:
+        self._socket.close()
+
+def main() -> None:
+    # Watches a game started with python pacman.py --spectate
+    import argparse
+    from atlas import defer_atlases
+    from pacman import MAP_FILE, map_assets_from_data, pellets, power_pellets
+    from renderer import Renderer
+    from replay import map_hash
+    import mapfile
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description='Watch a PacMan game being played on this machine')
+    parser.add_argument('--port', type=int, default=PORT, help='port the game streams on (default %(default)s)')
+    parser.add_argument('--map', default=MAP_FILE, help='map the game is played on')
+    args: argparse.Namespace = parser.parse_args()
+
+    map_data: mapfile.MapData = mapfile.load_map(args.map)
+    common.set_map_dims((map_data.width, map_data.height))
+    try:
+        connection: SpectatorConnection = SpectatorConnection(args.port)
+    except OSError as error:
+        raise SystemExit(f'No game to watch on port {args.port}: {error}')
+
+    pg.init()
+    screen: pg.Surface = pg.display.set_mode(common.SCR_SIZE, pg.SCALED)
+    pg.display.set_caption('PacMan (spectating)')
+    clock: pg.time.Clock = pg.time.Clock()
+    defer_atlases()
+
+    view: SpectatorView = SpectatorView()
+    renderer: Renderer | None = None
+    characters: List[SpectatedCharacter] = []
+    running: bool = True
+    while running and not connection.closed:
+        for event in pg.event.get():
+            if event.type == pg.QUIT:
+                running = False
+            if event.type == pg.WINDOWEXPOSED and renderer:
+                renderer.invalidate()
+
+        connection.poll(view)
+        if not view.synced:
+            clock.tick(common.MAX_FPS)
+            continue
+        if renderer is None or len(characters) != len(view.records):
+            if view.map_hash != map_hash(map_data):
+                raise SystemExit('The game is played on a different map, pass it with --map')
+            # Baked with every pellet of the map, the eaten ones are erased by sync_pellets
+            renderer = Renderer(screen, map_assets_from_data(map_data), pellets(map_data) | power_pellets(map_data), view.dims)
+            characters = [SpectatedCharacter(view, slot) for slot in range(len(view.records))]
+
+        renderer.sync_pellets(view.pellets, set())
+        renderer.camera.follow((view.records[0][1] + common.TILE_SIZE[0], view.records[0][2] + common.TILE_SIZE[1]))
+        renderer.draw(characters)
+        renderer.present()
+        pg.display.set_caption(f'PacMan (spectating) {view.score}')
+        clock.tick(common.MAX_FPS)
+
+    connection.close()
+    pg.quit()
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,4 @@
 import tkinter as tk
-from map_builder import main
-from pacman import main as game_main
 from tk import tk_open_dialog
 
 
@@ -9,18 +7,23 @@ WINDOW_HEIGHT = 91
 
 root = tk.Tk()
 
+# The game and the map builder (and pygame with them) are only imported
+# once one is picked, so the options window opens straight away
 def load_game() -> None:
     root.destroy()
+    from pacman import main as game_main
     game_main()
 
 def load_main() -> None:
     root.destroy()
+    from map_builder import main
     main()
 
 
 def open_map_from_file() -> None:
     file_path = tk_open_dialog()
     root.destroy()
+    from map_builder import main
     main(file_path)
 
 
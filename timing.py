@@ -0,0 +1,57 @@
+import math
+import time
+
+class FixedTimestep:
+    '''
+    Accumulator that turns real elapsed time into a whole number of fixed
+    length simulation ticks, so the game advances at the same speed however
+    fast frames are rendered.
+
+    When the machine can't keep up, frames are dropped first: a frame that
+    had to run more than CATCH_UP_FRAMES of ticks is not rendered (at most
+    max_skipped_frames in a row, so the screen still updates). Simulation
+    time is only thrown away once the backlog exceeds max_backlog seconds,
+    e.g. after the window was dragged or the process was suspended.
+    '''
+    # A frame running more than this many 30 Hz frames' worth of ticks is catching up
+    CATCH_UP_FRAMES: float = 1.0
+
+    def __init__(self, tick_rate: int = 60, max_backlog: float = 0.25, max_skipped_frames: int = 5):
+        self.tick_rate: int = tick_rate
+        self.tick_time: float = 1 / tick_rate
+        self.max_backlog: float = max_backlog
+        self.max_skipped_frames: int = max_skipped_frames
+
+        self.accumulator: float = 0.0
+        self.skipped_frames: int = 0
+        self.dropped_ticks: int = 0
+        self._catch_up_ticks: int = math.ceil(tick_rate * FixedTimestep.CATCH_UP_FRAMES / 30)
+        self._consecutive_skips: int = 0
+        self._last_time: float = time.perf_counter()
+
+    def advance(self) -> int:
+        # Number of ticks to simulate for the time passed since the last call
+        now: float = time.perf_counter()
+        self.accumulator += now - self._last_time
+        self._last_time = now
+
+        if self.accumulator > self.max_backlog:
+            self.dropped_ticks += int((self.accumulator - self.max_backlog) / self.tick_time)
+            self.accumulator = self.max_backlog
+
+        ticks: int = int(self.accumulator / self.tick_time)
+        self.accumulator -= ticks * self.tick_time
+        return ticks
+
+    def should_render(self, ticks: int) -> bool:
+        # Whether to draw after simulating `ticks` ticks this frame
+        if ticks > self._catch_up_ticks and self._consecutive_skips < self.max_skipped_frames:
+            self._consecutive_skips += 1
+            self.skipped_frames += 1
+            return False
+        self._consecutive_skips = 0
+        return True
+
+    def alpha(self) -> float:
+        # How far between the last two ticks the current moment is, for interpolation
+        return self.accumulator / self.tick_time
@@ -3,9 +3,9 @@ from tkinter.filedialog import askopenfilename
 from typing import IO, List, Tuple
 
 def tk_open_dialog() -> str:
-    return askopenfilename(filetypes=[('Text Document', '*.txt')], initialdir='map_data')
+    return askopenfilename(filetypes=[('Map Files', '*.txt *.pmap'), ('Text Document', '*.txt'), ('Binary Map', '*.pmap')], initialdir='map_data')
 
 
 def tk_save_dialog() -> (IO[str] | None): 
-    files: List[Tuple[str, str]] = [('Text Document', '*.txt')] 
+    files: List[Tuple[str, str]] = [('Text Document', '*.txt'), ('Binary Map', '*.pmap')] 
     return asksaveasfile(filetypes=files, defaultextension=files[0][0], initialdir='map_data')